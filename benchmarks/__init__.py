@@ -0,0 +1,109 @@
+"""
+Micro benchmarks of hot paths, run against the stand-ins in local_services rather than AWS, e.g.
+
+   > python -m benchmarks.verify_token
+
+Benchmarks with a baseline in benchmarks/baselines compare against it and fail on regressions. Record a new baseline
+with --record when a change is meant to alter the numbers, and commit it along with the change.
+"""
+import json
+import os
+import time
+
+BASELINE_DIRECTORY = os.path.join(os.path.dirname(__file__), 'baselines')
+
+
+def measure(func, iterations, setup=None):
+    """
+    Time a function over a number of calls
+    :param func: function to call, without arguments
+    :param iterations: number of times to call it
+    :param setup: function called before every call, which is not timed
+    :return: summary of the calls, as returned by summarise()
+    """
+    samples = []
+    for _ in range(iterations):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return summarise(samples)
+
+
+def summarise(samples):
+    """
+    :param samples: seconds taken by each call
+    :return: dict with the number of calls, total seconds, seconds per call, calls per second, and the 50th, 95th and
+    99th percentile and maximum seconds of a single call
+    """
+    samples = sorted(samples)
+    elapsed = sum(samples)
+    return dict(calls=len(samples), seconds=elapsed, per_call=elapsed / len(samples) if samples else 0.0,
+                per_second=len(samples) / elapsed if elapsed else float('inf'),
+                p50=percentile(samples, 50), p95=percentile(samples, 95), p99=percentile(samples, 99),
+                max=samples[-1] if samples else 0.0)
+
+
+def percentile(samples, percent):
+    """
+    :param samples: sorted list of samples
+    :param percent: percentile to get, from 0 to 100
+    :return: value below which the given percent of samples fall
+    """
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(len(samples) * percent / 100))]
+
+
+def report(name, result):
+    print(f"{name:<40} {result['calls']:>8} calls {result['per_call'] * 1e6:>12.1f} us/call "
+          f"{result['p95'] * 1e6:>12.1f} us p95 {result['per_second']:>12.0f} calls/s")
+
+
+def load_baseline(name):
+    """
+    :param name: name of benchmark
+    :return: results recorded for the benchmark, keyed by case, or None if nothing has been recorded
+    """
+    path = os.path.join(BASELINE_DIRECTORY, f'{name}.json')
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def save_baseline(name, results):
+    """
+    :param name: name of benchmark
+    :param results: results to record, keyed by case
+    :return: path of baseline written
+    """
+    os.makedirs(BASELINE_DIRECTORY, exist_ok=True)
+    path = os.path.join(BASELINE_DIRECTORY, f'{name}.json')
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write('\n')
+    return path
+
+
+def compare(results, baseline, tolerances):
+    """
+    Find results which have regressed from a baseline
+    :param results: results of a run, keyed by case
+    :param baseline: results recorded in the baseline, keyed by case
+    :param tolerances: how many times its baseline value a metric may grow to, keyed by metric. Metrics without a
+    tolerance are not compared
+    :return: list of messages describing each regression
+    """
+    regressions = []
+    for case, result in results.items():
+        recorded = baseline.get(case)
+        if recorded is None:
+            continue
+        for metric, tolerance in tolerances.items():
+            if metric not in result or metric not in recorded:
+                continue
+            if result[metric] > recorded[metric] * tolerance:
+                regressions.append(f'{case}: {metric} {result[metric]:.6g} > {recorded[metric]:.6g} x {tolerance}')
+    return regressions
@@ -0,0 +1,212 @@
+"""
+Circle generation across game zone sizes, final circle placements and radii:
+
+ - first_circle: create_next_circle for the first circle of a game, placed within the game zone
+ - next_circle: create_next_circle for a circle closing in on the current circle, with the final circle placed at the
+   centre of the current circle, part way out, or almost touching its edge
+ - generate_intermediate_circles: closing a circle by one step, for a range of radii
+
+Along with latency, each create_next_circle case counts the candidates drawn by the rejection sampling loops in
+models.map. Runs are seeded, so the counts are the same on every machine, and compared against
+benchmarks/baselines/circles.json. Fails if a case has regressed:
+
+   > python -m benchmarks.circles
+   > python -m benchmarks.circles --record
+"""
+import argparse
+import math
+import random
+import sys
+import time
+
+from benchmarks import compare, load_baseline, save_baseline, summarise
+from models import map
+
+CENTRE = dict(latitude=56.131, longitude=12.900)
+KILOMETERS_PER_DEGREE = 111.32
+
+# side of the square game zone in kilometers
+ZONE_SIZES = {'small': 0.25, 'medium': 1.0, 'large': 4.0}
+# distance of the final circle's centre from the centre of the game zone, as a fraction of the side of the zone
+ZONE_PLACEMENTS = {'none': None, 'centre': 0.0, 'offset': 0.2, 'edge': 0.35}
+# distance of the final circle's centre from the centre of the current circle, as a fraction of the furthest it can be
+# while still inside the current circle
+CIRCLE_PLACEMENTS = {'none': None, 'centre': 0.0, 'offset': 0.5, 'edge': 0.9}
+# radius of the final circle in kilometers
+FINAL_CIRCLE_RADII = [0.02, 0.05]
+INTERMEDIATE_CIRCLE_RADII = [2.0, 1.0, 0.5, 0.2, 0.1, 0.05]
+
+# candidates are drawn by generate_centre_within_distance, and checked against the final circle by
+# generate_centre_within_distance_and_contains
+CANDIDATES = 'generate_centre_within_distance'
+CONTAINMENT_CHECKS = 'generate_centre_within_distance_and_contains'
+
+TOLERANCES = dict(p50=2.0, mean_candidates=1.1, max_candidates=1.1)
+
+
+def offset_coordinates(kilometers_north, kilometers_east):
+    """
+    :param kilometers_north: distance north of CENTRE in kilometers
+    :param kilometers_east: distance east of CENTRE in kilometers
+    :return: coordinates of the point
+    """
+    return dict(latitude=CENTRE['latitude'] + kilometers_north / KILOMETERS_PER_DEGREE,
+                longitude=CENTRE['longitude'] + kilometers_east / KILOMETERS_PER_DEGREE
+                / math.cos(math.radians(CENTRE['latitude'])))
+
+
+def make_game_zone(size, placement, final_radius):
+    """
+    Game zone with no circles yet
+    :param size: side of the square game zone in kilometers
+    :param placement: distance of the final circle from the centre, as a fraction of size, or None for no final circle
+    :param final_radius: radius of the final circle in kilometers
+    :return: GameZone
+    """
+    half = size / 2
+    coordinates = [offset_coordinates(north, east) for north, east in ((half, half), (half, -half), (-half, -half),
+                                                                        (-half, half))]
+    final_circle = None
+    if placement is not None:
+        # placed diagonally from the centre, towards a corner of the zone
+        offset = placement * size / math.sqrt(2)
+        final_circle = map.Circle(dict(centre=offset_coordinates(offset, offset), radius=final_radius))
+    return map.GameZone(coordinates, final_circle=final_circle)
+
+
+def make_closing_game_zone(radius, placement, final_radius):
+    """
+    Game zone part way through a game
+    :param radius: radius of the current circle in kilometers
+    :param placement: distance of the final circle from the centre of the current circle, as a fraction of the furthest
+    it can be, or None for no final circle
+    :param final_radius: radius of the final circle in kilometers
+    :return: GameZone
+    """
+    current_circle = map.Circle(dict(centre=CENTRE, radius=radius))
+    final_circle = None
+    if placement is not None:
+        final_circle = map.Circle(dict(centre=offset_coordinates(placement * (radius - final_radius), 0),
+                                       radius=final_radius))
+    return map.GameZone(current_circle=current_circle, final_circle=final_circle)
+
+
+def measure_create_next_circle(game_zone, calls):
+    """
+    :param game_zone: GameZone to create next circles in. Its current circle is left as it is between calls
+    :param calls: number of times to create the next circle
+    :return: summary of the calls, as returned by summarise(), with the candidates drawn by the rejection sampling loops
+    """
+    samples, candidates, containment_checks = [], [], 0
+    for _ in range(calls):
+        drawn, checked = map.rejection_sampling[CANDIDATES], map.rejection_sampling[CONTAINMENT_CHECKS]
+        started = time.perf_counter()
+        game_zone.create_next_circle()
+        samples.append(time.perf_counter() - started)
+        candidates.append(map.rejection_sampling[CANDIDATES] - drawn)
+        containment_checks += map.rejection_sampling[CONTAINMENT_CHECKS] - checked
+    return dict(summarise(samples), mean_candidates=sum(candidates) / calls, max_candidates=max(candidates),
+                mean_containment_checks=containment_checks / calls)
+
+
+def cases(placements):
+    """
+    :param placements: final circle placements, keyed by name
+    :return: (case name, placement, final circle radius) for every final circle, and for no final circle
+    """
+    for placement_name, placement in placements.items():
+        if placement is None:
+            yield placement_name, None, None
+            continue
+        for final_radius in FINAL_CIRCLE_RADII:
+            yield f'{placement_name}/{final_radius}', placement, final_radius
+
+
+def benchmark_create_next_circle(calls, seed):
+    """
+    :param calls: number of circles to create in each case
+    :param seed: seed each case starts from
+    :return: results keyed by case
+    """
+    results = dict()
+    for zone_name, size in ZONE_SIZES.items():
+        for case, placement, final_radius in cases(ZONE_PLACEMENTS):
+            random.seed(seed)
+            results[f'first_circle/{zone_name}/{case}'] = measure_create_next_circle(
+                make_game_zone(size, placement, final_radius), calls)
+
+    # current circles the size of the first circle of each game zone, and twice the size of the final circle
+    for zone_name in list(ZONE_SIZES) + ['near_final']:
+        for case, placement, final_radius in cases(CIRCLE_PLACEMENTS):
+            if zone_name == 'near_final':
+                radius = 2 * (final_radius or FINAL_CIRCLE_RADII[0])
+            else:
+                radius = ZONE_SIZES[zone_name] * 0.45
+            random.seed(seed)
+            results[f'next_circle/{zone_name}/{case}'] = measure_create_next_circle(
+                make_closing_game_zone(radius, placement, final_radius), calls)
+    return results
+
+
+def benchmark_intermediate_circles(iterations):
+    """
+    :param iterations: number of times to close each circle
+    :return: results keyed by case
+    """
+    results = dict()
+    for radius in INTERMEDIATE_CIRCLE_RADII:
+        outer = map.Circle(dict(centre=CENTRE, radius=radius))
+        inner = map.Circle(dict(centre=dict(latitude=CENTRE['latitude'] + radius / 4 / KILOMETERS_PER_DEGREE,
+                                            longitude=CENTRE['longitude']),
+                                radius=radius * 0.67))
+        samples = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            intermediate_circles = outer.generate_intermediate_circles(inner)
+            samples.append(time.perf_counter() - started)
+        results[f'generate_intermediate_circles/{radius}'] = dict(summarise(samples),
+                                                                  circles=len(intermediate_circles))
+    return results
+
+
+def print_results(results):
+    print(f"{'case':<40}{'calls':>7}{'p50 us':>10}{'p95 us':>10}{'p99 us':>10}{'max us':>10}"
+          f"{'mean cand':>11}{'max cand':>10}")
+    for case, result in results.items():
+        print(f"{case:<40}{result['calls']:>7}{result['p50'] * 1e6:>10.0f}{result['p95'] * 1e6:>10.0f}"
+              f"{result['p99'] * 1e6:>10.0f}{result['max'] * 1e6:>10.0f}", end='')
+        if 'mean_candidates' in result:
+            print(f"{result['mean_candidates']:>11.1f}{result['max_candidates']:>10}", end='')
+        print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark circle generation')
+    parser.add_argument('--calls', type=int, default=50, help='circles created in each create_next_circle case')
+    parser.add_argument('--iterations', type=int, default=200,
+                        help='calls in each generate_intermediate_circles case')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--record', action='store_true', help='record the results as the new baseline')
+    args = parser.parse_args()
+
+    results = benchmark_create_next_circle(args.calls, args.seed)
+    results.update(benchmark_intermediate_circles(args.iterations))
+    print_results(results)
+
+    if args.record:
+        print(f'Recorded {save_baseline("circles", results)}')
+        return
+
+    baseline = load_baseline('circles')
+    if baseline is None:
+        print('No baseline recorded, run with --record to record one')
+        return
+    regressions = compare(results, baseline, TOLERANCES)
+    for regression in regressions:
+        print(f'Regression: {regression}')
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
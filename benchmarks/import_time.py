@@ -0,0 +1,205 @@
+"""
+Import cost of each handler entry point in serverless_config/functions, which is what a Lambda pays on a cold start
+before it runs any of its route's code. Each entry point is imported in a fresh interpreter under python -X importtime:
+its handler module, then the imports at the top of its handler function, as the handlers import the models they need
+there. Reports the total, the packages which cost the most, and the slowest modules:
+
+   > python -m benchmarks.import_time
+   > python -m benchmarks.import_time --handler start_lobby_handler --modules 20
+
+Entry points must stay within IMPORT_BUDGETS, which tests/test_import_budget.py checks.
+"""
+import argparse
+import ast
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import Counter, OrderedDict
+
+PACKAGE_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FUNCTIONS_DIRECTORY = os.path.join(PACKAGE_DIRECTORY, 'serverless_config', 'functions')
+
+# written to stderr before the entry point is imported, so the imports of interpreter startup are left out
+MARKER = '--- entry point ---'
+IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+# packages which are slow to import, and only loaded by the routes that use them. geopy is imported by the models the
+# first time a distance is measured, so no entry point imports it
+HEAVY_PACKAGES = {'geopy', 'jose', 'marshmallow', 'cProfile', 'pstats', 'tracemalloc'}
+MODELS = {'models.game_master', 'models.lobby', 'models.map', 'models.player', 'models.squad'}
+# packages and modules each entry point must not import, keyed by entry point. Entry points which are not listed, the
+# REST routes with request or response schemas, may only import marshmallow
+IMPORT_BUDGETS = {
+    'handlers.websocket_handlers.connection_handler': HEAVY_PACKAGES | MODELS,
+    'handlers.websocket_handlers.default_handler': HEAVY_PACKAGES | MODELS,
+    'handlers.websocket_handlers.authorize_connection_handler': (HEAVY_PACKAGES - {'jose'}) | MODELS,
+    'handlers.websocket_handlers.player_location_message_handler': HEAVY_PACKAGES | MODELS,
+    'handlers.websocket_handlers.gamemaster_message_handler': HEAVY_PACKAGES | MODELS,
+    'handlers.websocket_handlers.connection_sweeper_handler': HEAVY_PACKAGES | MODELS,
+    'handlers.account_handlers.sign_up_handler': HEAVY_PACKAGES,
+    'handlers.account_handlers.sign_in_handler': HEAVY_PACKAGES | MODELS,
+    'handlers.account_handlers.sign_out_handler': HEAVY_PACKAGES | MODELS,
+    'handlers.account_handlers.refresh_tokens_handler': HEAVY_PACKAGES | MODELS,
+    'handlers.account_handlers.delete_user_handler': HEAVY_PACKAGES - {'jose'},
+    'handlers.sqs_handlers.circle_queue_handler': HEAVY_PACKAGES,
+}
+DEFAULT_BUDGET = HEAVY_PACKAGES - {'marshmallow'}
+
+
+def entry_points(directory=FUNCTIONS_DIRECTORY):
+    """
+    :param directory: directory of serverless function definitions
+    :return: dotted path of each handler, e.g. handlers.game_master_handlers.start_lobby_handler, in the order they are
+    first defined
+    """
+    handlers = OrderedDict()
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.yml'):
+            continue
+        with open(os.path.join(directory, filename), 'r') as f:
+            for line in f:
+                match = re.match(r'^\s+handler:\s*(\S+)\s*$', line)
+                if match:
+                    handlers[match.group(1)] = None
+    return list(handlers)
+
+
+def handler_imports(handler):
+    """
+    Find the imports at the top of a handler function, which run on its first invocation
+    :param handler: dotted path of handler
+    :return: list of import statements
+    """
+    module, function = handler.rsplit('.', 1)
+    with open(os.path.join(PACKAGE_DIRECTORY, *module.split('.')) + '.py', 'r') as f:
+        tree = ast.parse(f.read())
+
+    statements = []
+    for node in tree.body:
+        if not isinstance(node, ast.FunctionDef) or node.name != function:
+            continue
+        for statement in node.body:
+            if isinstance(statement, ast.Import):
+                statements += [f'import {alias.name}' for alias in statement.names]
+            elif isinstance(statement, ast.ImportFrom):
+                names = ', '.join(alias.name for alias in statement.names)
+                statements.append(f"from {'.' * statement.level}{statement.module or ''} import {names}")
+    return statements
+
+
+def profile_imports(handler, python=sys.executable):
+    """
+    Import an entry point in a fresh interpreter
+    :param handler: dotted path of handler
+    :param python: interpreter to import it with
+    :return: (self microseconds, cumulative microseconds, depth) of every module imported, keyed by module name, in
+    the order their imports finished
+    """
+    module, _ = handler.rsplit('.', 1)
+    code = '\n'.join([f'import sys; sys.stderr.write({MARKER!r} + "\\n")', f'import {module}']
+                     + handler_imports(handler))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [PACKAGE_DIRECTORY, os.getenv('PYTHONPATH')])))
+    process = subprocess.run([python, '-X', 'importtime', '-c', code], cwd=PACKAGE_DIRECTORY, env=env,
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    output = process.stderr.split(MARKER + '\n', 1)
+    if process.returncode != 0 or len(output) != 2:
+        raise RuntimeError(f'Failed to import {handler}:\n{process.stderr}')
+
+    modules = OrderedDict()
+    for line in output[1].splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules[name] = (int(self_us), int(cumulative_us), len(indent) // 2)
+    return modules
+
+
+def summarise(modules, top=10):
+    """
+    :param modules: modules imported, as returned by profile_imports()
+    :param top: number of packages and modules to list
+    :return: dict with the total milliseconds and number of modules imported, the milliseconds spent importing each of
+    the most costly top level packages, and the cumulative milliseconds of the slowest modules
+    """
+    packages = Counter()
+    for name, (self_us, _, _) in modules.items():
+        packages[name.split('.')[0]] += self_us
+    # the cumulative time of the modules imported directly by the entry point covers every other import
+    total_us = sum(cumulative_us for _, cumulative_us, depth in modules.values() if depth == 0)
+    slowest = sorted(modules.items(), key=lambda item: item[1][1], reverse=True)
+    return dict(ms=total_us / 1000, modules=len(modules),
+                packages=OrderedDict((package, self_us / 1000) for package, self_us in packages.most_common(top)),
+                slowest=OrderedDict((name, cumulative_us / 1000) for name, (_, cumulative_us, _) in slowest[:top]))
+
+
+def over_budget(handler, modules):
+    """
+    :param handler: dotted path of handler
+    :param modules: names of modules imported by the entry point
+    :return: sorted list of modules the entry point imported which its budget does not allow
+    """
+    forbidden = IMPORT_BUDGETS.get(handler, DEFAULT_BUDGET)
+    return sorted(module for module in modules
+                  if module in forbidden or module.split('.')[0] in forbidden)
+
+
+def benchmark(handlers, repeat=1, top=10):
+    """
+    :param handlers: dotted paths of handlers to import
+    :param repeat: number of times to import each entry point. The fastest import is reported
+    :param top: number of packages and modules to list for each entry point
+    :return: summary of each entry point, keyed by handler
+    """
+    results = OrderedDict()
+    for handler in handlers:
+        runs = [profile_imports(handler) for _ in range(repeat)]
+        summaries = [summarise(modules, top) for modules in runs]
+        fastest = min(range(repeat), key=lambda run: summaries[run]['ms'])
+        results[handler] = dict(summaries[fastest], over_budget=over_budget(handler, runs[fastest]))
+    return results
+
+
+def print_results(results):
+    print(f"{'entry point':<64}{'ms':>9}{'modules':>9}  costliest packages (ms)")
+    for handler, result in results.items():
+        packages = ', '.join(f'{package} {ms:.0f}' for package, ms in list(result['packages'].items())[:4])
+        print(f"{handler:<64}{result['ms']:>9.1f}{result['modules']:>9}  {packages}")
+        if result['over_budget']:
+            print(f"{'':<4}over budget: {', '.join(result['over_budget'])}")
+
+
+def print_slowest(results):
+    for handler, result in results.items():
+        print(f'\n{handler}')
+        for name, ms in result['slowest'].items():
+            print(f'{name:>60}{ms:>9.1f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the import cost of each handler entry point')
+    parser.add_argument('--handler', nargs='+', help='handler function names or dotted paths to measure')
+    parser.add_argument('--repeat', type=int, default=3, help='imports of each entry point, the fastest is reported')
+    parser.add_argument('--modules', type=int, default=0, help='slowest modules to list for each entry point')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args()
+
+    handlers = entry_points()
+    if args.handler:
+        handlers = [handler for handler in handlers
+                    if handler in args.handler or handler.rsplit('.', 1)[1] in args.handler]
+    results = benchmark(handlers, args.repeat, max(args.modules, 10))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print_results(results)
+    if args.modules:
+        print_slowest(results)
+    if any(result['over_budget'] for result in results.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,266 @@
+"""
+Wall time and DynamoDB round trips of the model flows behind the REST API, across lobby sizes. Each lobby size plays a
+lobby through from creating squads to deleting them:
+
+ - squad CRUD: create_squad, add_member_to_squad, get_squads (Player), remove_member_from_squad and delete_squad
+ - create_lobby, update_lobby, add_squad_to_lobby, get_squads_in_lobby (Lobby.get_squads), start_game,
+   get_players_in_lobby, set_player_dead (Player.dead), end_game and delete_lobby
+
+Round trips per call which grow with the number of squads show where a flow reads each squad one by one. Runs against
+the in-process stand-in for the table, or DynamoDB Local (the table named by TABLE) with --local. Websocket pushes and
+SQS messages go to in-process stand-ins either way:
+
+   > python -m benchmarks.model_flows --squads 2 10 50 100
+   > TABLE=table/battle-royale python -m benchmarks.model_flows --local
+"""
+import argparse
+import json
+import os
+import random
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+
+from benchmarks import summarise
+from db.dynamodb_connector import DynamoDbConnector
+from local_services.api_gateway import LocalManagementApi
+from local_services.dynamodb import LocalTable, install
+from local_services.sqs import LocalSqsClient
+from local_services.world_generator import CENTRE, FINAL_CIRCLE_RADIUS, GAME_ZONE_SIZE
+from models.game_master import GameMaster
+from models.player import Player
+from models.user import TEST_GAME_MASTER_PREFIX, TEST_PLAYER_PREFIX
+from sqs.utils import SqsQueue
+from websockets.connection_manager import ConnectionManager
+
+LOBBY_SIZES = [2, 5, 10, 25, 50, 100]
+# players killed in each lobby, as every death reads the whole lobby
+DEATHS = 5
+
+HALF = GAME_ZONE_SIZE / 2
+GAME_ZONE_COORDINATES = [dict(latitude=str(CENTRE['latitude'] + d_lat), longitude=str(CENTRE['longitude'] + d_long))
+                         for d_lat, d_long in ((HALF, HALF), (HALF, -HALF), (-HALF, -HALF), (-HALF, HALF))]
+FINAL_CIRCLE = dict(centre=dict(latitude=str(CENTRE['latitude']), longitude=str(CENTRE['longitude'])),
+                    radius=str(FINAL_CIRCLE_RADIUS))
+
+
+class RoundTrips:
+    """
+    Counts the requests made to DynamoDB, keyed by operation name
+    """
+
+    def __init__(self, table):
+        """
+        :param table: LocalTable, which counts its own operations, or a boto3 Table, whose client is hooked to count
+        each API call it makes
+        """
+        self.events = None
+        if isinstance(table, LocalTable):
+            self.operations = table.operations
+        else:
+            self.operations = Counter()
+            self.events = table.meta.client.meta.events
+            self.events.register('before-call.dynamodb', self._count)
+
+    def close(self):
+        """
+        Stop counting calls made by the client of a boto3 Table
+        """
+        if self.events is not None:
+            self.events.unregister('before-call.dynamodb', self._count)
+
+    def _count(self, model, **kwargs):
+        self.operations[model.name] += 1
+
+    def total(self):
+        return sum(self.operations.values())
+
+
+class FlowStats:
+    """
+    Latency and round trips of each call of an operation
+    """
+
+    def __init__(self):
+        self.latencies = []
+        self.round_trips = []
+
+    def summary(self):
+        return dict(summarise(self.latencies),
+                    round_trips=sum(self.round_trips) / len(self.round_trips),
+                    max_round_trips=max(self.round_trips))
+
+
+class ModelFlows:
+    """
+    Plays a lobby of a given size through the model flows, measuring each operation
+    """
+
+    def __init__(self, table, players_per_squad=4, seed=0):
+        """
+        :param table: table the models are using
+        :param players_per_squad: number of players in each squad
+        :param seed: seed of the random generator names are drawn from
+        """
+        self.round_trips = RoundTrips(table)
+        self.players_per_squad = players_per_squad
+        self.random = random.Random(seed)
+        self.operations = OrderedDict()  # FlowStats of each operation, keyed by operation name
+
+    @contextmanager
+    def measure(self, operation):
+        """
+        :param operation: name of operation the calls inside are charged to
+        """
+        round_trips = self.round_trips.total()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            stats = self.operations.setdefault(operation, FlowStats())
+            stats.latencies.append(time.perf_counter() - started)
+            stats.round_trips.append(self.round_trips.total() - round_trips)
+
+    def run(self, squads):
+        """
+        :param squads: number of squads in the lobby
+        :return: summary of each operation, keyed by operation name
+        """
+        self.operations = OrderedDict()
+        game_master = GameMaster(f'{TEST_GAME_MASTER_PREFIX}{self._token()}')
+        game_master.put()
+
+        squad_members = []
+        for _ in range(squads):
+            members = [Player(f'{TEST_PLAYER_PREFIX}{self._token()}') for _ in range(self.players_per_squad)]
+            for member in members:
+                member.put()
+            squad_members.append(members)
+
+        owned_squads = []
+        for members in squad_members:
+            owner = members[0]
+            with self.measure('create_squad'):
+                squad = owner.create_squad(f'test_squad_{self._token()}')
+            for member in members[1:]:
+                with self.measure('add_member_to_squad'):
+                    owner.add_member_to_squad(squad, member)
+            with self.measure('get_squads'):
+                owner.get_squads()
+            owned_squads.append((owner, squad))
+
+        lobby_name = f'test_lobby_{self._token()}'
+        with self.measure('create_lobby'):
+            game_master.create_lobby(lobby_name, size=squads, squad_size=self.players_per_squad)
+        with self.measure('update_lobby'):
+            game_master.update_lobby(lobby_name, game_zone_coordinates=GAME_ZONE_COORDINATES,
+                                     final_circle=FINAL_CIRCLE)
+        for _, squad in owned_squads:
+            with self.measure('add_squad_to_lobby'):
+                game_master.add_squad_to_lobby(lobby_name, squad)
+        with self.measure('get_squads_in_lobby'):
+            game_master.get_squads_in_lobby(lobby_name)
+
+        with self.measure('start_game'):
+            game_master.start_game(lobby_name)
+        with self.measure('get_players_in_lobby'):
+            game_master.get_players_in_lobby(lobby_name)
+        for members in squad_members[:DEATHS]:
+            with self.measure('set_player_dead'):
+                members[-1].dead()
+        with self.measure('end_game'):
+            game_master.end_game(lobby_name)
+        with self.measure('delete_lobby'):
+            game_master.delete_lobby(lobby_name)
+
+        for members, (owner, squad) in zip(squad_members, owned_squads):
+            squad.get()
+            if len(members) > 1:
+                with self.measure('remove_member_from_squad'):
+                    owner.remove_member_from_squad(squad, members[-1])
+            with self.measure('delete_squad'):
+                owner.delete_squad(squad)
+
+        return OrderedDict((operation, stats.summary()) for operation, stats in self.operations.items())
+
+    def _token(self):
+        return '%08x' % self.random.getrandbits(32)
+
+
+@contextmanager
+def stand_ins(local=False):
+    """
+    Point the models at the in-process stand-in for the table, or DynamoDB Local, and send websocket pushes and SQS
+    messages to in-process stand-ins. Restores whatever they replaced on exit
+    :param local: use DynamoDB Local rather than the in-process table
+    :return: table the models are using
+    """
+    replaced = DynamoDbConnector.table, ConnectionManager.gateway_api, SqsQueue.client
+    table_arn = os.getenv('TABLE')
+    try:
+        if local:
+            os.environ.setdefault('local_test', 'True')
+            table = DynamoDbConnector.get_table()
+        else:
+            table = install(LocalTable('benchmark'))
+        ConnectionManager.gateway_api = LocalManagementApi()
+        SqsQueue.client = LocalSqsClient()
+        yield table
+    finally:
+        DynamoDbConnector.table, ConnectionManager.gateway_api, SqsQueue.client = replaced
+        if table_arn is not None:
+            os.environ['TABLE'] = table_arn
+
+
+def benchmark(lobby_sizes, players_per_squad=4, seed=0, local=False):
+    """
+    :param lobby_sizes: numbers of squads in each lobby played
+    :param players_per_squad: number of players in each squad
+    :param seed: seed names are drawn from
+    :param local: use DynamoDB Local rather than the in-process table
+    :return: summary of each operation, keyed by lobby size then operation name
+    """
+    results = OrderedDict()
+    for squads in lobby_sizes:
+        # a new in-process table for each lobby, as the squads of every lobby share a partition. Lobbies played against
+        # DynamoDB Local are deleted before the next one starts
+        with stand_ins(local) as table:
+            flows = ModelFlows(table, players_per_squad, seed)
+            try:
+                results[squads] = flows.run(squads)
+            finally:
+                flows.round_trips.close()
+    return results
+
+
+def print_results(results):
+    lobby_sizes = list(results)
+    operations = list(results[lobby_sizes[0]])
+    for title, metric, scale, precision in (('round trips per call', 'round_trips', 1, 1),
+                                            ('mean ms per call', 'per_call', 1000, 2)):
+        print(f"{title:<28}" + ''.join(f"{f'{squads} squads':>12}" for squads in lobby_sizes))
+        for operation in operations:
+            print(f'{operation:<28}' + ''.join(f"{results[squads][operation][metric] * scale:>12.{precision}f}"
+                                               for squads in lobby_sizes))
+        print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the model flows across lobby sizes')
+    parser.add_argument('--squads', type=int, nargs='+', default=LOBBY_SIZES, help='numbers of squads in a lobby')
+    parser.add_argument('--players', type=int, default=4, help='players per squad')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--local', action='store_true',
+                        help='use DynamoDB Local, the table named by TABLE, rather than the in-process stand-in')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args()
+
+    results = benchmark(args.squads, args.players, args.seed, args.local)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Dumping the hot response shapes, as endpoint() does for each response:
+
+ - marshmallow: a new schema instance for every response, as endpoint() used to build
+ - cached: a schema instance reused for the life of the process
+ - precompiled: the dict builder compiled from the schema by handlers.serializers
+
+   > python -m benchmarks.serializers --squads 15 --iterations 1000
+"""
+import argparse
+from decimal import Decimal
+
+from benchmarks import measure, report
+from handlers import serializers
+from handlers.schemas import LobbyPlayerListSchema, LobbySchema, SquadSchema
+from models.map import Circle
+
+
+def responses(squads, players_per_squad):
+    """
+    :param squads: number of squads in the lobby
+    :param players_per_squad: number of players in each squad
+    :return: (name, schema class, body, many) of each response shape, shaped as the handlers return them
+    """
+    squad_list = [dict(name=f'squad_{index}', owner=f'player_{index}_0',
+                       members=[f'player_{index}_{member}' for member in range(players_per_squad)])
+                  for index in range(squads)]
+    lobby = dict(name='lobby', owner='game_master', state='STARTED', size=Decimal(squads), squad_size=Decimal(4),
+                 game_zone_coordinates=[dict(latitude='56.13', longitude='12.9')] * 4,
+                 current_circle=Circle(dict(centre=dict(latitude='56.131', longitude='12.901'), radius='0.4')),
+                 next_circle=Circle(dict(centre=dict(latitude='56.132', longitude='12.902'), radius='0.2')),
+                 final_circle=None, squads=squad_list)
+    players = dict(players=[dict(name=member, squad_name=squad['name'], state='ALIVE')
+                            for squad in squad_list for member in squad['members']])
+    return [('get_squads', SquadSchema, squad_list, True),
+            ('get_lobby', LobbySchema, lobby, False),
+            ('get_players_in_lobby', LobbyPlayerListSchema, players, False)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark dumping response schemas')
+    parser.add_argument('--squads', type=int, default=15)
+    parser.add_argument('--players', type=int, default=4, help='players per squad')
+    parser.add_argument('--iterations', type=int, default=500)
+    args = parser.parse_args()
+
+    for name, schema_class, body, many in responses(args.squads, args.players):
+        schema = serializers.get_schema(schema_class)
+        report(f'{name}/marshmallow', measure(lambda: schema_class().dumps(body, many=many), args.iterations))
+        report(f'{name}/cached', measure(lambda: schema.dumps(body, many=many), args.iterations))
+        report(f'{name}/precompiled', measure(lambda: serializers.dumps(schema_class, body, many=many),
+                                              args.iterations))
+
+
+if __name__ == '__main__':
+    main()
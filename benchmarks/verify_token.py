@@ -0,0 +1,47 @@
+"""
+Throughput of jwt.verify_token on the websocket authorize path, against tokens minted by a local issuer:
+
+ - cold: first verification in a new container, which loads jwks.json and constructs its keys
+ - warm: keys already constructed, but the token has not been verified before, so its signature is checked
+ - cached: the same token verified again, e.g. a client reconnecting, which is served from the verified token cache
+
+   > python -m benchmarks.verify_token --iterations 1000
+"""
+import argparse
+import os
+import tempfile
+
+import jwt
+from benchmarks import measure, report
+from local_services.token_issuer import LocalTokenIssuer
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark jwt.verify_token')
+    parser.add_argument('--iterations', type=int, default=500)
+    args = parser.parse_args()
+
+    issuer = LocalTokenIssuer()
+    directory = tempfile.mkdtemp()
+    jwks_path = issuer.write_jwks(os.path.join(directory, 'jwks.json'))
+    jwt.USER_POOL_CLIENT_ID = issuer.client_id
+    token = issuer.id_token('player-1')
+
+    def cold_start():
+        jwt.jwks = jwt.JsonWebKeySet(path=jwks_path)
+        jwt.verified_tokens.clear()
+
+    report('cold', measure(lambda: jwt.verify_token(token, id_token=True), args.iterations, setup=cold_start))
+
+    jwt.jwks = jwt.JsonWebKeySet(path=jwks_path)
+    jwt.verify_token(token, id_token=True)
+    report('warm', measure(lambda: jwt.verify_token(token, id_token=True), args.iterations,
+                           setup=jwt.verified_tokens.clear))
+
+    jwt.verified_tokens.clear()
+    report('cached', measure(lambda: jwt.verify_token(token, id_token=True), args.iterations))
+    print(jwt.verified_tokens.metrics())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Source of time for the game. Code which waits or reads the time goes through get_clock(), so a whole game can be run
+against a virtual clock, where waiting is instant and time only moves when the clock is advanced.
+"""
+import heapq
+import time
+from datetime import datetime
+from itertools import count
+
+
+class RealClock:
+    """
+    Wall clock time
+    """
+
+    def time(self):
+        """
+        :return: epoch time in seconds
+        """
+        return time.time()
+
+    def monotonic(self):
+        """
+        :return: seconds from a clock which never goes backwards, for measuring intervals
+        """
+        return time.monotonic()
+
+    def now(self, tz=None):
+        """
+        :param tz: timezone of the datetime
+        :return: current datetime
+        """
+        return datetime.now(tz=tz)
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+
+class VirtualClock:
+    """
+    Time which only moves when advanced. Sleeping advances the clock instead of waiting, running any timers which fall
+    due on the way in order, so background activity (e.g. simulated players) carries on while the game sleeps.
+    """
+
+    def __init__(self, start=None):
+        """
+        :param start: epoch time in seconds the clock starts at, defaults to the current time
+        """
+        self.current = time.time() if start is None else start
+        self.timers = []  # (time, sequence, callback) heap
+        self.sequence = count()
+
+    def time(self):
+        return self.current
+
+    def monotonic(self):
+        return self.current
+
+    def now(self, tz=None):
+        return datetime.fromtimestamp(self.current, tz=tz)
+
+    def sleep(self, seconds):
+        self.advance(seconds)
+
+    def advance(self, seconds):
+        """
+        Move the clock forward, running timers which fall due
+        :param seconds: number of seconds to move forward by
+        """
+        self.advance_to(self.current + seconds)
+
+    def advance_to(self, when):
+        """
+        Move the clock forward to a point in time, running timers which fall due
+        :param when: epoch time in seconds. Times in the past leave the clock where it is
+        """
+        while self.timers and self.timers[0][0] <= when:
+            due, _, callback = heapq.heappop(self.timers)
+            self.current = max(self.current, due)
+            callback()
+        self.current = max(self.current, when)
+
+    def call_at(self, when, callback):
+        """
+        Run a function once the clock reaches a point in time
+        :param when: epoch time in seconds
+        :param callback: function taking no arguments
+        """
+        heapq.heappush(self.timers, (when, next(self.sequence), callback))
+
+    def call_later(self, delay, callback):
+        """
+        Run a function once the clock has moved forward by a number of seconds
+        :param delay: seconds from now
+        :param callback: function taking no arguments
+        """
+        self.call_at(self.current + delay, callback)
+
+
+_clock = RealClock()
+
+
+def get_clock():
+    return _clock
+
+
+def set_clock(clock):
+    """
+    Replace the clock used by the game
+    :param clock: RealClock or VirtualClock
+    :return: the clock which was replaced
+    """
+    global _clock
+    previous, _clock = _clock, clock
+    return previous
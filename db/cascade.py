@@ -0,0 +1,85 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from db.dynamodb_connector import DynamoDbConnector
+
+
+class CascadePlan:
+    """
+    Every write of a cascading delete, planned up front before anything is written. Deletes and puts are sent with
+    BatchWriteItem, 25 items per request, and updates are sent in parallel. A later write to the same key replaces an
+    earlier one, and updates to a key which is deleted are dropped, since an update would otherwise recreate the item.
+    """
+
+    def __init__(self):
+        self.writes = OrderedDict()  # ('put', item) or ('delete', key), keyed by (pk, sk)
+        self.updates = OrderedDict()  # attribute updates, keyed by (pk, sk)
+
+    def __len__(self):
+        return len(self.writes) + len(self.updates)
+
+    def delete(self, key):
+        """
+        :param key: dict containing pk and sk of item to delete
+        """
+        self.writes[self._key(key)] = ('delete', key)
+        self.updates.pop(self._key(key), None)
+
+    def put(self, item):
+        """
+        :param item: item to write in place of any existing item
+        """
+        self.writes[self._key(item)] = ('put', item)
+        self.updates.pop(self._key(item), None)
+
+    def update(self, key, attribute_updates):
+        """
+        :param key: dict containing pk and sk of item to update
+        :param attribute_updates: AttributeUpdates of the item, merged with any planned for the same key
+        """
+        if self.writes.get(self._key(key), (None,))[0] == 'delete':
+            return
+        self.updates.setdefault(self._key(key), dict(Key=key, AttributeUpdates=dict()))['AttributeUpdates'].update(
+            attribute_updates)
+
+    def execute(self, table=None, max_workers=8, progress=None):
+        """
+        Run every planned write
+        :param table: table to write to, defaults to the table of DynamoDbConnector
+        :param max_workers: number of updates to send at the same time
+        :param progress: function taking the number of writes done and the total, called as writes complete
+        :return: None
+        """
+        table = table or DynamoDbConnector.get_table()
+        total = len(self)
+        done = 0
+
+        with table.batch_writer() as batch:
+            for write_type, item in self.writes.values():
+                if write_type == 'put':
+                    batch.put_item(Item=item)
+                else:
+                    batch.delete_item(Key=item)
+                done += 1
+                # the batch writer flushes every 25 items
+                if progress and done % 25 == 0:
+                    progress(done, total)
+        if progress and self.writes:
+            progress(done, total)
+
+        if not self.updates:
+            return
+        # the low level client is thread safe, unlike the table resource
+        client = table.meta.client
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(client.update_item, TableName=table.name, **update)
+                       for update in self.updates.values()]
+            for future in futures:
+                future.result()
+                done += 1
+                if progress:
+                    progress(done, total)
+
+    @staticmethod
+    def _key(item):
+        return item['pk'], item['sk']
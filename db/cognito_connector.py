@@ -0,0 +1,14 @@
+import boto3
+
+
+class CognitoConnector:
+    client = None
+
+    @classmethod
+    def get_client(cls):
+        """
+        Get Cognito client. The client is only created once it is first needed, and is then shared by every User
+        """
+        if not cls.client:
+            cls.client = boto3.client("cognito-idp", region_name="eu-central-1")
+        return cls.client
@@ -1,6 +1,21 @@
 import os
+
 import boto3
 
+import tracing
+from clock import get_clock
+
+# attribute holding the epoch time in seconds at which DynamoDB's Time to Live deletes an item
+TTL_ATTRIBUTE = 'expires'
+
+
+def expires_in(seconds):
+    """
+    :param seconds: number of seconds an item should live for
+    :return: value of the Time to Live attribute for an item expiring after the given number of seconds
+    """
+    return int(get_clock().time()) + seconds
+
 
 class AWSConfigurationException(Exception):
     pass
@@ -23,6 +38,8 @@ class DynamoDbConnector:
             else:
                 ddb = boto3.resource('dynamodb', endpoint_url='http://localhost:8005')
             cls.table = ddb.Table(table_name)
+            if tracing.sample_rate():
+                tracing.instrument_client(ddb.meta.client)
         return cls.table
 
     @classmethod
@@ -0,0 +1,30 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from db.dynamodb_connector import DynamoDbConnector
+
+
+def parallel_scan(total_segments=8, table=None, **scan_kwargs):
+    """
+    Scan a table with a Segment/TotalSegments parallel scan, following the pagination of every segment. Only meant for
+    ad-hoc scans. Anything which runs regularly should query an index instead
+    :param total_segments: number of segments to split the table into, each of which is scanned by its own thread
+    :param table: table to scan, defaults to the table of DynamoDbConnector
+    :param scan_kwargs: arguments passed on to every Scan request, e.g. FilterExpression
+    :return: list of items
+    """
+    table = table or DynamoDbConnector.get_table()
+    # the low level client is thread safe, unlike the table resource
+    client = table.meta.client
+
+    def scan_segment(segment):
+        items = []
+        request = dict(scan_kwargs, TableName=table.name, Segment=segment, TotalSegments=total_segments)
+        while True:
+            response = client.scan(**request)
+            items.extend(response['Items'])
+            if 'LastEvaluatedKey' not in response:
+                return items
+            request['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    with ThreadPoolExecutor(max_workers=total_segments) as executor:
+        return [item for items in executor.map(scan_segment, range(total_segments)) for item in items]
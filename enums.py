@@ -18,6 +18,22 @@ class PlayerState(Enum):
     DEAD = 'dead'
 
 
+class SessionRole(Enum):
+    """
+    Role a User has in a started Lobby, stored on their session ticket
+    """
+    PLAYER = 'player'
+    GAME_MASTER = 'game_master'
+
+
+class SyntheticEntityType(Enum):
+    """
+    Type of synthetic entity created by the test endpoints, stored in the sparse test-entity index
+    """
+    PLAYER = 'player'
+    GAME_MASTER = 'game_master'
+
+
 class WebSocketEventType(Enum):
     CONNECT = 'connect'
     DISCONNECT = 'disconnect'
@@ -40,3 +56,4 @@ class WebSocketPushMessageType(Enum):
     CIRCLE_CLOSING = 'circle_closing'
     NEXT_CIRCLE = 'next_circle'
     GAME_MASTER_MESSAGE = 'game_master_message'
+    BATCH = 'batch'
@@ -1,10 +1,6 @@
 from handlers.lambda_helpers import endpoint
-from models import player
 from exceptions import UserAlreadyExistsException, PasswordLengthException, InvalidUsernameException
-from models.user import User
 from exceptions import PlayerCannotBeDeletedException
-from models.player import Player
-from jwt import verify_token
 
 
 @endpoint()
@@ -12,6 +8,9 @@ def sign_up_handler(event, context):
     """
     Handler for signing up a user
     """
+    from models import player
+    from models.user import User
+
     body = event['body']
     username = body['username']
 
@@ -38,6 +37,8 @@ def sign_in_handler(event, context):
     """
     Handler for signing in a user
     """
+    from models.user import User
+
     body = event['body']
     result = User().sign_in(username=body['username'], password=body['password'])
     return result
@@ -48,6 +49,7 @@ def sign_out_handler(event, context):
     """
     Handler for signing out a user
     """
+    from models.user import User
 
     User().sign_out(access_token=event['body']['access_token'])
 
@@ -57,6 +59,7 @@ def refresh_tokens_handler(event, context):
     """
     Handler for signing out a user
     """
+    from models.user import User
 
     result = User().refresh_tokens(refresh_token=event['body']['refresh_token'])
 
@@ -68,6 +71,8 @@ def delete_user_handler(event, context):
     """
     Handler for deleting a user. Username and ID token must be provided.
     """
+    from jwt import verify_token
+    from models.player import Player
 
     access_token = event['body']['access_token']
 
@@ -2,9 +2,10 @@ import json
 from functools import wraps
 from json import JSONDecodeError
 
-from marshmallow import ValidationError
-
+import profiling
+import tracing
 from exceptions import ApiException
+from websockets.batching import message_batcher
 
 
 def endpoint(response_schema=None, request_schema=None):
@@ -17,25 +18,37 @@ def endpoint(response_schema=None, request_schema=None):
     def lambda_wrapper(func):
         @wraps(func)
         def wrapper(event, context):
-
-            set_calling_user(event)
-
-            preload_body(event, request_schema)
-
+            profile = profiling.start_profile(func.__name__)
+            trace = tracing.start_trace(func.__name__)
+            status = 'error'
             try:
-                result = func(event, context)
-                # if API exception was raised, catch and format for Lambda
-            except ApiException as e:
-                return handle_api_exception(e)
-            # if an error occurred in the code, make a 500 response
-            except Exception as e:
-                raise e
-
-            to_return = {
-                'statusCode': 200,
-                'body': postload_body(result, response_schema)
-            }
-            return to_return
+                with tracing.span('parse'):
+                    set_calling_user(event)
+
+                preload_body(event, request_schema)
+
+                try:
+                    with tracing.span('handler'):
+                        result = func(event, context)
+                    # if API exception was raised, catch and format for Lambda
+                except ApiException as e:
+                    status = e.error_code
+                    return handle_api_exception(e)
+                # if an error occurred in the code, make a 500 response
+                except Exception as e:
+                    raise e
+                finally:
+                    flush_websocket_messages()
+
+                to_return = {
+                    'statusCode': 200,
+                    'body': postload_body(result, response_schema)
+                }
+                status = 200
+                return to_return
+            finally:
+                tracing.finish_trace(trace, status=status)
+                profiling.finish_profile(profile, status=status)
         return wrapper
     return lambda_wrapper
 
@@ -49,24 +62,49 @@ def sqs_handler(func):
     def wrapper(*args, **kwargs):
         event, context = args
         records = event['Records']
-        for record in records:
-            try:
-                body = json.loads(record['body'])
-            except ValueError as e:
-                print(f"Invalid JSON. Discarding event. Invalid event: {str(record['body'])}")
-                continue
-            func(body, context, **kwargs)
+        profile = profiling.start_profile(func.__name__)
+        trace = tracing.start_trace(func.__name__)
+        try:
+            for record in records:
+                try:
+                    with tracing.span('parse'):
+                        body = json.loads(record['body'])
+                except ValueError as e:
+                    print(f"Invalid JSON. Discarding event. Invalid event: {str(record['body'])}")
+                    continue
+                with tracing.span('handler'):
+                    func(body, context, **kwargs)
+        finally:
+            flush_websocket_messages()
+            tracing.finish_trace(trace, records=len(records))
+            profiling.finish_profile(profile, records=len(records))
     return wrapper
 
 
+def flush_websocket_messages():
+    # messages held back by the websocket batching window must be sent before the Lambda is frozen
+    if message_batcher.pending:
+        from websockets.connection_manager import ConnectionManager
+        with tracing.span('flush'):
+            ConnectionManager().flush_messages()
+
+
 def postload_body(body, response_schema=None):
     # dump the body to a JSON string
+    with tracing.span('dump'):
+        return _dump_body(body, response_schema)
+
+
+def _dump_body(body, response_schema):
     if response_schema:
+        # marshmallow is already imported by the schema, and is not imported by handlers without one
+        from marshmallow import ValidationError
+        from handlers import serializers
         try:
             if isinstance(body, dict):
-                return response_schema().dumps(body)
+                return serializers.dumps(response_schema, body)
             elif isinstance(body, list):
-                return response_schema().dumps(body, many=True)
+                return serializers.dumps(response_schema, body, many=True)
         except ValidationError as e:
             raise ApiException("Response does not match specific response_schema", extras=e)
     else:
@@ -87,11 +125,14 @@ def preload_body(event, schema):
     if event['body']:
         # if a schema is given, try to load the request with that
         if schema:
-            event['body'] = schema().loads(event['body'])
+            from handlers.serializers import get_schema
+            with tracing.span('schema_load'):
+                event['body'] = get_schema(schema).loads(event['body'])
         # otherwise try to load body into JSON. If it fails, do nothing.
         else:
             try:
-                event['body'] = json.loads(event['body'])
+                with tracing.span('parse'):
+                    event['body'] = json.loads(event['body'])
             except JSONDecodeError:
                 pass
 
@@ -1,6 +1,9 @@
 from marshmallow import Schema, fields
 
+from handlers.serializers import precompiled
 
+
+@precompiled
 class SquadSchema(Schema):
     name = fields.String(required=True)
     owner = fields.String(required=True)
@@ -21,6 +24,7 @@ class CircleSchema(Schema):
     radius = fields.Float()
 
 
+@precompiled
 class LobbySchema(Schema):
     name = fields.String(required=True)
     owner = fields.String(required=True)
@@ -47,6 +51,7 @@ class LobbyPlayerState(Schema):
     state = fields.String(required=True)
 
 
+@precompiled
 class LobbyPlayerListSchema(Schema):
     players = fields.Nested(LobbyPlayerState, many=True)
 
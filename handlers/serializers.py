@@ -0,0 +1,155 @@
+"""
+Schemas used by endpoint(), built once per process rather than on every request, and dict builders precompiled from
+the hot response schemas.
+
+Dumping through marshmallow goes through several layers of calls for every field of every item. A schema decorated with
+@precompiled is instead dumped by a builder compiled from its fields the first time it is used, which reads and converts
+each field directly, producing the same output as marshmallow. Schemas with anything the builder does not reproduce,
+e.g. dump hooks, defaults or field types other than String, Integer, Float, List and Nested, are dumped by marshmallow.
+"""
+import json
+
+from marshmallow import Schema, fields, missing
+from marshmallow.decorators import POST_DUMP, PRE_DUMP
+
+# schema instances, keyed by schema class
+_schemas = dict()
+# precompiled dict builders, or None for schemas dumped by marshmallow, keyed by schema class
+_builders = dict()
+# schema classes with a precompiled fast path
+_precompiled = set()
+
+
+def precompiled(schema_class):
+    """
+    Class decorator giving a response schema a precompiled fast path
+    """
+    _precompiled.add(schema_class)
+    return schema_class
+
+
+def get_schema(schema_class):
+    """
+    :param schema_class: Schema class
+    :return: instance of the schema, built on first use and reused for the life of the process
+    """
+    schema = _schemas.get(schema_class)
+    if schema is None:
+        schema = _schemas[schema_class] = schema_class()
+    return schema
+
+
+def get_builder(schema_class):
+    """
+    :param schema_class: Schema class
+    :return: precompiled dict builder of the schema, or None if it is dumped by marshmallow
+    """
+    try:
+        return _builders[schema_class]
+    except KeyError:
+        builder = compile_builder(get_schema(schema_class)) if schema_class in _precompiled else None
+        _builders[schema_class] = builder
+        return builder
+
+
+def dumps(schema_class, obj, many=False):
+    """
+    Dump an object to a JSON string, through the precompiled builder of its schema if it has one
+    :param schema_class: Schema class
+    :param obj: object to dump
+    :param many: dump obj as a list of objects
+    :return: JSON string, as returned by Schema.dumps()
+    """
+    builder = get_builder(schema_class)
+    if builder is None:
+        return get_schema(schema_class).dumps(obj, many=many)
+    return json.dumps([builder(item) for item in obj] if many else builder(obj))
+
+
+def _get_value(obj, key):
+    # same lookup as marshmallow.utils.get_value for keys without dots: an item, falling back to an attribute
+    if not hasattr(obj, '__getitem__'):
+        return getattr(obj, key, missing)
+    try:
+        return obj[key]
+    except (KeyError, IndexError, TypeError, AttributeError):
+        return getattr(obj, key, missing)
+
+
+def _string(value):
+    if value is None or type(value) is str:
+        return value
+    if isinstance(value, bytes):
+        return value.decode('utf-8')
+    return str(value)
+
+
+def _integer(value):
+    return None if value is None else int(value)
+
+
+def _float(value):
+    return None if value is None else float(value)
+
+
+def _compile_field(field):
+    """
+    :param field: marshmallow field
+    :return: function converting a value the way the field serializes it, or None if the field cannot be compiled
+    """
+    field_type = type(field)
+    if field_type is fields.String:
+        return _string
+    if field_type in (fields.Integer, fields.Float):
+        if field.as_string:
+            return None
+        return _integer if field_type is fields.Integer else _float
+    if field_type is fields.List:
+        inner = _compile_field(field.inner)
+        if inner is None:
+            return None
+        return lambda value: None if value is None else [inner(item) for item in value]
+    if field_type is fields.Nested:
+        schema = field.schema
+        build = compile_builder(schema)
+        if build is None:
+            return None
+        if schema.many or field.many:
+            return lambda value: None if value is None else [build(item) for item in value]
+        return lambda value: None if value is None else build(value)
+    return None
+
+
+def compile_builder(schema):
+    """
+    Compile a function dumping an object the way a schema does
+    :param schema: Schema instance
+    :return: function taking an object and returning the same dict as schema.dump(), or None if the schema uses anything
+    the builder does not reproduce
+    """
+    if schema._hooks[PRE_DUMP] or schema._hooks[POST_DUMP] or type(schema).get_attribute is not Schema.get_attribute \
+            or schema.opts.render_module is not json:
+        return None
+
+    compiled = []
+    for attr_name, field in schema.dump_fields.items():
+        key = field.attribute if field.attribute is not None else attr_name
+        # dump_default was called default before marshmallow 3.13
+        default = field.dump_default if hasattr(field, 'dump_default') else field.default
+        if '.' in key or default is not missing or type(field).get_value is not fields.Field.get_value:
+            return None
+        serialize = _compile_field(field)
+        if serialize is None:
+            return None
+        compiled.append((field.data_key if field.data_key is not None else attr_name, key, serialize))
+    compiled = tuple(compiled)
+    dict_class = schema.dict_class
+
+    def build(obj):
+        result = dict_class()
+        for data_key, key, serialize in compiled:
+            value = _get_value(obj, key)
+            if value is not missing:
+                result[data_key] = serialize(value)
+        return result
+    return build
@@ -1,14 +1,16 @@
 from random import randint
 
-from boto3.dynamodb.conditions import Attr
+from boto3.dynamodb.conditions import Key
 
 from db.dynamodb_connector import DynamoDbConnector
+from enums import SyntheticEntityType
 from handlers.lambda_helpers import endpoint
 from handlers.schemas import SquadSchema
 from models.game_master import GameMaster
 from models.map import Circle
 from models.player import Player
 from models.squad import Squad
+from models.user import TEST_PLAYER_PREFIX, TEST_GAME_MASTER_PREFIX
 from helper_functions import create_test_players, create_test_squads, create_test_game_masters
 
 
@@ -18,7 +20,7 @@ def create_test_players_and_squads_handler(event, context):
     Handler for creating test players, and creating some squads from them. We will create 9 Players, then 3 squads
     of 3 with those 9 Players.
     """
-    test_player_usernames = [f"test_player_{randint(1, 100000)}" for i in range(0, 9)]
+    test_player_usernames = [f"{TEST_PLAYER_PREFIX}{randint(1, 100000)}" for i in range(0, 9)]
 
     created_players = create_test_players(test_player_usernames)
 
@@ -54,7 +56,7 @@ def create_test_lobby_and_squads_handler(event, context):
     of 3 with those 9 Players.
     """
     squad_name = event['pathParameters']['squadname']
-    test_player_usernames = [f"test_player_{randint(1, 100000)}" for i in range(0, 9)]
+    test_player_usernames = [f"{TEST_PLAYER_PREFIX}{randint(1, 100000)}" for i in range(0, 9)]
 
     # create test squad ands populate with fake players
     created_players = create_test_players(test_player_usernames)
@@ -68,7 +70,7 @@ def create_test_lobby_and_squads_handler(event, context):
             index += 1
 
     # create test game master, create lobby, and add all fake squads to it
-    game_master = create_test_game_masters([f'test_game_master_{randint(1, 100000)}'])[0]
+    game_master = create_test_game_masters([f'{TEST_GAME_MASTER_PREFIX}{randint(1, 100000)}'])[0]
     lobby_name = f"test_lobby_{randint(1, 100000)}"
     game_zone_coordinates = [dict(latitude="56.132501", longitude="12.903200"),
                              dict(latitude="56.132757", longitude="12.897164"),
@@ -114,14 +116,31 @@ def delete_test_lobby_and_squads_handler(event, context):
     _delete_test_players()
 
 
-def _delete_test_players():
+def _get_test_entities(entity_type):
+    """
+    Get usernames of synthetic users from the sparse test-entity index, which only contains items tagged as test
+    entities
+    :param entity_type: SyntheticEntityType of users to get
+    :return: list of usernames
+    """
     table = DynamoDbConnector.get_table()
-    players_to_delete = table.scan(
-        FilterExpression=Attr("pk").begins_with("test_player_") & Attr("sk").eq('USER')
+    query_kwargs = dict(
+        IndexName='test-entity',
+        KeyConditionExpression=Key('test-entity').eq(entity_type.value)
     )
-    for player in players_to_delete['Items']:
+    usernames = []
+    while True:
+        response = table.query(**query_kwargs)
+        usernames.extend(item['pk'] for item in response['Items'])
+        if 'LastEvaluatedKey' not in response:
+            return usernames
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def _delete_test_players():
+    for username in _get_test_entities(SyntheticEntityType.PLAYER):
         # get squad and fill with information
-        player = Player(player['pk'])
+        player = Player(username)
         try:
             player.delete(None)  # delete test player without access token (they do not exist in cognito anyway)
         except Exception as e:
@@ -129,13 +148,9 @@ def _delete_test_players():
 
 
 def _delete_test_game_masters():
-    table = DynamoDbConnector.get_table()
-    gms_to_delete = table.scan(
-        FilterExpression=Attr("pk").begins_with("test_game_master_") & Attr("sk").eq('USER')
-    )
-    for gm in gms_to_delete['Items']:
+    for username in _get_test_entities(SyntheticEntityType.GAME_MASTER):
         # get squad and fill with information
-        gamemaster = GameMaster(gm['pk'])
+        gamemaster = GameMaster(username)
         try:
             gamemaster.delete(None)  # delete test player without access token (they do not exist in cognito anyway)
         except Exception as e:
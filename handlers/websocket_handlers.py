@@ -41,7 +41,7 @@ def authorize_connection_handler(event, context):
     :param context: context
     :return: None
     """
-    from jwt import verify_token  # import here since it downloads a file each time it's run
+    from jwt import verify_token  # import here so tests can replace the jwt module
 
     connection_id = event['requestContext'].get('connectionId')
     access_token = event['body']['access_token']
@@ -54,8 +54,10 @@ def authorize_connection_handler(event, context):
     if not claims:
         connection_manager.disconnect_unauthorized_connection(connection_id)
 
-    # elevate the connection to a full connection to the respective game lobby
-    cm.ConnectionManager().authorize_connection(connection_id, claims['username'])
+    # elevate the connection to a full connection to the respective game lobby. ID tokens issued by Cognito carry the
+    # username as cognito:username
+    username = claims.get('cognito:username') or claims['username']
+    cm.ConnectionManager().authorize_connection(connection_id, username)
 
     return {
         'statusCode': 200,
@@ -111,3 +113,15 @@ def gamemaster_message_handler(event, context):
     message = event['body']['value']
 
     connection_manager.push_game_master_message(connection_id, message)
+
+
+def connection_sweeper_handler(event, context):
+    """
+    Scheduled handler that removes websocket connections which have expired, i.e. clients which never authorized or
+    disconnected without API Gateway calling $disconnect
+    :param event: scheduled event
+    :param context: context
+    :return: None
+    """
+    swept = cm.ConnectionManager().sweep_expired_connections()
+    print(f"Swept {swept} expired connections")
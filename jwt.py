@@ -1,9 +1,12 @@
 # Code taken from https://github.com/awslabs/aws-support-tools/tree/master/Cognito/decode-verify-jwt
 
+import hashlib
 import json
 import os
+import tempfile
 import time
 import urllib.request
+from collections import OrderedDict
 from jose import jwk, jwt
 from jose.utils import base64url_decode
 
@@ -11,30 +14,218 @@ REGION = 'eu-central-1'
 USER_POOL_ID = os.getenv('USER_POOL_ID')
 USER_POOL_CLIENT_ID = os.getenv('USER_POOL_CLIENT_ID')
 keys_url = 'https://cognito-idp.{}.amazonaws.com/{}/.well-known/jwks.json'.format(REGION, USER_POOL_ID)
-# instead of re-downloading the public keys every time
-# we download them only on cold start
-# https://aws.amazon.com/blogs/compute/container-reuse-in-lambda/
-if not os.getenv('local_test'):
-    with urllib.request.urlopen(keys_url) as f:
-        response = f.read()
-    keys = json.loads(response.decode('utf-8'))['keys']
+
+
+class JsonWebKeySet:
+    """
+    Public keys of the user pool, constructed once and indexed by kid. Nothing is loaded until the first token is
+    verified. Downloaded keys are cached on disk in /tmp, which outlives the module in a warm Lambda container
+    (https://aws.amazon.com/blogs/compute/container-reuse-in-lambda/), and are downloaded again whenever a token is
+    signed with a kid which is not in the cache, e.g. after Cognito rotated its keys.
+    Set $JWKS_FILE to a local jwks.json to verify tokens fully offline, e.g. in tests.
+    """
+
+    def __init__(self, url=None, path=None, cache_path=None, min_refresh_interval=300):
+        """
+        :param url: url to download jwks.json from. Defaults to the user pool's jwks.json
+        :param path: local jwks.json to read keys from instead of downloading them. Defaults to $JWKS_FILE
+        :param cache_path: file downloaded keys are cached in. Defaults to a file in /tmp per user pool
+        :param min_refresh_interval: seconds to wait between downloads, so tokens with made up kids cannot make every
+        call download the keys again
+        """
+        self.url = url or keys_url
+        self.path = path
+        self.cache_path = cache_path or os.path.join(tempfile.gettempdir(), f'jwks-{USER_POOL_ID}.json')
+        self.min_refresh_interval = min_refresh_interval
+        self.keys = None  # constructed public keys, keyed by kid
+        self.refreshed_at = None  # time keys were last read from their source rather than the cache
+
+    def get_key(self, kid):
+        """
+        Get the public key a token was signed with
+        :param kid: kid from the header of the token
+        :return: constructed public key, or None if the key set does not contain the kid
+        """
+        if self.keys is None:
+            self.load()
+        key = self.keys.get(kid)
+        if key is None and self.refresh():
+            key = self.keys.get(kid)
+        return key
+
+    def load(self):
+        """
+        Load keys from the local jwks.json if one is set, otherwise from the disk cache, downloading them if nothing has
+        been cached yet
+        """
+        local_path = self.local_path
+        if local_path:
+            self._set_keys(self._read(local_path))
+            self.refreshed_at = time.monotonic()
+        elif os.path.exists(self.cache_path):
+            try:
+                self._set_keys(self._read(self.cache_path))
+            except (OSError, ValueError, KeyError):
+                # a broken cache is no worse than an empty one
+                self.refresh(force=True)
+        else:
+            self.refresh(force=True)
+
+    def refresh(self, force=False):
+        """
+        Read keys from their source again, unless they were read less than min_refresh_interval seconds ago
+        :param force: refresh regardless of when keys were last read
+        :return: True if keys were refreshed
+        """
+        if not force and self.refreshed_at is not None \
+                and time.monotonic() - self.refreshed_at < self.min_refresh_interval:
+            return False
+        self.refreshed_at = time.monotonic()
+
+        local_path = self.local_path
+        if local_path:
+            self._set_keys(self._read(local_path))
+            return True
+
+        with urllib.request.urlopen(self.url) as f:
+            response = f.read()
+        self._set_keys(json.loads(response.decode('utf-8'))['keys'])
+        self._write_cache(response)
+        return True
+
+    @property
+    def local_path(self):
+        return self.path or os.getenv('JWKS_FILE')
+
+    def _set_keys(self, keys):
+        self.keys = {key['kid']: jwk.construct(key) for key in keys}
+
+    @staticmethod
+    def _read(path):
+        with open(path, 'r') as f:
+            return json.load(f)['keys']
+
+    def _write_cache(self, response):
+        # write to a temporary file first, so a concurrent read never sees a partly written cache
+        directory = os.path.dirname(self.cache_path) or '.'
+        try:
+            fd, temporary_path = tempfile.mkstemp(dir=directory)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(response)
+            os.replace(temporary_path, self.cache_path)
+        except OSError as e:
+            print(f'Failed to cache jwks.json: {e}')
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU of the claims of tokens which passed verification, kept until the token expires. Clients on flaky
+    networks reconnect and authorize with the same token many times, and only the first authorization needs to check
+    its signature. Tokens are keyed by digest, so raw tokens are never held in memory longer than needed.
+    """
+
+    def __init__(self, max_size=1024, clock=time.time):
+        """
+        :param max_size: maximum number of tokens to keep
+        :param clock: function returning the current epoch time in seconds
+        """
+        self.max_size = max_size
+        self.clock = clock
+        self.entries = OrderedDict()  # claims of verified tokens, keyed by token digest, least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.verified = 0  # number of tokens stored after verification
+        self.verify_time = 0.0  # total seconds spent verifying the stored tokens
+
+    @staticmethod
+    def key(token, id_token):
+        return hashlib.sha256(str(token).encode('utf-8')).hexdigest(), id_token
+
+    def get(self, token, id_token):
+        """
+        :param token: token to look up
+        :param id_token: whether the token was verified as an ID token or an access token
+        :return: claims of the token, or None if it has not been verified or has expired since
+        """
+        key = self.key(token, id_token)
+        claims = self.entries.get(key)
+        if claims is None:
+            self.misses += 1
+            return None
+        if self.clock() > claims['exp']:
+            del self.entries[key]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return dict(claims)
+
+    def put(self, token, id_token, claims, verify_time=0.0):
+        """
+        Store the claims of a verified token
+        :param token: verified token
+        :param id_token: whether the token was verified as an ID token or an access token
+        :param claims: verified claims of the token
+        :param verify_time: seconds it took to verify the token
+        """
+        self.verified += 1
+        self.verify_time += verify_time
+        key = self.key(token, id_token)
+        self.entries[key] = dict(claims)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = self.misses = self.verified = 0
+        self.verify_time = 0.0
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    @property
+    def time_saved(self):
+        """
+        Estimated seconds saved by cache hits, assuming each would have taken as long as an average verification
+        """
+        if not self.verified:
+            return 0.0
+        return self.hits * self.verify_time / self.verified
+
+    def metrics(self):
+        return dict(size=len(self.entries), hits=self.hits, misses=self.misses, hit_rate=self.hit_rate,
+                    time_saved=self.time_saved)
+
+
+jwks = JsonWebKeySet()
+verified_tokens = VerifiedTokenCache()
 
 
 def verify_token(token, id_token=False):
+    # tokens which have already passed verification skip the signature check until they expire
+    claims = verified_tokens.get(token, id_token)
+    if claims is not None:
+        return claims
+
+    started = time.perf_counter()
+    claims = _verify_token(token, id_token)
+    if claims:
+        verified_tokens.put(token, id_token, claims, verify_time=time.perf_counter() - started)
+    return claims
+
+
+def _verify_token(token, id_token=False):
     # get the kid from the headers prior to verification
     headers = jwt.get_unverified_headers(token)
     kid = headers['kid']
-    # search for the kid in the downloaded public keys
-    key_index = -1
-    for i in range(len(keys)):
-        if kid == keys[i]['kid']:
-            key_index = i
-            break
-    if key_index == -1:
+    # get the public key with the same kid
+    public_key = jwks.get_key(kid)
+    if public_key is None:
         print('Public key not found in jwks.json')
         return False
-    # construct the public key
-    public_key = jwk.construct(keys[key_index])
     # get the last two sections of the token,
     # message and signature (encoded in base64)
     message, encoded_signature = str(token).rsplit('.', 1)
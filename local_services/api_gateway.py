@@ -0,0 +1,540 @@
+"""
+Local stand-in for the API Gateway websocket API and its Management API, so websocket fan-out can be measured on one
+machine. Websocket clients connect to the server over real sockets, and the Management API operations
+(post_to_connection, get_connection, delete_connection) are served over HTTP on the same port. Point $WEBSOCKET_URL at
+the server to have ConnectionManager post through it:
+
+   > python -m local_services.api_gateway --port 8006 --latency-ms 20 --error-rate 0.01
+   > export WEBSOCKET_URL=http://localhost:8006
+
+boto3 still signs requests to the stand-in, so AWS_DEFAULT_REGION and (fake) credentials must be set in the environment.
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import random
+import struct
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from urllib.parse import unquote
+
+from botocore.exceptions import ClientError
+
+from enums import WebSocketPushMessageType
+
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+OPCODE_CONTINUATION = 0x0
+OPCODE_TEXT = 0x1
+OPCODE_BINARY = 0x2
+OPCODE_CLOSE = 0x8
+OPCODE_PING = 0x9
+OPCODE_PONG = 0xA
+
+HTTP_REASONS = {200: 'OK', 204: 'No Content', 400: 'Bad Request', 404: 'Not Found', 410: 'Gone',
+                429: 'Too Many Requests', 500: 'Internal Server Error'}
+
+
+def websocket_accept_key(key):
+    """
+    Computes the Sec-WebSocket-Accept header for a Sec-WebSocket-Key, as described in RFC 6455
+    """
+    digest = hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()
+    return base64.b64encode(digest).decode()
+
+
+def apply_mask(payload, mask):
+    """
+    XOR a websocket payload with its 4 byte mask. Done as one big integer operation, as looping over each byte in python
+    is too slow for large fan-outs
+    """
+    if not payload:
+        return payload
+    length = len(payload)
+    repeated_mask = (mask * (length // 4 + 1))[:length]
+    return (int.from_bytes(payload, 'big') ^ int.from_bytes(repeated_mask, 'big')).to_bytes(length, 'big')
+
+
+def encode_frame(opcode, payload, mask=False):
+    """
+    Encode a single, unfragmented websocket frame. Clients must mask their frames, servers must not
+    :param opcode: opcode of the frame
+    :param payload: bytes to send
+    :param mask: True if the frame is sent by a client
+    :return: encoded frame
+    """
+    header = bytearray([0x80 | opcode])
+    mask_bit = 0x80 if mask else 0
+    length = len(payload)
+    if length < 126:
+        header.append(mask_bit | length)
+    elif length < 2 ** 16:
+        header.append(mask_bit | 126)
+        header += struct.pack('!H', length)
+    else:
+        header.append(mask_bit | 127)
+        header += struct.pack('!Q', length)
+
+    if mask:
+        masking_key = os.urandom(4)
+        return bytes(header) + masking_key + apply_mask(payload, masking_key)
+    return bytes(header) + payload
+
+
+async def read_message(reader):
+    """
+    Read a complete websocket message, joining fragmented frames. Control frames are returned as they arrive
+    :param reader: asyncio StreamReader
+    :return: tuple of opcode and payload
+    """
+    message_opcode = None
+    fragments = []
+    while True:
+        head = await reader.readexactly(2)
+        fin = head[0] & 0x80
+        opcode = head[0] & 0x0F
+        masked = head[1] & 0x80
+        length = head[1] & 0x7F
+        if length == 126:
+            length = struct.unpack('!H', await reader.readexactly(2))[0]
+        elif length == 127:
+            length = struct.unpack('!Q', await reader.readexactly(8))[0]
+        masking_key = await reader.readexactly(4) if masked else None
+        payload = await reader.readexactly(length)
+        if masking_key:
+            payload = apply_mask(payload, masking_key)
+
+        if opcode >= OPCODE_CLOSE:
+            return opcode, payload
+
+        if opcode != OPCODE_CONTINUATION:
+            message_opcode = opcode
+        fragments.append(payload)
+        if fin:
+            return message_opcode, b''.join(fragments)
+
+
+async def read_http_request(reader):
+    """
+    Read a HTTP/1.1 request
+    :param reader: asyncio StreamReader
+    :return: tuple of method, path, headers (lower case names) and body
+    """
+    head = await reader.readuntil(b'\r\n\r\n')
+    request_line, *header_lines = head.decode('latin-1').split('\r\n')
+    method, path, _ = request_line.split(' ', 2)
+    headers = dict()
+    for line in header_lines:
+        if line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers.get('content-length', 0)))
+    return method, path, headers, body
+
+
+class LocalConnection:
+    """
+    A websocket client connected to the stand-in
+    """
+
+    def __init__(self, connection_id, writer, source_ip):
+        self.connection_id = connection_id
+        self.writer = writer
+        self.source_ip = source_ip
+        self.connected_at = datetime.now(tz=timezone.utc)
+        self.last_active_at = self.connected_at
+
+    async def send(self, data):
+        self.writer.write(encode_frame(OPCODE_TEXT, data))
+        await self.writer.drain()
+        self.last_active_at = datetime.now(tz=timezone.utc)
+
+    def close(self):
+        try:
+            self.writer.write(encode_frame(OPCODE_CLOSE, struct.pack('!H', 1000)))
+        finally:
+            self.writer.close()
+
+
+class LocalApiGateway:
+    """
+    Serves websocket clients and the API Gateway Management API on a single port.
+    Handlers can be attached to receive connects, disconnects and messages from clients, and are run in a thread pool
+    since they will usually post back to the stand-in through boto3.
+    """
+
+    def __init__(self, host='localhost', port=8006, latency=0.0, jitter=0.0, error_rate=0.0, gone_rate=0.0,
+                 on_connect=None, on_disconnect=None, on_message=None, handler_threads=32, seed=None):
+        """
+        :param host: host to listen on
+        :param port: port to listen on. 0 picks a free port
+        :param latency: seconds added to every Management API call
+        :param jitter: up to this many random seconds are added on top of latency
+        :param error_rate: probability of a post_to_connection call failing with LimitExceededException
+        :param gone_rate: probability of a post_to_connection call failing with GoneException, as if the client had
+        disconnected ungracefully. The client is dropped when this happens
+        :param on_connect: function taking a connection_id, called when a client connects
+        :param on_disconnect: function taking a connection_id, called when a client disconnects
+        :param on_message: function taking a connection_id and message body, called for each message from a client
+        :param handler_threads: size of the thread pool handlers are run in
+        :param seed: seed for latency and error injection
+        """
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.gone_rate = gone_rate
+        self.on_connect = on_connect
+        self.on_disconnect = on_disconnect
+        self.on_message = on_message
+        self.random = random.Random(seed)
+        self.executor = ThreadPoolExecutor(max_workers=handler_threads)
+        self.connections = dict()  # LocalConnection of each connected client, keyed by connection_id
+        self.stats = Counter()
+        self.loop = None
+        self.server = None
+        self._thread = None
+        self._started = threading.Event()
+
+    @property
+    def url(self):
+        """
+        URL to set $WEBSOCKET_URL to. The same URL serves websocket clients
+        """
+        return f'http://{self.host}:{self.port}'
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.server = await asyncio.start_server(self._handle_client, self.host, self.port, limit=2 ** 20,
+                                                 backlog=4096)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        for connection in list(self.connections.values()):
+            connection.close()
+        self.connections.clear()
+        self.server.close()
+        await self.server.wait_closed()
+
+    def start_in_thread(self):
+        """
+        Run the stand-in on its own event loop in a background thread
+        :return: URL of the stand-in
+        """
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.start())
+            self._started.set()
+            loop.run_forever()
+
+            # close any Management API connections boto3 kept alive before closing the loop
+            tasks = asyncio.all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            loop.close()
+
+        self._thread = threading.Thread(target=run, name='local-api-gateway', daemon=True)
+        self._thread.start()
+        self._started.wait()
+        return self.url
+
+    def stop_thread(self):
+        asyncio.run_coroutine_threadsafe(self.stop(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.executor.shutdown(wait=False)
+
+    async def _handle_client(self, reader, writer):
+        try:
+            method, path, headers, body = await read_http_request(reader)
+            if headers.get('upgrade', '').lower() == 'websocket':
+                await self._handle_websocket(reader, writer, headers)
+                return
+
+            # Management API clients keep their connection alive between requests
+            while True:
+                await self._handle_management_request(writer, method, path, body)
+                method, path, headers, body = await read_http_request(reader)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except asyncio.CancelledError:
+            # connections kept alive are cancelled when the stand-in stops. Finish quietly rather than have asyncio
+            # report every one of them
+            pass
+        finally:
+            writer.close()
+
+    async def _handle_websocket(self, reader, writer, headers):
+        writer.write(('HTTP/1.1 101 Switching Protocols\r\n'
+                      'Upgrade: websocket\r\n'
+                      'Connection: Upgrade\r\n'
+                      f'Sec-WebSocket-Accept: {websocket_accept_key(headers["sec-websocket-key"])}\r\n'
+                      '\r\n').encode())
+        await writer.drain()
+
+        connection_id = base64.b64encode(os.urandom(10)).decode()
+        connection = LocalConnection(connection_id, writer, writer.get_extra_info('peername')[0])
+        self.connections[connection_id] = connection
+        self.stats['connects'] += 1
+
+        # the connection_id is sent to the client, so load tests can match clients to their connections
+        await connection.send(json.dumps(dict(connection_id=connection_id)).encode())
+        await self._run_handler(self.on_connect, connection_id)
+
+        try:
+            while True:
+                opcode, payload = await read_message(reader)
+                if opcode == OPCODE_CLOSE:
+                    break
+                if opcode == OPCODE_PING:
+                    writer.write(encode_frame(OPCODE_PONG, payload))
+                    continue
+                if opcode in (OPCODE_TEXT, OPCODE_BINARY):
+                    self.stats['messages_received'] += 1
+                    connection.last_active_at = datetime.now(tz=timezone.utc)
+                    self.loop.create_task(self._run_handler(self.on_message, connection_id, payload.decode()))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if self.connections.pop(connection_id, None):
+                self.stats['disconnects'] += 1
+                await self._run_handler(self.on_disconnect, connection_id)
+
+    async def _run_handler(self, handler, *args):
+        if handler is None:
+            return
+        try:
+            await self.loop.run_in_executor(self.executor, handler, *args)
+        except Exception as e:
+            self.stats['handler_errors'] += 1
+            print(f'Handler {handler.__name__} failed: {e}')
+
+    async def _handle_management_request(self, writer, method, path, body):
+        # endpoint may include the stage, e.g. /dev/@connections/{connectionId}
+        if '/@connections/' not in path:
+            await self._respond(writer, 404, error='NotFoundException')
+            return
+        connection_id = unquote(path.split('/@connections/', 1)[1])
+
+        if self.latency or self.jitter:
+            await asyncio.sleep(self.latency + self.random.uniform(0, self.jitter))
+
+        connection = self.connections.get(connection_id)
+        if method == 'POST':
+            self.stats['posts'] += 1
+            if connection and self.random.random() < self.gone_rate:
+                # client drops off without closing the websocket
+                self.connections.pop(connection_id)
+                connection.writer.close()
+                connection = None
+            if connection is None:
+                self.stats['gone'] += 1
+                await self._respond(writer, 410, error='GoneException')
+            elif self.random.random() < self.error_rate:
+                self.stats['throttled'] += 1
+                await self._respond(writer, 429, error='LimitExceededException')
+            else:
+                try:
+                    await connection.send(body)
+                    self.stats['delivered'] += 1
+                    await self._respond(writer, 200)
+                except ConnectionError:
+                    self.stats['gone'] += 1
+                    await self._respond(writer, 410, error='GoneException')
+
+        elif method == 'GET':
+            if connection is None:
+                await self._respond(writer, 410, error='GoneException')
+            else:
+                await self._respond(writer, 200, body=dict(
+                    connectedAt=connection.connected_at.isoformat(),
+                    lastActiveAt=connection.last_active_at.isoformat(),
+                    identity=dict(sourceIp=connection.source_ip, userAgent='local')))
+
+        elif method == 'DELETE':
+            if connection is None:
+                await self._respond(writer, 410, error='GoneException')
+            else:
+                self.connections.pop(connection_id)
+                connection.close()
+                await self._respond(writer, 204)
+        else:
+            await self._respond(writer, 400, error='BadRequestException')
+
+    @staticmethod
+    async def _respond(writer, status, body=None, error=None):
+        headers = {'Content-Type': 'application/json', 'x-amzn-RequestId': base64.b32encode(os.urandom(10)).decode()}
+        if error:
+            # botocore reads the error code of rest-json services from this header
+            headers['x-amzn-ErrorType'] = error
+            body = dict(message=None)
+        payload = json.dumps(body).encode() if body is not None else b''
+        headers['Content-Length'] = str(len(payload))
+
+        head = f'HTTP/1.1 {status} {HTTP_REASONS.get(status, "")}\r\n'
+        head += ''.join(f'{name}: {value}\r\n' for name, value in headers.items())
+        writer.write(head.encode() + b'\r\n' + payload)
+        await writer.drain()
+
+
+class GoneException(ClientError):
+    def __init__(self, connection_id):
+        super().__init__({'Error': {'Code': 'GoneException', 'Message': f'{connection_id} is gone'}},
+                         'PostToConnection')
+
+
+class LocalManagementApi:
+    """
+    In-process stand-in for the Management API client, for runs which do not need real sockets, e.g. the simulator.
+    Posts to connected clients are counted by message type, and posts to anything else fail with GoneException. Set
+    ConnectionManager.gateway_api to an instance to have every fan-out post to it.
+    """
+    exceptions = SimpleNamespace(GoneException=GoneException)
+
+    def __init__(self, record=False, on_message=None):
+        """
+        :param record: keep every message posted, in self.received
+        :param on_message: function taking a connection_id and message, called for each message posted to a client
+        """
+        self.record = record
+        self.on_message = on_message
+        self.connections = set()  # connection_id's of connected clients
+        self.received = dict()  # messages posted to each client if recording, keyed by connection_id
+        self.stats = Counter()  # number of posts, and of messages by event_type
+        self.lock = threading.Lock()
+
+    def connect(self, connection_id):
+        with self.lock:
+            self.connections.add(connection_id)
+
+    def disconnect(self, connection_id):
+        with self.lock:
+            self.connections.discard(connection_id)
+
+    def post_to_connection(self, ConnectionId, Data):
+        with self.lock:
+            if ConnectionId not in self.connections:
+                self.stats['gone'] += 1
+                raise GoneException(ConnectionId)
+            message = json.loads(Data)
+            self.stats['posts'] += 1
+            # a framed batch counts as each of the messages in it
+            messages = message['value'] if message.get('event_type') == WebSocketPushMessageType.BATCH.value else [message]
+            for each in messages:
+                self.stats[each.get('event_type')] += 1
+            if self.record:
+                self.received.setdefault(ConnectionId, []).append(message)
+        if self.on_message:
+            for each in messages:
+                self.on_message(ConnectionId, each)
+
+
+class LocalWebSocketClient:
+    """
+    Minimal asyncio websocket client for connecting to the stand-in
+    """
+
+    def __init__(self, reader, writer, connection_id):
+        self.reader = reader
+        self.writer = writer
+        self.connection_id = connection_id
+
+    @classmethod
+    async def connect(cls, host='localhost', port=8006, path='/'):
+        reader, writer = await asyncio.open_connection(host, port, limit=2 ** 20)
+        key = base64.b64encode(os.urandom(16)).decode()
+        writer.write((f'GET {path} HTTP/1.1\r\n'
+                      f'Host: {host}:{port}\r\n'
+                      'Upgrade: websocket\r\n'
+                      'Connection: Upgrade\r\n'
+                      f'Sec-WebSocket-Key: {key}\r\n'
+                      'Sec-WebSocket-Version: 13\r\n'
+                      '\r\n').encode())
+        await writer.drain()
+
+        head = await reader.readuntil(b'\r\n\r\n')
+        if b' 101 ' not in head.split(b'\r\n', 1)[0] or websocket_accept_key(key).encode() not in head:
+            writer.close()
+            raise ConnectionError('Websocket handshake failed')
+
+        # the stand-in greets each client with its connection_id
+        _, greeting = await read_message(reader)
+        return cls(reader, writer, json.loads(greeting)['connection_id'])
+
+    async def send(self, message):
+        """
+        :param message: dict to send as JSON
+        """
+        self.writer.write(encode_frame(OPCODE_TEXT, json.dumps(message).encode(), mask=True))
+        await self.writer.drain()
+
+    async def recv(self):
+        """
+        Wait for the next message posted to this client
+        :return: text of the message
+        """
+        while True:
+            opcode, payload = await read_message(self.reader)
+            if opcode == OPCODE_CLOSE:
+                raise ConnectionError('Websocket closed')
+            if opcode == OPCODE_PING:
+                self.writer.write(encode_frame(OPCODE_PONG, payload, mask=True))
+                continue
+            if opcode in (OPCODE_TEXT, OPCODE_BINARY):
+                return payload.decode()
+
+    async def close(self):
+        try:
+            self.writer.write(encode_frame(OPCODE_CLOSE, struct.pack('!H', 1000), mask=True))
+            await self.writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the API Gateway websocket Management API')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8006)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='latency added to every Management API call')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='random latency added on top of --latency-ms')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='probability of a post failing with LimitExceededException')
+    parser.add_argument('--gone-rate', type=float, default=0.0,
+                        help='probability of a post failing with GoneException')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    gateway = LocalApiGateway(host=args.host, port=args.port, latency=args.latency_ms / 1000,
+                              jitter=args.jitter_ms / 1000, error_rate=args.error_rate, gone_rate=args.gone_rate,
+                              seed=args.seed)
+
+    async def serve():
+        await gateway.start()
+        print(f'Listening on {gateway.url}. Set WEBSOCKET_URL={gateway.url}')
+        started = time.monotonic()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            elapsed = time.monotonic() - started
+            print(f'{dict(gateway.stats)} over {elapsed:.1f}s')
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,335 @@
+"""
+In-process stand-in for the DynamoDB table, so models can be driven without DynamoDB Local or AWS, e.g. by the world
+generator, the simulator and benchmarks. It implements the subset of the boto3 Table resource this repo uses, with the
+same key schema and indexes as the real table, and counts every operation as the DynamoDB API would see it.
+
+Values are passed through boto3's type serializer on every write, so anything DynamoDB would reject (e.g. floats) is
+rejected here too. Results are never paginated.
+
+   >>> from local_services.dynamodb import LocalTable, install
+   >>> table = install(LocalTable())  # DynamoDbConnector.get_table() now returns the stand-in
+"""
+import copy
+import os
+import threading
+from collections import Counter, defaultdict
+
+from boto3.dynamodb import conditions
+from boto3.dynamodb.types import TypeSerializer, TypeDeserializer
+from botocore.exceptions import ClientError
+
+from db.dynamodb_connector import DynamoDbConnector
+
+# hash and range key of the table and each of its indexes
+KEY_SCHEMA = {
+    None: ('pk', 'sk'),
+    'lsi': ('pk', 'lsi'),
+    'lsi-2': ('pk', 'lsi-2'),
+    'test-entity': ('test-entity', 'pk'),
+}
+
+BATCH_WRITE_SIZE = 25
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+
+def install(table=None):
+    """
+    Make DynamoDbConnector.get_table() return a stand-in table
+    :param table: LocalTable to install. A new, empty table is created if not given
+    :return: installed LocalTable
+    """
+    table = table or LocalTable()
+    os.environ['TABLE'] = f'table/{table.name}'
+    DynamoDbConnector.table = table
+    return table
+
+
+def evaluate(condition, item):
+    """
+    Evaluate a boto3 condition, as built with Key() and Attr(), against an item
+    :param condition: condition to evaluate
+    :param item: item to evaluate it against
+    :return: True if the item satisfies the condition
+    """
+    if isinstance(condition, conditions.And):
+        return all(evaluate(value, item) for value in condition._values)
+    if isinstance(condition, conditions.Or):
+        return any(evaluate(value, item) for value in condition._values)
+    if isinstance(condition, conditions.Not):
+        return not evaluate(condition._values[0], item)
+
+    name = condition._values[0].name
+    if isinstance(condition, conditions.AttributeExists):
+        return name in item
+    if isinstance(condition, conditions.AttributeNotExists):
+        return name not in item
+    if name not in item:
+        return False
+
+    value, operands = item[name], condition._values[1:]
+    try:
+        if isinstance(condition, conditions.Equals):
+            return value == operands[0]
+        if isinstance(condition, conditions.NotEquals):
+            return value != operands[0]
+        if isinstance(condition, conditions.LessThan):
+            return value < operands[0]
+        if isinstance(condition, conditions.LessThanEquals):
+            return value <= operands[0]
+        if isinstance(condition, conditions.GreaterThan):
+            return value > operands[0]
+        if isinstance(condition, conditions.GreaterThanEquals):
+            return value >= operands[0]
+        if isinstance(condition, conditions.Between):
+            return operands[0] <= value <= operands[1]
+        if isinstance(condition, conditions.In):
+            return value in operands[0]
+        if isinstance(condition, conditions.BeginsWith):
+            return isinstance(value, str) and value.startswith(operands[0])
+        if isinstance(condition, conditions.Contains):
+            return operands[0] in value
+    except TypeError:
+        # values of different types never compare as true
+        return False
+    raise NotImplementedError(f'{type(condition).__name__} conditions are not supported by the local table')
+
+
+def _hash_key_value(condition, hash_name):
+    # the value the key condition requires the hash key to equal
+    if isinstance(condition, conditions.And):
+        for value in condition._values:
+            hash_value = _hash_key_value(value, hash_name)
+            if hash_value is not None:
+                return hash_value
+    elif isinstance(condition, conditions.Equals) and condition._values[0].name == hash_name:
+        return condition._values[1]
+    return None
+
+
+def _validation_error(operation_name, message):
+    return ClientError({'Error': {'Code': 'ValidationException', 'Message': message}}, operation_name)
+
+
+def _response(**kwargs):
+    return dict(kwargs, ResponseMetadata={'HTTPStatusCode': 200})
+
+
+class LocalTable:
+    """
+    A DynamoDB table held in memory. Safe to use from several threads
+    """
+
+    def __init__(self, name='local-table'):
+        self.name = name
+        self._name = name  # checked by DynamoDbConnector
+        self.items = dict()  # every item, keyed by (pk, sk)
+        self.partitions = {index_name: defaultdict(set) for index_name in KEY_SCHEMA}  # (pk, sk)'s by hash key
+        self.operations = Counter()  # number of requests, keyed by DynamoDB operation name
+        self.lock = threading.RLock()
+        self.meta = LocalTableMeta(LocalClient(self))
+
+    def put_item(self, Item, **kwargs):
+        with self.lock:
+            self.operations['PutItem'] += 1
+            self._put(Item)
+        return _response()
+
+    def get_item(self, Key, ProjectionExpression=None, ExpressionAttributeNames=None, **kwargs):
+        with self.lock:
+            self.operations['GetItem'] += 1
+            item = self.items.get(self._key(Key))
+            if item is None:
+                return _response()
+            return _response(Item=self._project(item, ProjectionExpression, ExpressionAttributeNames))
+
+    def delete_item(self, Key, **kwargs):
+        with self.lock:
+            self.operations['DeleteItem'] += 1
+            self._delete(Key)
+        return _response()
+
+    def update_item(self, Key, AttributeUpdates=None, **kwargs):
+        if 'UpdateExpression' in kwargs:
+            raise NotImplementedError('UpdateExpression is not supported by the local table, use AttributeUpdates')
+        with self.lock:
+            self.operations['UpdateItem'] += 1
+            item = copy.deepcopy(self.items.get(self._key(Key), dict(Key)))
+            for name, update in (AttributeUpdates or dict()).items():
+                action = update.get('Action', 'PUT')
+                if action == 'PUT':
+                    item[name] = update['Value']
+                elif action == 'DELETE':
+                    item.pop(name, None)
+                elif action == 'ADD':
+                    item[name] = item.get(name, 0) + update['Value']
+            self._put(item)
+        return _response()
+
+    def query(self, KeyConditionExpression, IndexName=None, FilterExpression=None, ProjectionExpression=None,
+              ExpressionAttributeNames=None, ScanIndexForward=True, Limit=None, **kwargs):
+        hash_name, range_name = KEY_SCHEMA[IndexName]
+        hash_value = _hash_key_value(KeyConditionExpression, hash_name)
+        if hash_value is None:
+            raise _validation_error('Query', f'Query condition missed key schema element: {hash_name}')
+
+        with self.lock:
+            self.operations['Query'] += 1
+            items = [self.items[key] for key in self.partitions[IndexName].get(hash_value, ())]
+            items = [item for item in items if range_name in item and evaluate(KeyConditionExpression, item)]
+            items.sort(key=lambda item: item[range_name], reverse=not ScanIndexForward)
+            if Limit:
+                items = items[:Limit]
+            scanned = len(items)
+            if FilterExpression is not None:
+                items = [item for item in items if evaluate(FilterExpression, item)]
+            items = [self._project(item, ProjectionExpression, ExpressionAttributeNames) for item in items]
+        return _response(Items=items, Count=len(items), ScannedCount=scanned)
+
+    def scan(self, FilterExpression=None, ProjectionExpression=None, ExpressionAttributeNames=None, Segment=None,
+             TotalSegments=None, **kwargs):
+        with self.lock:
+            self.operations['Scan'] += 1
+            items = list(self.items.values())
+            if TotalSegments:
+                items = [item for item in items if hash(item['pk']) % TotalSegments == Segment]
+            scanned = len(items)
+            if FilterExpression is not None:
+                items = [item for item in items if evaluate(FilterExpression, item)]
+            items = [self._project(item, ProjectionExpression, ExpressionAttributeNames) for item in items]
+        return _response(Items=items, Count=len(items), ScannedCount=scanned)
+
+    def batch_writer(self, overwrite_by_pkeys=None):
+        return LocalBatchWriter(self, overwrite_by_pkeys)
+
+    def batch_write(self, requests):
+        """
+        Run a single BatchWriteItem request
+        :param requests: list of ('put', item) or ('delete', key) tuples
+        """
+        if len(requests) > BATCH_WRITE_SIZE:
+            raise _validation_error('BatchWriteItem', 'Too many items requested for the BatchWriteItem call')
+        keys = [self._key(item) for _, item in requests]
+        if len(set(keys)) != len(keys):
+            raise _validation_error('BatchWriteItem', 'Provided list of item keys contains duplicates')
+        with self.lock:
+            self.operations['BatchWriteItem'] += 1
+            for request_type, item in requests:
+                if request_type == 'put':
+                    self._put(item)
+                else:
+                    self._delete(item)
+
+    def delete(self):
+        with self.lock:
+            self.items.clear()
+            for partitions in self.partitions.values():
+                partitions.clear()
+
+    def _put(self, item):
+        key = self._key(item)
+        self._delete(item)
+        # round trip through the serializer, so values are stored the way DynamoDB would return them
+        item = {name: _deserializer.deserialize(_serializer.serialize(value)) for name, value in item.items()}
+        self.items[key] = item
+        for index_name, (hash_name, range_name) in KEY_SCHEMA.items():
+            # indexes are sparse, items without the index's keys are not in it
+            if hash_name in item and range_name in item:
+                self.partitions[index_name][item[hash_name]].add(key)
+
+    def _delete(self, key):
+        item = self.items.pop(self._key(key), None)
+        if item is None:
+            return
+        for index_name, (hash_name, _) in KEY_SCHEMA.items():
+            if hash_name in item:
+                partition = self.partitions[index_name].get(item[hash_name])
+                if partition is not None:
+                    partition.discard(self._key(item))
+                    if not partition:
+                        del self.partitions[index_name][item[hash_name]]
+
+    @staticmethod
+    def _key(item):
+        return item['pk'], item['sk']
+
+    @staticmethod
+    def _project(item, projection_expression, attribute_names):
+        if not projection_expression:
+            return copy.deepcopy(item)
+        attribute_names = attribute_names or dict()
+        names = [attribute_names.get(name.strip(), name.strip()) for name in projection_expression.split(',')]
+        return {name: copy.deepcopy(item[name]) for name in names if name in item}
+
+
+class LocalBatchWriter:
+    """
+    Buffers writes and sends them as BatchWriteItem requests of 25 items, like boto3's batch writer
+    """
+
+    def __init__(self, table, overwrite_by_pkeys=None):
+        self.table = table
+        self.overwrite_by_pkeys = overwrite_by_pkeys
+        self.requests = []
+
+    def put_item(self, Item):
+        self._add(('put', Item))
+
+    def delete_item(self, Key):
+        self._add(('delete', Key))
+
+    def _add(self, request):
+        if self.overwrite_by_pkeys:
+            key = self.table._key(request[1])
+            self.requests = [r for r in self.requests if self.table._key(r[1]) != key]
+        self.requests.append(request)
+        if len(self.requests) >= BATCH_WRITE_SIZE:
+            self._flush()
+
+    def _flush(self):
+        while self.requests:
+            requests, self.requests = self.requests[:BATCH_WRITE_SIZE], self.requests[BATCH_WRITE_SIZE:]
+            self.table.batch_write(requests)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self._flush()
+
+
+class LocalTableMeta:
+    def __init__(self, client):
+        self.client = client
+
+
+class LocalClient:
+    """
+    Stand-in for table.meta.client, the low level client of the table resource, for the operations called on it
+    directly
+    """
+
+    def __init__(self, table):
+        self.table = table
+
+    def batch_get_item(self, RequestItems):
+        responses = dict()
+        for table_name, request in RequestItems.items():
+            with self.table.lock:
+                self.table.operations['BatchGetItem'] += 1
+                items = [self.table.items.get(self.table._key(key)) for key in request['Keys']]
+                responses[table_name] = [
+                    self.table._project(item, request.get('ProjectionExpression'),
+                                        request.get('ExpressionAttributeNames'))
+                    for item in items if item is not None]
+        return _response(Responses=responses, UnprocessedKeys=dict())
+
+    def update_item(self, TableName, **kwargs):
+        return self.table.update_item(**kwargs)
+
+    def query(self, TableName, **kwargs):
+        return self.table.query(**kwargs)
+
+    def scan(self, TableName, **kwargs):
+        return self.table.scan(**kwargs)
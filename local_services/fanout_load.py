@@ -0,0 +1,452 @@
+"""
+Websocket fan-out load harness. Opens a websocket client over a real socket for every player and Game Master of a
+synthetic world, against the local API Gateway stand-in, and authorizes each of them into their started lobby with a
+locally minted token. Players then send 'location' messages and Game Masters 'fromgm' messages at a fixed rate, which
+the stand-in routes to the websocket handlers in-process, exactly as API Gateway routes them to the Lambdas. Handlers
+post back through the Management API over HTTP, so every delivery crosses a socket twice.
+
+Each stage runs at a rate of location messages per player per second, and reports end-to-end delivery latency
+percentiles (from a client sending a message to each recipient receiving it), dropped deliveries and throughput. Rates
+are stepped up one stage at a time, so ConnectionManager saturates where delivered throughput stops growing with the
+offered rate and latency climbs:
+
+   > python -m local_services.fanout_load --lobbies 10 --squads 15 --players 4 --rates 0.1 0.5 1 2 --seconds 20
+
+Thousands of clients need a file descriptor each on both ends of their socket, so the soft limit on open files is
+raised to the hard limit on start. DynamoDB is the in-process stand-in unless --local is given.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+import jwt
+from benchmarks import summarise
+from db.dynamodb_connector import DynamoDbConnector
+from enums import WebSocketEventType, WebSocketPushMessageType
+from handlers.websocket_handlers import authorize_connection_handler, connection_handler, default_handler, \
+    gamemaster_message_handler, player_location_message_handler
+from local_services.api_gateway import LocalApiGateway, LocalWebSocketClient
+from local_services.dynamodb import LocalTable, install
+from local_services.sqs import LocalSqsClient
+from local_services.token_issuer import LocalTokenIssuer
+from local_services.world_generator import WorldGenerator
+from sqs.utils import SqsQueue
+from websockets.connection_manager import ConnectionManager
+from websockets.roster import roster_cache
+
+# handler of each route, selected by the action of a message as in serverless_config/functions/websocket-functions.yml
+ROUTES = {
+    'authorize': authorize_connection_handler,
+    'location': player_location_message_handler,
+    'fromgm': gamemaster_message_handler,
+}
+
+# clients opening their websocket at the same time
+CONNECT_CONCURRENCY = 200
+
+
+class LoadClient:
+    """
+    A websocket client of a player or Game Master
+    """
+
+    def __init__(self, username, lobby, squad=None):
+        self.username = username
+        self.lobby = lobby  # Lobby the client is in
+        self.squad = squad  # Squad of a player, None for a Game Master
+        self.websocket = None  # LocalWebSocketClient once connected
+        self.sent = 0  # messages sent, which also makes each message from the client unique
+
+    @property
+    def is_game_master(self):
+        return self.squad is None
+
+
+class Deliveries:
+    """
+    Messages sent by clients which are waiting to be received, and the latency of every delivery. Only touched from the
+    event loop of the clients
+    """
+
+    def __init__(self):
+        self.pending = dict()  # (time sent, recipients still to receive it) of each message, keyed by message key
+        self.latencies = []  # seconds from sending to receiving, of each delivery
+        self.expected = 0  # deliveries expected of every message sent
+        self.unexpected = 0  # deliveries of messages which were not sent, or to more recipients than expected
+
+    def sent(self, key, recipients):
+        self.pending[key] = [time.perf_counter(), recipients]
+        self.expected += recipients
+
+    def received(self, key):
+        pending = self.pending.get(key)
+        if pending is None:
+            self.unexpected += 1
+            return
+        self.latencies.append(time.perf_counter() - pending[0])
+        pending[1] -= 1
+        if not pending[1]:
+            del self.pending[key]
+
+    @property
+    def dropped(self):
+        return sum(recipients for _, recipients in self.pending.values())
+
+
+class FanOutLoad:
+    """
+    Clients of a synthetic world of started lobbies, sending messages through the websocket handlers
+    """
+
+    def __init__(self, lobbies=1, squads=4, players_per_squad=4, rates=(1.0,), seconds=10, game_master_rate=0.1,
+                 latency=0.0, handler_threads=32, drain_seconds=10, seed=0, local=False):
+        """
+        :param lobbies: number of lobbies
+        :param squads: number of squads in each lobby
+        :param players_per_squad: number of players in each squad
+        :param rates: location messages each player sends per second, in each stage
+        :param seconds: seconds each stage sends messages for
+        :param game_master_rate: messages each Game Master sends per second
+        :param latency: seconds added to every Management API call by the stand-in
+        :param handler_threads: number of handlers the stand-in runs at once
+        :param drain_seconds: seconds to wait for messages still in flight at the end of a stage
+        :param seed: seed for the world and the clients
+        :param local: use DynamoDB Local, the table named by TABLE, rather than the in-process stand-in
+        """
+        self.lobbies = lobbies
+        self.squads = squads
+        self.players_per_squad = players_per_squad
+        self.rates = rates
+        self.seconds = seconds
+        self.game_master_rate = game_master_rate
+        self.latency = latency
+        self.handler_threads = handler_threads
+        self.drain_seconds = drain_seconds
+        self.seed = seed
+        self.local = local
+        self.random = random.Random(seed)
+
+        self.table = None
+        self.gateway = None
+        self.issuer = None
+        self.clients = []
+        self.deliveries = Deliveries()  # deliveries of the stage running
+        self.messages_sent = 0  # location and Game Master messages sent by every client
+        self.handled = Counter()  # handlers run, keyed by route
+        self.failed = Counter()  # handlers which raised or returned an error response, keyed by route
+        self.handled_lock = threading.Lock()
+        self._replaced = None
+
+    def run(self):
+        """
+        Connect every client and run each stage
+        :return: list of the report of each stage, as returned by stage_report()
+        """
+        self._install()
+        try:
+            return asyncio.new_event_loop().run_until_complete(self._run())
+        finally:
+            self._uninstall()
+
+    async def _run(self):
+        world = WorldGenerator(seed=self.seed, table=self.table).generate(self.lobbies, self.squads,
+                                                                          self.players_per_squad)
+        for lobby in world:
+            lobby.owner.start_game(lobby.name)
+            self.clients.append(LoadClient(lobby.owner.username, lobby))
+            self.clients.extend(LoadClient(member.username, lobby, squad)
+                                for squad in lobby.squads for member in squad.members)
+
+        started = time.perf_counter()
+        await self._connect()
+        await self._authorize()
+        print(f'Connected and authorized {len(self.clients)} clients in {time.perf_counter() - started:.1f}s')
+
+        readers = [asyncio.ensure_future(self._read(client)) for client in self.clients]
+        reports = []
+        try:
+            for rate in self.rates:
+                self.deliveries = Deliveries()
+                reports.append(await self._stage(rate))
+        finally:
+            for reader in readers:
+                reader.cancel()
+            await asyncio.gather(*readers, return_exceptions=True)
+            await asyncio.gather(*(client.websocket.close() for client in self.clients), return_exceptions=True)
+        return reports
+
+    async def _connect(self):
+        semaphore = asyncio.Semaphore(CONNECT_CONCURRENCY)
+
+        async def connect(client):
+            async with semaphore:
+                client.websocket = await LocalWebSocketClient.connect(port=self.gateway.port)
+
+        await asyncio.gather(*(connect(client) for client in self.clients))
+
+    async def _authorize(self, timeout=120):
+        for client in self.clients:
+            token = self.issuer.id_token(client.username)
+            await client.websocket.send(dict(action='authorize', access_token=token))
+
+        # authorization happens in the handlers, and nothing is sent back to the client
+        deadline = time.monotonic() + timeout
+        while self.handled['authorize'] + self.failed['authorize'] < len(self.clients):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Only {self.handled['authorize']} of {len(self.clients)} clients authorized")
+            await asyncio.sleep(0.05)
+        if self.failed['authorize']:
+            raise RuntimeError(f"{self.failed['authorize']} clients failed to authorize")
+
+    async def _stage(self, rate):
+        """
+        Send messages from every client at a rate for the length of a stage, then wait for messages in flight
+        :param rate: location messages each player sends per second
+        :return: report of the stage, as returned by stage_report()
+        """
+        deliveries = self.deliveries
+        handled, failed, gateway_stats = Counter(self.handled), Counter(self.failed), Counter(self.gateway.stats)
+        operations = Counter(self.table.operations) if isinstance(self.table, LocalTable) else None
+        started = time.perf_counter()
+        ends_at = started + self.seconds
+
+        senders = [self._send(client, rate, ends_at, deliveries) for client in self.clients]
+        await asyncio.gather(*senders)
+        sent_for = time.perf_counter() - started
+
+        # wait for messages in flight, until nothing more is pending or the drain times out
+        deadline = time.perf_counter() + self.drain_seconds
+        while deliveries.pending and time.perf_counter() < deadline:
+            await asyncio.sleep(0.1)
+        elapsed = time.perf_counter() - started
+
+        report = self.stage_report(rate, deliveries, sent_for, elapsed, handled=self.handled - handled,
+                                   failed=self.failed - failed,
+                                   gateway_stats=Counter(self.gateway.stats) - gateway_stats)
+        if operations is not None:
+            report['operations'] = sum((self.table.operations - operations).values())
+
+        # messages still waiting for a handler would hold up the next stage, so let them through first
+        while self._backlog():
+            await asyncio.sleep(0.1)
+        return report
+
+    def _backlog(self):
+        """
+        :return: number of messages sent which no handler has finished with yet
+        """
+        with self.handled_lock:
+            finished = self.handled + self.failed
+            return self.messages_sent - finished['location'] - finished['fromgm']
+
+    async def _send(self, client, rate, ends_at, deliveries):
+        if client.is_game_master:
+            rate = self.game_master_rate
+        if not rate:
+            return
+        interval = 1 / rate
+        # spread the clients' messages out rather than sending them all at once
+        next_send = time.perf_counter() + self.random.uniform(0, interval)
+        while next_send < ends_at:
+            await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+            next_send += interval
+            client.sent += 1
+            self.messages_sent += 1
+            if client.is_game_master:
+                message_id = f'{client.username}#{client.sent}'
+                deliveries.sent(('game_master', message_id), self.squads * self.players_per_squad)
+                await client.websocket.send(dict(action='fromgm', value=dict(id=message_id, text='Load test')))
+            else:
+                # every location sent by a player is unique, so each delivery can be matched to when it was sent
+                longitude = f'{client.lobby.game_zone.final_circle.centre["longitude"] + client.sent * 1e-7:.7f}'
+                latitude = f'{client.lobby.game_zone.final_circle.centre["latitude"]:.7f}'
+                # squad mates and the Game Master receive each location
+                deliveries.sent(('location', client.username, longitude), self.players_per_squad)
+                await client.websocket.send(dict(action='location', latitude=latitude, longitude=longitude))
+
+    async def _read(self, client):
+        try:
+            while True:
+                message = json.loads(await client.websocket.recv())
+                messages = message['value'] if message.get('event_type') == WebSocketPushMessageType.BATCH.value \
+                    else [message]
+                for each in messages:
+                    key = self.message_key(each)
+                    if key is not None:
+                        self.deliveries.received(key)
+        except ConnectionError:
+            pass
+
+    @staticmethod
+    def message_key(message):
+        """
+        :param message: message posted to a client
+        :return: key the message was sent with, or None for messages which are not sent by clients
+        """
+        event_type, value = message.get('event_type'), message.get('value')
+        if event_type == WebSocketPushMessageType.PLAYER_LOCATION.value:
+            return 'location', value['name'], value['longitude']
+        if event_type == WebSocketPushMessageType.GAME_MASTER_MESSAGE.value and isinstance(value, dict):
+            return 'game_master', value.get('id')
+        return None
+
+    def stage_report(self, rate, deliveries, sent_for, elapsed, handled, failed, gateway_stats):
+        """
+        :param rate: location messages each player sent per second
+        :param deliveries: Deliveries of the stage
+        :param sent_for: seconds messages were sent for
+        :param elapsed: seconds the stage took, including waiting for messages in flight
+        :param handled: handlers run during the stage
+        :param failed: handlers which failed during the stage
+        :param gateway_stats: stats of the stand-in during the stage
+        :return: dict of delivery latency percentiles, dropped deliveries and throughput. Deliveries still missing once
+        the stage has drained are dropped, and the backlog is the messages no handler had finished with by then
+        """
+        latencies = summarise(deliveries.latencies)
+        messages = handled['location'] + handled['fromgm']
+        return dict(rate=rate,
+                    clients=len(self.clients),
+                    offered=rate * self.lobbies * self.squads * self.players_per_squad
+                    + self.game_master_rate * self.lobbies,
+                    handled_per_second=messages / elapsed,
+                    delivered_per_second=len(deliveries.latencies) / elapsed,
+                    expected=deliveries.expected,
+                    delivered=len(deliveries.latencies),
+                    dropped=deliveries.dropped,
+                    unexpected=deliveries.unexpected,
+                    backlog=self._backlog(),
+                    handler_errors=sum(failed.values()),
+                    p50=latencies['p50'], p95=latencies['p95'], p99=latencies['p99'], max=latencies['max'],
+                    sent_for=sent_for,
+                    posts=gateway_stats['posts'],
+                    gone=gateway_stats['gone'],
+                    throttled=gateway_stats['throttled'])
+
+    def _on_connect(self, connection_id):
+        self._handle(connection_handler, 'connect', connection_id, event_type=WebSocketEventType.CONNECT)
+
+    def _on_disconnect(self, connection_id):
+        self._handle(connection_handler, 'disconnect', connection_id, event_type=WebSocketEventType.DISCONNECT)
+
+    def _on_message(self, connection_id, body):
+        action = json.loads(body).get('action')
+        self._handle(ROUTES.get(action, default_handler), action, connection_id, body=body)
+
+    def _handle(self, handler, route, connection_id, event_type=None, body=None):
+        event = {
+            'requestContext': {
+                'connectionId': connection_id,
+                'eventType': event_type.value if event_type else None
+            },
+            'body': body
+        }
+        try:
+            response = handler(event, None)
+        except Exception:
+            with self.handled_lock:
+                self.failed[route] += 1
+            raise
+        with self.handled_lock:
+            # API exceptions are returned as error responses rather than raised
+            if response['statusCode'] != 200:
+                self.failed[route] += 1
+            else:
+                self.handled[route] += 1
+
+    def _install(self):
+        self._replaced = (DynamoDbConnector.table, ConnectionManager.gateway_api, SqsQueue.client, jwt.jwks,
+                          jwt.USER_POOL_CLIENT_ID, sys.modules.get('jwt'), os.environ.get('TABLE'),
+                          os.environ.get('WEBSOCKET_URL'))
+        if self.local:
+            os.environ.setdefault('local_test', 'True')
+            self.table = DynamoDbConnector.get_table()
+        else:
+            self.table = install(LocalTable('fanout'))
+        SqsQueue.client = LocalSqsClient()
+        roster_cache.clear()
+
+        # tokens are minted and verified locally
+        self.issuer = LocalTokenIssuer()
+        jwt.jwks = jwt.JsonWebKeySet(path=self.issuer.write_jwks(os.path.join(tempfile.mkdtemp(), 'jwks.json')))
+        jwt.USER_POOL_CLIENT_ID = self.issuer.client_id
+        jwt.verified_tokens.clear()
+        # the authorize handler imports jwt when called, so make sure it gets the module holding the local keys
+        sys.modules['jwt'] = jwt
+
+        # handlers post back through the stand-in's Management API, over HTTP like they would in AWS
+        self.gateway = LocalApiGateway(port=0, latency=self.latency, on_connect=self._on_connect,
+                                       on_disconnect=self._on_disconnect, on_message=self._on_message,
+                                       handler_threads=self.handler_threads, seed=self.seed)
+        os.environ['WEBSOCKET_URL'] = self.gateway.start_in_thread()
+        ConnectionManager.gateway_api = None
+
+    def _uninstall(self):
+        self.gateway.stop_thread()
+        DynamoDbConnector.table, ConnectionManager.gateway_api, SqsQueue.client, jwt.jwks, jwt.USER_POOL_CLIENT_ID, \
+            sys.modules['jwt'], table_arn, websocket_url = self._replaced
+        for name, value in (('TABLE', table_arn), ('WEBSOCKET_URL', websocket_url)):
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        roster_cache.clear()
+
+
+def raise_open_file_limit():
+    """
+    Raise the soft limit on open files to the hard limit
+    :return: new soft limit
+    """
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return hard
+
+
+def print_reports(reports):
+    print(f"{'rate':>6}{'clients':>9}{'offered/s':>11}{'handled/s':>11}{'delivered/s':>13}{'dropped':>9}"
+          f"{'backlog':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'errors':>8}")
+    for report in reports:
+        print(f"{report['rate']:>6g}{report['clients']:>9}{report['offered']:>11.1f}"
+              f"{report['handled_per_second']:>11.1f}{report['delivered_per_second']:>13.1f}{report['dropped']:>9}"
+              f"{report['backlog']:>9}{report['p50'] * 1000:>9.1f}{report['p95'] * 1000:>9.1f}"
+              f"{report['p99'] * 1000:>9.1f}{report['max'] * 1000:>9.1f}{report['handler_errors']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load websocket fan-out through the local API Gateway stand-in')
+    parser.add_argument('--lobbies', type=int, default=4)
+    parser.add_argument('--squads', type=int, default=15, help='squads per lobby')
+    parser.add_argument('--players', type=int, default=4, help='players per squad')
+    parser.add_argument('--rates', type=float, nargs='+', default=[0.1, 0.5, 1.0],
+                        help='location messages each player sends per second, one stage per rate')
+    parser.add_argument('--seconds', type=float, default=10, help='seconds each stage sends messages for')
+    parser.add_argument('--gm-rate', type=float, default=0.1, help='messages each Game Master sends per second')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='latency added to every Management API call')
+    parser.add_argument('--handler-threads', type=int, default=32, help='handlers run at once')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--local', action='store_true',
+                        help='use DynamoDB Local, the table named by TABLE, rather than the in-process stand-in')
+    parser.add_argument('--json', action='store_true', help='print the reports as JSON')
+    args = parser.parse_args()
+
+    raise_open_file_limit()
+    reports = FanOutLoad(lobbies=args.lobbies, squads=args.squads, players_per_squad=args.players, rates=args.rates,
+                         seconds=args.seconds, game_master_rate=args.gm_rate, latency=args.latency_ms / 1000,
+                         handler_threads=args.handler_threads, seed=args.seed, local=args.local).run()
+    if args.json:
+        print(json.dumps(reports, indent=2))
+    else:
+        print_reports(reports)
+
+
+if __name__ == '__main__':
+    main()
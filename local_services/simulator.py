@@ -0,0 +1,319 @@
+"""
+Headless game simulator. Runs a whole game in-process, from start_game through the first circle and every closing
+circle to end_game, against a virtual clock, the in-process DynamoDB table and in-process stand-ins for SQS and the API
+Gateway Management API. SQS delays and the one second wait between circle updates take no real time, so a 30 minute
+game runs in seconds.
+
+Simulated players connect over websockets, walk towards the next circle and post their location, and die either when
+caught outside a closing circle or at random, as if killed. The game ends once a single squad is left alive, or when
+the time limit is reached. Latency, websocket messages and DynamoDB operations are reported for each phase of the game:
+
+   > python -m local_services.simulator --squads 8 --players 4 --minutes 30 --seed 1
+"""
+import argparse
+import json
+import math
+import random
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+
+from clock import VirtualClock, set_clock
+from db.dynamodb_connector import DynamoDbConnector
+from enums import WebSocketPushMessageType
+from handlers.sqs_handlers import circle_queue_handler
+from helper_functions import make_sqs_events
+from local_services.api_gateway import LocalManagementApi
+from local_services.dynamodb import LocalTable, install
+from local_services.sqs import LocalSqsClient
+from local_services.world_generator import WorldGenerator
+from models.map import Circle
+from models.player import Player
+from sqs.utils import SqsQueue
+from websockets.connection_manager import ConnectionManager
+from websockets.roster import roster_cache
+
+# virtual time games start at, so runs with the same seed are identical
+START_TIME = 1600000000.0
+METERS_PER_DEGREE = 111320
+
+
+class PhaseStats:
+    """
+    Latency of each call in a phase of the game, and the websocket messages and DynamoDB operations it caused
+    """
+
+    def __init__(self):
+        self.latencies = []  # seconds taken by each call
+        self.operations = Counter()  # DynamoDB operations, keyed by operation name
+        self.messages = 0  # posts to websocket clients
+
+    def summary(self):
+        latencies = sorted(self.latencies)
+        calls = len(latencies)
+        return dict(calls=calls,
+                    mean=sum(latencies) / calls if calls else 0.0,
+                    p95=latencies[min(calls - 1, int(calls * 0.95))] if calls else 0.0,
+                    max=latencies[-1] if calls else 0.0,
+                    operations=sum(self.operations.values()),
+                    messages=self.messages)
+
+
+class SimulatedPlayer:
+    def __init__(self, username, squad_name, connection_id, position):
+        self.username = username
+        self.squad_name = squad_name
+        self.connection_id = connection_id
+        self.position = position  # dict of latitude and longitude
+        self.alive = True
+
+
+class Simulator:
+    """
+    A single game of a lobby full of simulated players
+    """
+
+    def __init__(self, squads=4, players_per_squad=4, duration=30 * 60, location_interval=10, walking_speed=1.5,
+                 kill_rate=0.001, seed=0):
+        """
+        :param squads: number of squads in the lobby
+        :param players_per_squad: number of players in each squad
+        :param duration: seconds of game time after which the game is ended if more than one squad is still alive
+        :param location_interval: seconds between location updates from each player
+        :param walking_speed: meters players walk per second
+        :param kill_rate: probability of a player being killed at each location update
+        :param seed: seed for the world, the circles and the players
+        """
+        self.squads = squads
+        self.players_per_squad = players_per_squad
+        self.duration = duration
+        self.location_interval = location_interval
+        self.walking_speed = walking_speed
+        self.kill_rate = kill_rate
+        self.seed = seed
+        self.random = random.Random(seed)
+
+        self.clock = None
+        self.table = None
+        self.gateway = None
+        self.queue = None
+        self.lobby = None
+        self.players = []
+        self.game_master_connection = None
+        self.next_circle = None  # latest circle players were told to move to
+        self.closing_circle = None  # latest position of the closing circle
+        self.finished = False
+        self.phases = OrderedDict()  # PhaseStats of each phase, keyed by phase name
+        self._stack = []  # phases currently running, innermost last
+        self._replaced = None
+
+    def run(self):
+        """
+        Play a whole game
+        :return: report of the game, as returned by report()
+        """
+        self._install()
+        try:
+            started = time.perf_counter()
+            self._play()
+            return self.report(wall_seconds=time.perf_counter() - started)
+        finally:
+            self._uninstall()
+
+    def report(self, wall_seconds):
+        """
+        :param wall_seconds: real seconds the game took to run
+        :return: dict of the game's phase stats, totals and outcome
+        """
+        simulated_seconds = self.clock.time() - START_TIME
+        return dict(phases={name: stats.summary() for name, stats in self.phases.items()},
+                    simulated_seconds=simulated_seconds,
+                    wall_seconds=wall_seconds,
+                    speedup=simulated_seconds / wall_seconds if wall_seconds else 0.0,
+                    operations=dict(self.table.operations),
+                    messages={key: value for key, value in self.gateway.stats.items()},
+                    squads_alive=sorted(self._squads_alive()))
+
+    def _install(self):
+        self.clock = VirtualClock(start=START_TIME)
+        self._replaced = (set_clock(self.clock), DynamoDbConnector.table, ConnectionManager.gateway_api,
+                          SqsQueue.client)
+        self.table = install(LocalTable('simulation'))
+        self.gateway = ConnectionManager.gateway_api = LocalManagementApi(on_message=self._on_message)
+        self.queue = SqsQueue.client = LocalSqsClient()
+        roster_cache.clear()
+        # circles are drawn from the random module
+        random.seed(self.seed)
+
+    def _uninstall(self):
+        clock, DynamoDbConnector.table, ConnectionManager.gateway_api, SqsQueue.client = self._replaced
+        set_clock(clock)
+        roster_cache.clear()
+
+    def _play(self):
+        with self.phase('stage_world'):
+            generator = WorldGenerator(seed=self.seed, table=self.table)
+            self.lobby = generator.generate(1, self.squads, self.players_per_squad)[0]
+        game_master = self.lobby.owner
+        zone = self.lobby.game_zone.coordinates
+
+        with self.phase('start_game'):
+            game_master.start_game(self.lobby.name)
+
+        # connections are only authorized once the game has started
+        connection_manager = ConnectionManager()
+        with self.phase('connect'):
+            self.game_master_connection = self._connect(connection_manager, game_master.username)
+        for squad in self.lobby.squads:
+            for member in squad.members:
+                position = dict(latitude=self.random.uniform(*sorted(c['latitude'] for c in zone[1:3])),
+                                longitude=self.random.uniform(*sorted(c['longitude'] for c in zone[0:2])))
+                with self.phase('connect'):
+                    connection_id = self._connect(connection_manager, member.username)
+                self.players.append(SimulatedPlayer(member.username, squad.name, connection_id, position))
+
+        self.clock.call_later(self.location_interval, self._tick)
+
+        ends_at = self.clock.time() + self.duration
+        while not self.finished:
+            visible_at = self.queue.next_visible_at
+            if visible_at is None or visible_at > ends_at:
+                self.clock.advance_to(ends_at)
+                break
+            self.clock.advance_to(visible_at)
+            for body in self.queue.receive_due():
+                event = json.loads(body)
+                with self.phase(event['event_type']):
+                    circle_queue_handler(make_sqs_events([event]), None)
+
+        # stop location updates before the game ends
+        self.finished = True
+        with self.phase('end_game'):
+            game_master.end_game(self.lobby.name)
+
+    def _connect(self, connection_manager, username):
+        connection_id = f'connection-{username}'
+        self.gateway.connect(connection_id)
+        connection_manager.connect_unauthorized(connection_id)
+        connection_manager.authorize_connection(connection_id, username)
+        return connection_id
+
+    def _tick(self):
+        """
+        Every living player moves and posts their location. Players outside the closing circle die, as does the odd
+        player killed by another
+        """
+        if self.finished:
+            return
+        connection_manager = ConnectionManager()
+        for player in self.players:
+            if not player.alive:
+                continue
+            self._move(player)
+            with self.phase('location'):
+                connection_manager.push_player_location(player.connection_id, player.position['latitude'],
+                                                        player.position['longitude'])
+
+            outside = self.closing_circle is not None and not self.closing_circle.contains_coordinates(player.position)
+            if outside or self.random.random() < self.kill_rate:
+                with self.phase('death'):
+                    Player(player.username).dead()
+                player.alive = False
+                if len(self._squads_alive()) <= 1:
+                    self.finished = True
+                    return
+        self.clock.call_later(self.location_interval, self._tick)
+
+    def _move(self, player):
+        # walk towards the centre of the next circle, with a little randomness
+        step = self.walking_speed * self.location_interval / METERS_PER_DEGREE
+        target = self.next_circle.centre if self.next_circle else player.position
+        d_lat = target['latitude'] - player.position['latitude']
+        d_long = target['longitude'] - player.position['longitude']
+        distance = math.hypot(d_lat, d_long)
+        if distance > step:
+            d_lat, d_long = d_lat * step / distance, d_long * step / distance
+        player.position = dict(latitude=player.position['latitude'] + d_lat + self.random.gauss(0, step / 4),
+                               longitude=player.position['longitude'] + d_long + self.random.gauss(0, step / 4))
+
+    def _on_message(self, connection_id, message):
+        # players learn about circles from what the Game Master is sent, as every client is sent the same
+        if connection_id != self.game_master_connection:
+            return
+        if message['event_type'] == WebSocketPushMessageType.NEXT_CIRCLE.value:
+            self.next_circle = Circle(message['value'])
+        elif message['event_type'] == WebSocketPushMessageType.CIRCLE_CLOSING.value:
+            self.closing_circle = Circle(message['value'])
+
+    def _squads_alive(self):
+        return {player.squad_name for player in self.players if player.alive}
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Measure a phase of the game. Phases can run inside each other, e.g. players moving while a circle closes, and
+        are only charged for the time and operations spent outside the phases inside them
+        :param name: name of phase
+        """
+        now = self._snapshot()
+        if self._stack:
+            self._charge(self._stack[-1], now)
+        frame = dict(name=name, elapsed=0.0, mark=now)
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            now = self._snapshot()
+            self._stack.pop()
+            self._charge(frame, now)
+            self.phases.setdefault(name, PhaseStats()).latencies.append(frame['elapsed'])
+            if self._stack:
+                self._stack[-1]['mark'] = now
+
+    def _snapshot(self):
+        return time.perf_counter(), Counter(self.table.operations), self.gateway.stats['posts']
+
+    def _charge(self, frame, now):
+        started, operations, posts = frame['mark']
+        stats = self.phases.setdefault(frame['name'], PhaseStats())
+        frame['elapsed'] += now[0] - started
+        stats.operations.update(now[1] - operations)
+        stats.messages += now[2] - posts
+        frame['mark'] = now
+
+
+def print_report(report):
+    print(f"{'phase':<14}{'calls':>8}{'mean ms':>10}{'p95 ms':>10}{'max ms':>10}{'ddb ops':>10}{'messages':>10}")
+    for name, phase in report['phases'].items():
+        print(f"{name:<14}{phase['calls']:>8}{phase['mean'] * 1000:>10.2f}{phase['p95'] * 1000:>10.2f}"
+              f"{phase['max'] * 1000:>10.2f}{phase['operations']:>10}{phase['messages']:>10}")
+    print(f"Simulated {report['simulated_seconds'] / 60:.1f} minutes in {report['wall_seconds']:.2f}s "
+          f"({report['speedup']:.0f}x real time)")
+    print(f"DynamoDB operations: {report['operations']}")
+    print(f"Websocket messages: {report['messages']}")
+    print(f"Squads alive: {report['squads_alive']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate a whole game in accelerated time')
+    parser.add_argument('--squads', type=int, default=4)
+    parser.add_argument('--players', type=int, default=4, help='players per squad')
+    parser.add_argument('--minutes', type=float, default=30, help='game time after which the game is ended')
+    parser.add_argument('--location-interval', type=float, default=10,
+                        help='seconds between location updates from each player')
+    parser.add_argument('--kill-rate', type=float, default=0.001,
+                        help='probability of a player being killed at each location update')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    report = Simulator(squads=args.squads, players_per_squad=args.players, duration=args.minutes * 60,
+                       location_interval=args.location_interval, kill_rate=args.kill_rate, seed=args.seed).run()
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == '__main__':
+    main()
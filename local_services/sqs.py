@@ -0,0 +1,62 @@
+"""
+In-process stand-in for the SQS client, holding delayed messages against the game clock instead of real time. Set
+SqsQueue.client to an instance to have every queue send to it, and receive messages as they fall due:
+
+   >>> from sqs.utils import SqsQueue
+   >>> SqsQueue.client = queue = LocalSqsClient()
+   >>> queue.receive_due()  # bodies of messages whose delay has passed
+"""
+import heapq
+import threading
+import uuid
+from collections import Counter
+from itertools import count
+
+from clock import get_clock
+
+
+class LocalSqsClient:
+    """
+    Messages sent to any queue url, ordered by the time they become visible
+    """
+
+    def __init__(self):
+        self.messages = []  # (visible at, sequence, receipt handle, queue url, body) heap
+        self.sequence = count()
+        self.stats = Counter()  # number of requests, keyed by SQS operation name
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.messages)
+
+    def send_message(self, QueueUrl, MessageBody, DelaySeconds=None, **kwargs):
+        receipt_handle = uuid.uuid4().hex
+        visible_at = get_clock().time() + (DelaySeconds or 0)
+        with self.lock:
+            self.stats['SendMessage'] += 1
+            heapq.heappush(self.messages, (visible_at, next(self.sequence), receipt_handle, QueueUrl, MessageBody))
+        return dict(MessageId=receipt_handle)
+
+    def delete_message(self, QueueUrl, ReceiptHandle, **kwargs):
+        with self.lock:
+            self.stats['DeleteMessage'] += 1
+
+    @property
+    def next_visible_at(self):
+        """
+        :return: time the next message becomes visible, or None if there are no messages
+        """
+        with self.lock:
+            return self.messages[0][0] if self.messages else None
+
+    def receive_due(self):
+        """
+        Remove every message which has become visible by the current time
+        :return: list of message bodies, in the order they became visible
+        """
+        now = get_clock().time()
+        bodies = []
+        with self.lock:
+            while self.messages and self.messages[0][0] <= now:
+                bodies.append(heapq.heappop(self.messages)[4])
+        return bodies
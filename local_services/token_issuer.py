@@ -0,0 +1,159 @@
+"""
+Local stand-in for a Cognito user pool's token signing, so token verification can be exercised without AWS. The issuer
+generates an RSA keypair, publishes the public key as a jwks.json (written to a file, or served over HTTP), and mints
+ID and access tokens carrying the same claims Cognito puts in them. Point $JWKS_FILE at the written jwks.json, and set
+$USER_POOL_CLIENT_ID to the issuer's client_id, to have jwt.verify_token accept the minted tokens:
+
+   > python -m local_services.token_issuer --jwks /tmp/jwks.json --username player-1
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+
+REGION = 'eu-central-1'
+
+
+class LocalTokenIssuer:
+    """
+    Signs tokens the way a Cognito user pool does
+    """
+
+    def __init__(self, user_pool_id='eu-central-1_local', client_id='local-client', kid=None, key_size=2048):
+        """
+        :param user_pool_id: id of the user pool tokens claim to be issued by
+        :param client_id: id of the app client tokens are issued to
+        :param kid: id of the signing key. Defaults to a random id
+        :param key_size: size of the RSA key in bits
+        """
+        self.user_pool_id = user_pool_id
+        self.client_id = client_id
+        self.kid = kid or uuid.uuid4().hex
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=key_size)
+        self.private_key = private_key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                                     serialization.NoEncryption())
+        self.public_jwk = jwk.construct(self.private_key, algorithm='RS256').public_key().to_dict()
+        self.public_jwk.update(kid=self.kid, use='sig')
+
+    @property
+    def issuer(self):
+        return f'https://cognito-idp.{REGION}.amazonaws.com/{self.user_pool_id}'
+
+    def jwks(self):
+        """
+        :return: jwks.json of the issuer's public key
+        """
+        return dict(keys=[self.public_jwk])
+
+    def write_jwks(self, path):
+        """
+        Write the issuer's jwks.json to a file
+        :param path: path of file to write
+        :return: path of file written
+        """
+        with open(path, 'w') as f:
+            json.dump(self.jwks(), f)
+        return path
+
+    def serve_jwks(self, host='localhost', port=0):
+        """
+        Serve the issuer's jwks.json over HTTP from a background thread, at the path Cognito serves it from
+        :param host: host to listen on
+        :param port: port to listen on. 0 picks a free port
+        :return: (server, url of jwks.json). Call server.shutdown() to stop serving
+        """
+        body = json.dumps(self.jwks()).encode('utf-8')
+
+        class JwksHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), JwksHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f'http://{host}:{server.server_address[1]}/{self.user_pool_id}/.well-known/jwks.json'
+        return server, url
+
+    def id_token(self, username, expires_in=3600, **claims):
+        """
+        Mint an ID token
+        :param username: username of User the token is issued to
+        :param expires_in: seconds until the token expires
+        :param claims: claims to add or override
+        :return: signed token
+        """
+        now = int(time.time())
+        token_claims = {
+            'sub': str(uuid.uuid5(uuid.NAMESPACE_DNS, username)),
+            'aud': self.client_id,
+            'email_verified': True,
+            'event_id': str(uuid.uuid4()),
+            'token_use': 'id',
+            'auth_time': now,
+            'iss': self.issuer,
+            'cognito:username': username,
+            'exp': now + expires_in,
+            'iat': now,
+        }
+        token_claims.update(claims)
+        return self._sign(token_claims)
+
+    def access_token(self, username, expires_in=3600, **claims):
+        """
+        Mint an access token
+        :param username: username of User the token is issued to
+        :param expires_in: seconds until the token expires
+        :param claims: claims to add or override
+        :return: signed token
+        """
+        now = int(time.time())
+        token_claims = {
+            'sub': str(uuid.uuid5(uuid.NAMESPACE_DNS, username)),
+            'event_id': str(uuid.uuid4()),
+            'token_use': 'access',
+            'scope': 'aws.cognito.signin.user.admin',
+            'auth_time': now,
+            'iss': self.issuer,
+            'exp': now + expires_in,
+            'iat': now,
+            'jti': str(uuid.uuid4()),
+            'client_id': self.client_id,
+            'username': username,
+        }
+        token_claims.update(claims)
+        return self._sign(token_claims)
+
+    def _sign(self, claims):
+        return jwt.encode(claims, self.private_key, algorithm='RS256', headers=dict(kid=self.kid))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for Cognito token signing')
+    parser.add_argument('--jwks', default='jwks.json', help='file to write jwks.json to')
+    parser.add_argument('--username', action='append', default=[], help='username to mint tokens for')
+    parser.add_argument('--client-id', default='local-client')
+    parser.add_argument('--expires-in', type=int, default=3600, help='seconds until tokens expire')
+    args = parser.parse_args()
+
+    issuer = LocalTokenIssuer(client_id=args.client_id)
+    print(f'Wrote {issuer.write_jwks(args.jwks)}. Set JWKS_FILE={args.jwks} USER_POOL_CLIENT_ID={issuer.client_id}')
+    for username in args.username:
+        print(json.dumps(dict(username=username,
+                              id_token=issuer.id_token(username, expires_in=args.expires_in),
+                              access_token=issuer.access_token(username, expires_in=args.expires_in))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+"""
+Stages a synthetic world for load tests: N lobbies, each owned by a Game Master and holding M squads of K players,
+written with BatchWriteItem in the same key layout the models write one item at a time. Names, lobby ids and game zones
+are drawn from a seeded random generator, so the same seed always stages the same world. Every user is a synthetic test
+entity, so the test handlers can list and clean them up afterwards.
+
+Target DynamoDB Local (e.g. moto_server on port 8005) or the in-process stand-in:
+
+   > TABLE=table/battle-royale python -m local_services.world_generator --lobbies 100 --squads 15 --players 4
+   > python -m local_services.world_generator --lobbies 100 --squads 15 --players 4 --in-process
+"""
+import argparse
+import os
+import random
+import string
+import time
+
+from db.dynamodb_connector import DynamoDbConnector
+from enums import LobbyState, PlayerState, SyntheticEntityType
+from models import map
+from models.game_master import GameMaster
+from models.lobby import Lobby
+from models.player import Player
+from models.squad import Squad
+from models.user import TEST_PLAYER_PREFIX, TEST_GAME_MASTER_PREFIX
+
+# centre of the area game zones are placed around, and how far they may be placed from it, in degrees
+CENTRE = dict(latitude=56.131, longitude=12.900)
+SPREAD = 0.5
+GAME_ZONE_SIZE = 0.004
+FINAL_CIRCLE_RADIUS = 20 / 1000
+
+
+class WorldGenerator:
+    """
+    Builds the items of a synthetic world and writes them in bulk
+    """
+
+    def __init__(self, seed=0, table=None):
+        """
+        :param seed: seed of the random generator names, ids and game zones are drawn from
+        :param table: table to write to, defaults to the table of DynamoDbConnector
+        """
+        self.random = random.Random(seed)
+        self.table = table or DynamoDbConnector.get_table()
+        self.items_written = 0
+
+    def generate(self, lobbies=1, squads_per_lobby=4, players_per_squad=4):
+        """
+        Write a world of lobbies full of squads
+        :param lobbies: number of lobbies
+        :param squads_per_lobby: number of squads in each lobby, which is also the size of the lobby
+        :param players_per_squad: number of players in each squad, which is also the squad size of the lobby
+        :return: list of the Lobby objects written, with their squads and squad members
+        """
+        world = [self.make_lobby(squads_per_lobby, players_per_squad) for _ in range(lobbies)]
+        with self.table.batch_writer() as batch:
+            for lobby in world:
+                for item in self.lobby_items(lobby):
+                    batch.put_item(Item=item)
+                    self.items_written += 1
+        return world
+
+    def make_lobby(self, squads, players_per_squad):
+        """
+        Draw a lobby, its Game Master, squads and players, without writing anything
+        :param squads: number of squads in the lobby
+        :param players_per_squad: number of players in each squad
+        :return: Lobby
+        """
+        lobby = Lobby(f'test_lobby_{self._token()}', GameMaster(f'{TEST_GAME_MASTER_PREFIX}{self._token()}'))
+        lobby.unique_id = ''.join(self.random.choice(string.ascii_letters + string.digits) for _ in range(12))
+        lobby.size = squads
+        lobby.squad_size = players_per_squad
+        lobby.state = LobbyState.NOT_STARTED
+        lobby.game_zone = self._game_zone()
+        lobby.owner.lobby = lobby
+
+        for _ in range(squads):
+            members = [Player(f'{TEST_PLAYER_PREFIX}{self._token()}') for _ in range(players_per_squad)]
+            squad = Squad(f'test_squad_{self._token()}', members[0])
+            squad.members = members
+            squad.lobby_name = lobby.name
+            squad.lobby_owner = lobby.owner.username
+            for member in members:
+                member.lobby = lobby
+                member.squad = squad
+            lobby.squads.append(squad)
+        return lobby
+
+    def lobby_items(self, lobby):
+        """
+        :param lobby: Lobby drawn by make_lobby()
+        :return: every item of the lobby, its Game Master, squads and players
+        """
+        game_master = lobby.owner.username
+        yield {
+            'pk': game_master,
+            'sk': 'USER',
+            'lobby-name': lobby.name,
+            'lobby-owner': game_master,
+            'test-entity': SyntheticEntityType.GAME_MASTER.value
+        }
+        yield {
+            'pk': lobby.name,
+            'sk': f'OWNER#{game_master}',
+            'lsi': 'LOBBY',
+            'lsi-2': lobby.unique_id,
+            'size': lobby.size,
+            'squad-size': lobby.squad_size,
+            'state': lobby.state.value,
+            'game-zone-coordinates': lobby.game_zone.dump_game_zone_coordinates(),
+            'final-circle': lobby.game_zone.final_circle.to_dict()
+        }
+
+        for squad in lobby.squads:
+            yield {
+                'pk': 'squad',
+                'sk': f'SQUADNAME#{squad.name}',
+                'lsi': f'SQUADOWNER#{squad.owner.username}',
+                'lobby-name': lobby.name,
+                'lobby-owner': game_master
+            }
+            lobby_squad = {
+                'pk': 'LOBBY',
+                'sk': f'SQUAD#{squad.name}'
+            }
+            for member in squad.members:
+                lobby_squad[f'PLAYER#{member.username}'] = PlayerState.ALIVE.value
+                yield {
+                    'pk': member.username,
+                    'sk': 'USER',
+                    'in-game': False,
+                    'lobby-name': lobby.name,
+                    'lobby-owner': game_master,
+                    'squad': squad.name,
+                    'test-entity': SyntheticEntityType.PLAYER.value
+                }
+                yield {
+                    'pk': 'squad-member',
+                    'sk': f'SQUAD#{squad.name}#MEMBER#{member.username}',
+                    'lsi': f'SQUADNAME#{squad.name}#SQUADOWNER#{squad.owner.username}',
+                    'lsi-2': member.username
+                }
+                yield squad._summary(member.username, lobby.name, game_master)
+            yield lobby_squad
+
+    def _token(self):
+        return '%08x' % self.random.getrandbits(32)
+
+    def _game_zone(self):
+        latitude = CENTRE['latitude'] + self.random.uniform(-SPREAD, SPREAD)
+        longitude = CENTRE['longitude'] + self.random.uniform(-SPREAD, SPREAD)
+        half = GAME_ZONE_SIZE / 2
+        coordinates = [dict(latitude=round(latitude + d_lat, 6), longitude=round(longitude + d_long, 6))
+                       for d_lat, d_long in ((half, half), (half, -half), (-half, -half), (-half, half))]
+        final_circle = map.Circle(dict(centre=dict(latitude=round(latitude, 6), longitude=round(longitude, 6)),
+                                       radius=FINAL_CIRCLE_RADIUS))
+        return map.GameZone(coordinates, final_circle=final_circle)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stage a synthetic world for load tests')
+    parser.add_argument('--lobbies', type=int, default=10)
+    parser.add_argument('--squads', type=int, default=15, help='squads per lobby')
+    parser.add_argument('--players', type=int, default=4, help='players per squad')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--in-process', action='store_true',
+                        help='write to the in-process stand-in rather than DynamoDB Local')
+    args = parser.parse_args()
+
+    if args.in_process:
+        from local_services.dynamodb import install
+        install()
+    else:
+        os.environ.setdefault('local_test', 'True')
+
+    generator = WorldGenerator(seed=args.seed)
+    started = time.perf_counter()
+    world = generator.generate(args.lobbies, args.squads, args.players)
+    seconds = time.perf_counter() - started
+    players = sum(len(squad.members) for lobby in world for squad in lobby.squads)
+    print(f'Wrote {len(world)} lobbies, {players} players and {generator.items_written} items in {seconds:.2f}s')
+
+
+if __name__ == '__main__':
+    main()
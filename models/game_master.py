@@ -1,10 +1,12 @@
+from db.cascade import CascadePlan
 from db.dynamodb_connector import DynamoDbConnector
 from exceptions import UserDoesNotExistException, LobbyDoesNotExistException, LobbyAlreadyStartedException, \
     GameMasterAlreadyInLobbyException, GameMasterNotInLobbyException
-from enums import LobbyState
+from enums import LobbyState, SyntheticEntityType
 from models import lobby as lobby_model
 from models import user
 from sqs.closing_circle_queue import CircleQueue
+from tracing import traced
 from websockets import connection_manager
 
 
@@ -12,13 +14,17 @@ class GameMaster(user.User):
     """
     A Game Master type of User.
     """
+    __slots__ = ('username', 'lobby')
 
     def __init__(self, username: str):
         super().__init__()
         self.username = username
-        self.table = DynamoDbConnector.get_table()
         self.lobby = None  # only set if game master is in a lobby
 
+    @property
+    def table(self):
+        return DynamoDbConnector.get_table()
+
     def __eq__(self, other):
         """If a Game Master object has the same username as another Game Master object, they are the same Game Master"""
         if isinstance(other, GameMaster):
@@ -60,12 +66,13 @@ class GameMaster(user.User):
         :return: None
         """
 
-        self.table.put_item(
-            Item={
-                'pk': self.username,
-                'sk': 'USER',
-            }
-        )
+        item = {
+            'pk': self.username,
+            'sk': 'USER',
+        }
+        if self.username.startswith(user.TEST_GAME_MASTER_PREFIX):
+            item['test-entity'] = SyntheticEntityType.GAME_MASTER.value
+        self.table.put_item(Item=item)
 
     def delete(self, access_token):
         """
@@ -75,19 +82,22 @@ class GameMaster(user.User):
         """
 
         self.get()
+        plan = CascadePlan()
         if self.lobby:
-            self.delete_lobby(self.lobby.name)
+            self.lobby.get_squads()
+            self.lobby.plan_delete(plan)
 
         # delete player from database
-        self.table.delete_item(
-            Key={
-                'pk': self.username,
-                'sk': 'USER'
-            },
-        )
+        plan.delete({
+            'pk': self.username,
+            'sk': 'USER'
+        })
+        plan.execute(self.table)
+
         # delete user from Cognito service
         self.cognito_client.delete_user(AccessToken=access_token)
 
+    @traced
     def create_lobby(self, lobby_name, size=15, squad_size=4):
         """
         Create a new game lobby for Players to join
@@ -104,6 +114,7 @@ class GameMaster(user.User):
         self.lobby = lobby
         return lobby
 
+    @traced
     def delete_lobby(self, lobby_name):
         """
         Delete a lobby
@@ -112,8 +123,12 @@ class GameMaster(user.User):
         """
         lobby = lobby_model.Lobby(lobby_name, owner=self)
         lobby.get_squads()
-        lobby.delete()
-        self.set_no_lobby()
+
+        plan = CascadePlan()
+        lobby.plan_delete(plan)
+        plan.update({'pk': self.username, 'sk': 'USER'},
+                    {'lobby-name': dict(Value=None), 'lobby-owner': dict(Value=None)})
+        plan.execute(self.table)
         return lobby
 
     def get_lobby(self):
@@ -127,6 +142,7 @@ class GameMaster(user.User):
         self.lobby.get()
         return self.lobby
 
+    @traced
     def update_lobby(self, lobby_name, size=None, squad_size=None, game_zone_coordinates=None, final_circle=None):
         """
         Update a lobby owned by Game Master
@@ -171,6 +187,7 @@ class GameMaster(user.User):
             AttributeUpdates={'lobby-name': dict(Value=None),
                               'lobby-owner': dict(Value=None)})
 
+    @traced
     def add_squad_to_lobby(self, lobby_name, squad):
         """
         Add a squad to a lobby
@@ -188,6 +205,7 @@ class GameMaster(user.User):
         lobby.get_squads()  # get latest list of all squads in the lobby already
         lobby.add_squad(squad)
 
+    @traced
     def remove_squad_from_lobby(self, lobby_name, squad):
         """
         Remove a squad from a Lobby
@@ -201,6 +219,7 @@ class GameMaster(user.User):
         lobby.get_squads()
         lobby.remove_squad(squad)
 
+    @traced
     def get_squads_in_lobby(self, lobby_name):
         """
         Get list of squads in the lobby
@@ -212,11 +231,13 @@ class GameMaster(user.User):
         lobby.get_squads()
         return lobby.squads
 
+    @traced
     def start_game(self, lobby_name):
         lobby = lobby_model.Lobby(lobby_name, self)
         lobby.get()
         lobby.get_squads()
         lobby.start()
+        lobby.put_session_tickets()
 
         connection_manager.ConnectionManager().push_game_state(lobby)
 
@@ -224,13 +245,17 @@ class GameMaster(user.User):
         circle_queue = CircleQueue()
         circle_queue.send_first_circle_event(lobby)
 
+    @traced
     def end_game(self, lobby_name):
         lobby = lobby_model.Lobby(lobby_name, self)
         lobby.get()
+        lobby.get_squads()
         lobby.end()
+        lobby.delete_session_tickets()
 
         connection_manager.ConnectionManager().push_game_state(lobby)
 
+    @traced
     def get_players_in_lobby(self, lobby_name):
         """
         Get list of players in a lobby and their state
@@ -1,13 +1,16 @@
 from datetime import datetime
 from boto3.dynamodb.conditions import Key
+from clock import get_clock
+from db.cascade import CascadePlan
 from db.dynamodb_connector import DynamoDbConnector
 from exceptions import LobbyDoesNotExistException, SquadInLobbyException, SquadNotInLobbyException, \
     SquadTooBigException, LobbyFullException, LobbyAlreadyStartedException, NotEnoughSquadsException, \
     PlayerAlreadyInLobbyException, LobbyNotStartedException, PlayerNotInLobbyException
 from models import game_master
-from enums import LobbyState, PlayerState
+from enums import LobbyState, PlayerState, SessionRole
 from models import squad as squad_model
 from models import map
+from tracing import traced
 from websockets import connection_manager
 import pytz
 
@@ -16,6 +19,7 @@ class Lobby:
     """
     Lobby objects stores information about a game
     """
+    __slots__ = ('name', 'owner', 'unique_id', 'size', 'squad_size', 'state', 'game_zone', 'started_time', 'squads')
 
     def __init__(self, name, owner):
         self.name = name
@@ -27,7 +31,10 @@ class Lobby:
         self.game_zone = None
         self.started_time = None
         self.squads = []
-        self.table = DynamoDbConnector.get_table()
+
+    @property
+    def table(self):
+        return DynamoDbConnector.get_table()
 
     def __eq__(self, other):
         """If a Player object has the same username as another Player object, they are the same Player"""
@@ -47,6 +54,7 @@ class Lobby:
         letters_and_digits = string.ascii_letters + string.digits
         return ''.join((random.choice(letters_and_digits) for i in range(12)))
 
+    @traced
     def put(self, size, squad_size):
         """
         Inserts a new lobby into the database
@@ -73,6 +81,7 @@ class Lobby:
         self.size = size
         self.squad_size = squad_size
 
+    @traced
     def get(self):
         """
         Gets basic lobby information from the database.
@@ -115,25 +124,48 @@ class Lobby:
         except LobbyDoesNotExistException:
             return False
 
+    @traced
     def delete(self):
         """
         Delete a lobby and removes all squads in the lobby
         :return: None
         """
+        plan = CascadePlan()
+        self.plan_delete(plan)
+        plan.execute(self.table)
+
+    def plan_delete(self, plan):
+        """
+        Plan the deletion of a lobby, removing all squads in the lobby and the session tickets of its players. Assumes
+        lobby.get_squads() has been called
+        :param plan: CascadePlan to add writes to
+        :return: None
+        """
         if not self.exists():
             raise LobbyDoesNotExistException
 
-        for squad in self.squads:
-            self.remove_squad(squad)
+        usernames = {self.owner.username}
+        for squad in self._own_squads():
+            plan.delete({
+                'pk': 'LOBBY',
+                'sk': f'SQUAD#{squad.name}'
+            })
+            squad.plan_leave_lobby(plan)
+            usernames.update(member.username for member in squad.members)
+
+        for username in usernames:
+            plan.delete({
+                'pk': username,
+                'sk': 'SESSION'
+            })
 
         # delete lobby from database
-        self.table.delete_item(
-            Key={
-                'pk': self.name,
-                'sk': f'OWNER#{self.owner.username}'
-            }
-        )
+        plan.delete({
+            'pk': self.name,
+            'sk': f'OWNER#{self.owner.username}'
+        })
 
+    @traced
     def update(self,
                size: int = None,
                squad_size: int = None,
@@ -192,6 +224,7 @@ class Lobby:
                 },
                 AttributeUpdates=attributes_to_update)
 
+    @traced
     def start(self):
         """
         Starts a game lobby by setting state attribute to 'started' in database. A game in "finished" state can
@@ -209,7 +242,7 @@ class Lobby:
         if len(self.squads) < 2:
             raise NotEnoughSquadsException("Lobby does not have enough squads to start")
 
-        self.started_time = datetime.now(tz=pytz.utc)
+        self.started_time = get_clock().now(tz=pytz.utc)
         # set game as started
         self.table.update_item(
             Key={
@@ -217,11 +250,12 @@ class Lobby:
                 'sk': f'OWNER#{self.owner.username}'
             },
             AttributeUpdates={'state': dict(Value=LobbyState.STARTED.value),
-                              'started-time': dict(Value=self.started_time.isoformat())}
+                              'started-time': dict(Value=self.started_time.isoformat(timespec='microseconds'))}
         )
 
         self.state = LobbyState.STARTED
 
+    @traced
     def end(self):
         """
         End a game lobby by setting state attribute in database to 'finished'
@@ -244,6 +278,54 @@ class Lobby:
 
         self.state = LobbyState.FINISHED
 
+    @traced
+    def put_session_tickets(self):
+        """
+        Writes a session ticket for the GameMaster and every player in the lobby, holding everything needed to authorize
+        their websocket connection with a single read. Assumes lobby.get() and lobby.get_squads() has been called
+        :return: None
+        """
+        with self.table.batch_writer() as batch:
+            batch.put_item(Item=self._session_ticket(self.owner.username, SessionRole.GAME_MASTER))
+            for squad in self._own_squads():
+                for member in squad.members:
+                    batch.put_item(Item=self._session_ticket(member.username, SessionRole.PLAYER, squad))
+
+    @traced
+    def delete_session_tickets(self):
+        """
+        Deletes the session ticket of the GameMaster and every player in the lobby. Assumes lobby.get_squads() has been
+        called
+        :return: None
+        """
+        usernames = {self.owner.username}
+        usernames.update(member.username for squad in self._own_squads() for member in squad.members)
+        with self.table.batch_writer() as batch:
+            for username in usernames:
+                batch.delete_item(
+                    Key={
+                        'pk': username,
+                        'sk': 'SESSION'
+                    }
+                )
+
+    def _own_squads(self):
+        # squad items of every lobby share the LOBBY partition, so only trust squads which are flagged as in this lobby
+        return [squad for squad in self.squads
+                if squad.lobby_name == self.name and squad.lobby_owner == self.owner.username]
+
+    def _session_ticket(self, username, role, squad=None):
+        return {
+            'pk': username,
+            'sk': 'SESSION',
+            'role': role.value,
+            'lobby-name': self.name,
+            'lobby-owner': self.owner.username,
+            'lobby-id': self.unique_id,
+            'squad': squad.name if squad else None
+        }
+
+    @traced
     def add_squad(self, squad):
         """
         Adds a squad to the lobby instance. DynamoDB will not allow duplicates so no need to run self.get_squads().
@@ -287,6 +369,7 @@ class Lobby:
 
         self.squads.append(squad)
 
+    @traced
     def remove_squad(self, squad):
         """
         Removes a squad from the lobby instance. No need to run self.get_squads() before calling this to ensure
@@ -304,6 +387,7 @@ class Lobby:
             })
         squad.set_no_lobby()
 
+    @traced
     def get_squads(self):
         """
         Get all squads in the lobby and save to object
@@ -332,6 +416,7 @@ class Lobby:
                 return squad
         return False
 
+    @traced
     def get_players_and_states(self):
         """
         Get all players in the lobby, which squad they're in and their game state
@@ -367,6 +452,7 @@ class Lobby:
 
         raise PlayerNotInLobbyException(f"User {player.username} could not be found in the lobby")
 
+    @traced
     def set_player_dead(self, player):
         """
         Set a player as dead in the game lobby. Assumes lobby.get() and lobby.get_squads() has been called
@@ -390,6 +476,7 @@ class Lobby:
         # notify the game master that Player is dead through game session
         connection_manager.ConnectionManager().push_player_dead(player)
 
+    @traced
     def set_player_alive(self, player):
         """
         Set a player as alive in the game lobby. Assumes lobby.get() and lobby.get_squads() has been called
@@ -410,6 +497,7 @@ class Lobby:
             },
             AttributeUpdates={f'PLAYER#{player.username}': dict(Value=PlayerState.ALIVE.value)})
 
+    @traced
     def generate_first_circle(self):
         """
         Called when the first circle is being generated
@@ -419,6 +507,7 @@ class Lobby:
         self.game_zone.create_next_circle()
         self.update(next_circle=self.game_zone.next_circle)
 
+    @traced
     def close_current_circle(self):
         """
         Facilitates the closing of the current circle (if it exist) to become the next_circle. This is run on a lambda
@@ -1,12 +1,17 @@
+from collections import Counter
 from math import cos, pi
-from geopy import distance
 import random
 
 from configuration import Configuration
-from websockets import connection_manager as cm
+
+# geopy is only imported once a distance is measured. It imports its geocoders and requests along with it, and only
+# circle generation needs it, while lobbies holding circles are read by almost every route
 
 CIRCLE_CONFIG = Configuration().get_configuration()['DEFAULT_CIRCLE_CONFIG']
 
+# number of candidates drawn by each rejection sampling loop, keyed by the method running the loop
+rejection_sampling = Counter()
+
 
 class MapObject:
     @staticmethod
@@ -27,6 +32,7 @@ class MapObject:
         :param coordinate_2: coordinates of second point
         :return: distance in meters between the two coordinates
         """
+        from geopy import distance
         return distance.distance((coordinate_1['latitude'], coordinate_1['longitude']),
                                  (coordinate_2['latitude'], coordinate_2['longitude'])).kilometers
 
@@ -73,11 +79,14 @@ class Circle(MapObject):
         :param max_allowed_distance: maximum allowed distance of new circle centre from self.centre in kilometers
         :return: a valid next circle centre given allowed distance from current circle
         """
+        from geopy import distance
+
         # change in latitude and longitude if self.centre is moved distance_from_centre kilometers
         latitude_adjustment = (max_allowed_distance / distance.EARTH_RADIUS) * (180 / pi)
         longitude_adjustment = (max_allowed_distance / distance.EARTH_RADIUS) * (180 / pi) / cos(self.centre['latitude'] * pi / 180)
 
         while True:
+            rejection_sampling['generate_centre_within_distance'] += 1
             # generate random coordinate within distance_from_centre metres from current self.centre
             new_centre_latitude = random.uniform(self.centre['latitude']-latitude_adjustment,
                                                  self.centre['latitude']+latitude_adjustment)
@@ -104,6 +113,7 @@ class Circle(MapObject):
         # future we should narrow down the search space for the new circle to improve response times but it's pretty
         # fast as is
         while True:
+            rejection_sampling['generate_centre_within_distance_and_contains'] += 1
             # generate a valid circle which may or may not exclude the final circle
             proposed_centre = self.generate_centre_within_distance(distance_from_centre)
             # verify if the proposed circle centre excludes the final circle or not
@@ -207,6 +217,11 @@ class GameZone(MapObject):
             # if a final circle has been defined, next circle must include that final circle in its entirety
             if self.final_circle:
 
+                # once the final circle has been reached it stays the play area, as no smaller circle can contain it
+                if self.current_circle == self.final_circle:
+                    self.next_circle = self.final_circle
+                    return
+
                 # if final circle radius is greater than new_radius but smaller than current_radius, take final circle
                 if new_radius < self.final_circle.radius < self.current_circle.radius:
                     self.next_circle = self.final_circle
@@ -271,6 +286,7 @@ class GameZone(MapObject):
             intermediate_circles = mock_circle.generate_intermediate_circles(self.next_circle)
 
         # push each intermediate circle to clients. Once complete, set current_circle
+        from websockets import connection_manager as cm
         connection_manager = cm.ConnectionManager()
         connection_manager.push_circle_updates(intermediate_circles, lobby=lobby)
         self.current_circle = self.next_circle
@@ -1,5 +1,6 @@
-from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.conditions import Key, Attr
 
+from db.cascade import CascadePlan
 from db.dynamodb_connector import DynamoDbConnector
 from exceptions import UserDoesNotExistException, PlayerDoesNotOwnSquadException, SquadAlreadyExistsException, \
     PlayerOwnsSquadException, PlayerNotInLobbyException, SquadInLobbyException
@@ -7,20 +8,25 @@ from models import squad as squad_model
 from models import user
 from models import lobby as lobby_model
 from models import game_master as game_master_model
-from enums import PlayerState
+from enums import PlayerState, SyntheticEntityType
+from tracing import traced
 
 
 class Player(user.User):
     """
     A Player type of User.
     """
+    __slots__ = ('username', 'lobby', 'squad')
 
     def __init__(self, username: str):
         super().__init__()
         self.username = username
         self.lobby = None  # only has a value if the player is in the lobby
         self.squad = None  # has the Squad that the player is in a lobby with
-        self.table = DynamoDbConnector.get_table()
+
+    @property
+    def table(self):
+        return DynamoDbConnector.get_table()
 
     def __eq__(self, other):
         """If a Player object has the same username as another Player object, they are the same Player"""
@@ -28,6 +34,7 @@ class Player(user.User):
             return self.username == other.username
         return False
 
+    @traced
     def get(self):
         """
         Gets a player from the database
@@ -65,15 +72,16 @@ class Player(user.User):
         :return: None
         """
 
-        self.table.put_item(
-            Item={
-                'pk': self.username,
-                'sk': 'USER',
-                'in-game': False,
-                'lobby-name': None,
-                'lobby-owner': None
-            }
-        )
+        item = {
+            'pk': self.username,
+            'sk': 'USER',
+            'in-game': False,
+            'lobby-name': None,
+            'lobby-owner': None
+        }
+        if self.username.startswith(user.TEST_PLAYER_PREFIX):
+            item['test-entity'] = SyntheticEntityType.PLAYER.value
+        self.table.put_item(Item=item)
 
     def delete(self, access_token):
         """
@@ -85,26 +93,25 @@ class Player(user.User):
         if self.lobby.name:
             raise SquadInLobbyException("User cannot be deleted whilst in a Lobby")
 
-        # delete any squads the player owns and cleanup
-        squads_to_delete = self.get_owned_squads()
-        for squad in squads_to_delete:
-            squad.delete()
-
-        # leave any squads the player does not own
-        squads_to_leave = self.get_not_owned_squads()
-        for squad in squads_to_leave:
-            squad.remove_member(self)
+        plan = CascadePlan()
+        for squad in self.get_squads():
+            if squad.owner == self:
+                # delete any squads the player owns and cleanup
+                squad.plan_delete(plan)
+            else:
+                # leave any squads the player does not own
+                squad.plan_remove_member(plan, self)
 
         # delete player from database
-        self.table.delete_item(
-            Key={
-                'pk': self.username,
-                'sk': 'USER'
-            },
-        )
+        plan.delete({
+            'pk': self.username,
+            'sk': 'USER'
+        })
+        plan.execute(self.table)
         # delete user from Cognito service
         self.cognito_client.delete_user(AccessToken=access_token)
 
+    @traced
     def create_squad(self, squad_name):
         """
         Creates a new squad owned by Player
@@ -117,6 +124,7 @@ class Player(user.User):
         squad.put(owner=self)
         return squad
 
+    @traced
     def delete_squad(self, squad):
         """
         Deletes a squad owned by Player from the database
@@ -135,6 +143,7 @@ class Player(user.User):
 
         squad.delete()
 
+    @traced
     def add_member_to_squad(self, squad, new_member):
         """
         Invite a user to join your squad. For now a user is just added instead of invited
@@ -155,6 +164,7 @@ class Player(user.User):
 
         squad.add_member(new_member)
 
+    @traced
     def remove_member_from_squad(self, squad, member_to_remove):
         """
         Remove a member from a squad. If squad is owned by Player, other players other than Self can be removed too.
@@ -179,52 +189,43 @@ class Player(user.User):
         Retrieves all squads owned by Player
         :return: List of squads owned by Player
         """
-        response = self.table.query(
-            IndexName='lsi',  # lsi of squad item will be username of the owner of the squad
-            KeyConditionExpression=Key('pk').eq('squad') & Key('lsi').eq(f'SQUADOWNER#{self.username}')
-        )
-
-        squads = []
-        for item in response['Items']:
-            # get squad and fill with information
-            squad = squad_model.Squad(item['sk'].split('#')[1])
-            squad.get()
-            squad.get_members()
-            squads.append(squad)
-
-        return squads
+        return self._get_squad_summaries(Attr('owner').eq(self.username))
 
     def get_not_owned_squads(self):
         """
         Get squads that Player is in but does not own
         :return: list of squads Player is in but does not own
         """
+        return self._get_squad_summaries(Attr('owner').ne(self.username))
 
-        response = self.table.query(
-            IndexName='lsi-2',  # lsi of squad item will be username of the owner of the squad
-            KeyConditionExpression=Key('pk').eq('squad-member') & Key('lsi-2').eq(self.username)
-        )
-
-        squads = []
-        for item in response['Items']:
-            # only get squads which calling player does not own
-            if item['lsi'].split('#')[3] != self.username:
-                # get squad and fill with information
-                squad = squad_model.Squad(item['lsi'].split('#')[1])
-                squad.get()
-                squad.get_members()
-                squads.append(squad)
-
-        return squads
-
+    @traced
     def get_squads(self):
         """
         Get all squads that Player is in.
         :return:
         """
-        not_owned_squads = self.get_not_owned_squads()
-        owned_squads = self.get_owned_squads()
-        return not_owned_squads + owned_squads
+        squads = self._get_squad_summaries()
+        # squads the Player does not own come first
+        return sorted(squads, key=lambda squad: squad.owner.username == self.username)
+
+    def _get_squad_summaries(self, filter_expression=None):
+        """
+        Get squads that Player is in from the squad summaries in their partition, which hold the owner, members and
+        lobby of each squad
+        :param filter_expression: condition on the summaries to return
+        :return: list of squads
+        """
+        query_kwargs = dict(KeyConditionExpression=Key('pk').eq(self.username) & Key('sk').begins_with('SQUAD#'))
+        if filter_expression is not None:
+            query_kwargs['FilterExpression'] = filter_expression
+
+        squads = []
+        while True:
+            response = self.table.query(**query_kwargs)
+            squads.extend(squad_model.Squad.from_summary(item) for item in response['Items'])
+            if 'LastEvaluatedKey' not in response:
+                return squads
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
 
     def pull_squad_from_lobby(self, squad):
         """
@@ -237,6 +238,7 @@ class Player(user.User):
 
         squad.leave_lobby()
 
+    @traced
     def set_in_lobby(self, lobby, squad):
         """
         If player is in a squad, that squad is in a game lobby, set flag on player to show this
@@ -254,6 +256,7 @@ class Player(user.User):
                               'lobby-owner': dict(Value=lobby.owner.username),
                               'squad': dict(Value=squad.name)})
 
+    @traced
     def set_no_lobby(self):
         """
         If player is in a squad, that squad is in a game lobby, set flag on player to show this
@@ -270,6 +273,7 @@ class Player(user.User):
                               'lobby-owner': dict(Value=None),
                               'squad': dict(Value=None)})
 
+    @traced
     def get_current_lobby(self):
         """
         Get current game lobby if player is in an active game
@@ -290,6 +294,7 @@ class Player(user.User):
         player_state = current_lobby.get_player(self)
         return PlayerState(player_state['state'])
 
+    @traced
     def dead(self):
         """
         Set player as dead if they are in a lobby that has started
@@ -300,6 +305,7 @@ class Player(user.User):
         current_lobby.get_squads()
         current_lobby.set_player_dead(self)
 
+    @traced
     def alive(self):
         """
         Set player as alive if they are in a lobby that has started
@@ -1,15 +1,18 @@
 from boto3.dynamodb.conditions import Key
+from db.cascade import CascadePlan
 from db.dynamodb_connector import DynamoDbConnector
 from exceptions import SquadDoesNotExistException, SquadAlreadyExistsException, UserAlreadyMemberException, \
     UserCouldNotBeRemovedException
 from models import player as player_model
 from models import lobby as lobby_model
+from tracing import traced
 
 
 class Squad:
     """
     A Squad consisting of X members. Squad name's are unique.
     """
+    __slots__ = ('name', 'owner', 'lobby_name', 'lobby_owner', 'members')
 
     def __init__(self, name: str, owner=None):
         self.name = name  # name of squad
@@ -17,7 +20,10 @@ class Squad:
         self.lobby_name = None  # will have a value if squad is in a lobby
         self.lobby_owner = None  # will have a value if squad is in a lobby
         self.members = []  # list of members in squad
-        self.table = DynamoDbConnector.get_table()
+
+    @property
+    def table(self):
+        return DynamoDbConnector.get_table()
 
     def __eq__(self, other):
         """
@@ -27,6 +33,7 @@ class Squad:
             return self.name == other.name
         return False
 
+    @traced
     def put(self, owner):
         """
         Inserts a new Squad into the database and adds the owner to it
@@ -46,22 +53,66 @@ class Squad:
         self.owner = owner
         self.add_member(owner)
 
+    @traced
     def delete(self):
         """
         Delete a squad and all squad-members from database
         :return: None
         """
-        # remove squad members
+        plan = CascadePlan()
+        self.plan_delete(plan)
+        plan.execute(self.table)
+
+    def plan_delete(self, plan):
+        """
+        Plan the deletion of the squad, its squad-members and their squad summaries. Requires squad members
+        (squad.get_members())
+        :param plan: CascadePlan to add writes to
+        :return: None
+        """
         for member in self.members:
-            self.remove_member(member)
+            plan.delete({
+                'pk': 'squad-member',
+                'sk': f'SQUAD#{self.name}#MEMBER#{member.username}',
+            })
+            plan.delete(self._summary_key(member.username))
 
-        # delete squad from database
-        self.table.delete_item(
-            Key={
-                'pk': 'squad',
-                'sk': f'SQUADNAME#{self.name}'
-            },
-        )
+        plan.delete({
+            'pk': 'squad',
+            'sk': f'SQUADNAME#{self.name}'
+        })
+
+    def plan_remove_member(self, plan, member_to_remove):
+        """
+        Plan the removal of a member from the squad, updating the squad summaries of the remaining members. Requires
+        basic squad information and members (squad.get() and squad.get_members())
+        :param plan: CascadePlan to add writes to
+        :param member_to_remove: Player to remove
+        :return: None
+        """
+        plan.delete({
+            'pk': 'squad-member',
+            'sk': f'SQUAD#{self.name}#MEMBER#{member_to_remove.username}',
+        })
+        plan.delete(self._summary_key(member_to_remove.username))
+
+        self.members = [member for member in self.members if member != member_to_remove]
+        for member in self.members:
+            plan.put(self._summary(member.username, self.lobby_name, self.lobby_owner))
+
+    def plan_leave_lobby(self, plan):
+        """
+        Plan clearing the lobby of the squad and each of its members, the writes of set_no_lobby(). Requires basic squad
+        information and members (squad.get() and squad.get_members())
+        :param plan: CascadePlan to add writes to
+        :return: None
+        """
+        plan.update({'pk': 'squad', 'sk': f'SQUADNAME#{self.name}'},
+                    {'lobby-name': dict(Value=None), 'lobby-owner': dict(Value=None)})
+        for member in self.members:
+            plan.put(self._summary(member.username, None, None))
+            plan.update({'pk': member.username, 'sk': 'USER'},
+                        {'lobby-name': dict(Value=None), 'lobby-owner': dict(Value=None), 'squad': dict(Value=None)})
 
     def exists(self):
         """
@@ -74,6 +125,7 @@ class Squad:
         except SquadDoesNotExistException:
             return False
 
+    @traced
     def get(self):
         """
         Gets a squad from the database
@@ -94,23 +146,31 @@ class Squad:
         self.lobby_name = squad.get('lobby-name')
         self.lobby_owner = squad.get('lobby-owner')
 
+    @traced
     def get_members(self):
         """
         Get all members belonging to the squad and save to object
         :return: Members belonging to the squad
         """
         self.members = []
-        response = self.table.query(
-            IndexName='lsi',
-            Select='ALL_ATTRIBUTES',
-            KeyConditionExpression=Key('pk').eq('squad-member') & Key('lsi').begins_with(f'SQUADNAME#{self.name}')
+        # the trailing delimiter stops the prefix matching squads whose name starts with this squad's name
+        query_kwargs = dict(
+            ProjectionExpression='sk',
+            KeyConditionExpression=Key('pk').eq('squad-member') & Key('sk').begins_with(f'SQUAD#{self.name}#MEMBER#')
         )
+        usernames = set()
+        while True:
+            response = self.table.query(**query_kwargs)
+            for member in response['Items']:
+                username = member['sk'].split('#MEMBER#', 1)[1]
+                if username not in usernames:
+                    usernames.add(username)
+                    self.members.append(player_model.Player(username))
+            if 'LastEvaluatedKey' not in response:
+                break
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
 
-        for member in response['Items']:
-            squad_member = player_model.Player(member['sk'].split('#')[3])
-            if squad_member not in self.members:
-                self.members.append(squad_member)
-
+    @traced
     def add_member(self, new_member):
         """
         Add a new user to the squad
@@ -133,10 +193,12 @@ class Squad:
         )
 
         self.members.append(new_member)
+        self.put_summaries(self.lobby_name, self.lobby_owner)
 
+    @traced
     def remove_member(self, member_to_remove):
         """
-        Delete a user from the squad
+        Delete a user from the squad. Requires basic squad information (squad.get())
         :param member_to_remove: Username of player to delete
         :return:
         """
@@ -149,6 +211,49 @@ class Squad:
         if res['ResponseMetadata']['HTTPStatusCode'] != 200:
             raise UserCouldNotBeRemovedException("Failed to delete player")
 
+        self.table.delete_item(Key=self._summary_key(member_to_remove.username))
+        self.get_members()
+        self.put_summaries(self.lobby_name, self.lobby_owner)
+
+    @traced
+    def put_summaries(self, lobby_name, lobby_owner):
+        """
+        Writes a summary of the squad for each member, so a Player can read every squad they are in with a single
+        query. Must be called whenever the members or lobby of the squad change. Requires basic squad information and
+        members (squad.get() and squad.get_members())
+        :param lobby_name: name of lobby the squad is in, or None
+        :param lobby_owner: username of owner of lobby the squad is in, or None
+        :return: None
+        """
+        with self.table.batch_writer() as batch:
+            for member in self.members:
+                batch.put_item(Item=self._summary(member.username, lobby_name, lobby_owner))
+
+    @classmethod
+    def from_summary(cls, summary):
+        """
+        Create a squad from a squad summary, without reading the squad itself
+        :param summary: squad summary item
+        :return: Squad
+        """
+        squad = cls(summary['sk'].split('#', 1)[1], player_model.Player(summary['owner']))
+        squad.lobby_name = summary.get('lobby-name')
+        squad.lobby_owner = summary.get('lobby-owner')
+        squad.members = [player_model.Player(username) for username in summary['members']]
+        return squad
+
+    def _summary(self, username, lobby_name, lobby_owner):
+        return dict(self._summary_key(username),
+                    owner=self.owner.username,
+                    members=[member.username for member in self.members],
+                    **{'lobby-name': lobby_name, 'lobby-owner': lobby_owner})
+
+    def _summary_key(self, username):
+        return {
+            'pk': username,
+            'sk': f'SQUAD#{self.name}'
+        }
+
     def leave_lobby(self):
         """
         Leave a lobby that a GameMaster has added you to. Requires basic squad information (squad.get())
@@ -160,6 +265,7 @@ class Squad:
         lobby.remove_squad(self)
         self.set_no_lobby()
 
+    @traced
     def set_in_lobby(self, lobby):
         """
         If squad is in a lobby, set flag to show this. Set flag for each player in the squad as well.
@@ -174,11 +280,13 @@ class Squad:
             },
             AttributeUpdates={'lobby-name': dict(Value=lobby.name),
                               'lobby-owner': dict(Value=lobby.owner.username)})
+        self.put_summaries(lobby.name, lobby.owner.username)
 
         # set each player in squad as in lobby
         for player in self.members:
             player.set_in_lobby(lobby, self)
 
+    @traced
     def set_no_lobby(self):
         """
         If squad is not a lobby, set lobby-name to None
@@ -191,6 +299,7 @@ class Squad:
             },
             AttributeUpdates={'lobby-name': dict(Value=None),
                               'lobby-owner': dict(Value=None)})
+        self.put_summaries(None, None)
 
         # set each player in squad as in lobby
         for player in self.members:
@@ -1,21 +1,33 @@
 import os
-import boto3
 from botocore.exceptions import ClientError
+from db.cognito_connector import CognitoConnector
 from exceptions import SignInException, SignUpException, SignOutException, UserDoesNotExistException
 
+# usernames of synthetic users created by the test endpoints. Their USER items are tagged into the sparse test-entity
+# index, so they can be cleaned up with a query instead of a scan
+TEST_PLAYER_PREFIX = 'test_player_'
+TEST_GAME_MASTER_PREFIX = 'test_game_master_'
+
 
 class User:
     """
     A single User of the BattleRoyale application
     """
+    __slots__ = ()
 
-    def __init__(self):
+    @property
+    def cognito_client(self):
         # connect to user_management client
-        self.cognito_client = boto3.client("cognito-idp", region_name="eu-central-1")
+        return CognitoConnector.get_client()
+
+    # Pool ID and secret which must be used to connect to Cognito
+    @property
+    def USER_POOL_ID(self):
+        return os.getenv('USER_POOL_ID')
 
-        # Pool ID and secret which must be used to connect to Cognito
-        self.USER_POOL_ID = os.getenv('USER_POOL_ID')
-        self.USER_POOL_CLIENT_ID = os.getenv('USER_POOL_CLIENT_ID')
+    @property
+    def USER_POOL_CLIENT_ID(self):
+        return os.getenv('USER_POOL_CLIENT_ID')
 
     def sign_up(self, username: str, password: str, email: str):
         """
@@ -0,0 +1,243 @@
+"""
+On-demand profiling of handler invocations. A profiled invocation runs under cProfile and tracemalloc, and writes
+gzipped results to $PROFILE_DIRECTORY (default /tmp), with a summary logged as a single JSON line:
+
+ - <handler>-<id>.prof.gz: cProfile stats, which pstats reads once decompressed
+ - <handler>-<id>.allocations.txt.gz: the lines which allocated the most memory still held when the handler returned
+
+Set $PROFILE_SAMPLE_RATE to the fraction of invocations to profile, from 0 (the default, profiling disabled) to 1, and
+optionally $PROFILE_HANDLERS to a comma separated list of handler names to limit it to, e.g.
+
+   PROFILE_SAMPLE_RATE=1 PROFILE_HANDLERS=circle_queue_handler
+
+A profile written by a Lambda can be printed by copying it out of /tmp, e.g. from a test invocation, and running:
+
+   > python -m profiling /tmp/circle_queue_handler-3f0c….prof.gz
+"""
+import json
+import os
+import random
+import threading
+import time
+import uuid
+
+# cProfile, pstats, tracemalloc and gzip are only imported once an invocation is profiled, as they would otherwise add to
+# the cold start of every handler
+
+SAMPLE_RATE_VARIABLE = 'PROFILE_SAMPLE_RATE'
+HANDLERS_VARIABLE = 'PROFILE_HANDLERS'
+DIRECTORY_VARIABLE = 'PROFILE_DIRECTORY'
+DEFAULT_DIRECTORY = '/tmp'
+
+# frames kept for each allocation traced
+TRACEMALLOC_FRAMES = 10
+# allocation sites written to the allocations file, and entries of each kind in the logged summary
+TOP_ALLOCATIONS = 50
+SUMMARY_ENTRIES = 5
+
+# held while an invocation is profiled. cProfile and tracemalloc are process wide, so only one invocation at a time can
+# be profiled, e.g. when a local stand-in runs handlers on several threads
+_profiling = threading.Lock()
+
+
+def sample_rate():
+    """
+    :return: fraction of invocations to profile, from $PROFILE_SAMPLE_RATE
+    """
+    try:
+        return min(max(float(os.getenv(SAMPLE_RATE_VARIABLE) or 0), 0.0), 1.0)
+    except ValueError:
+        return 0.0
+
+
+def profiled_handlers():
+    """
+    :return: set of handler names which may be profiled, or None if any handler may be
+    """
+    handlers = os.getenv(HANDLERS_VARIABLE)
+    if not handlers:
+        return None
+    return {handler.strip() for handler in handlers.split(',') if handler.strip()}
+
+
+def emit(line):
+    # Lambda sends stdout to CloudWatch Logs
+    print(line)
+
+
+class Profile:
+    """
+    cProfile and tracemalloc results of a single invocation
+    """
+
+    def __init__(self, name, directory=None):
+        """
+        :param name: name of the handler invoked
+        :param directory: directory results are written to. Defaults to $PROFILE_DIRECTORY, or /tmp
+        """
+        self.name = name
+        self.profile_id = uuid.uuid4().hex
+        import cProfile
+
+        self.directory = directory or os.getenv(DIRECTORY_VARIABLE) or DEFAULT_DIRECTORY
+        self.profiler = cProfile.Profile()
+        self.started = None
+        # tracemalloc may already be running, e.g. under python -X tracemalloc, in which case it is left running
+        self.started_tracemalloc = False
+
+    def start(self):
+        import tracemalloc
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self.started_tracemalloc = True
+        self.started = time.perf_counter()
+        self.profiler.enable()
+
+    def stop(self):
+        """
+        :return: seconds the invocation took, peak bytes traced, and tracemalloc statistics of the memory still held,
+        largest first
+        """
+        import tracemalloc
+
+        self.profiler.disable()
+        seconds = time.perf_counter() - self.started
+        snapshot = tracemalloc.take_snapshot().filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),
+                                                              tracemalloc.Filter(False, __file__)))
+        _, peak = tracemalloc.get_traced_memory()
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+        self.profiler.create_stats()
+        return seconds, peak, snapshot.statistics('lineno')
+
+    def write(self, allocations):
+        """
+        :param allocations: tracemalloc statistics, largest first
+        :return: paths of the stats and allocations files written
+        """
+        import gzip
+        import marshal
+
+        os.makedirs(self.directory, exist_ok=True)
+        prefix = os.path.join(self.directory, f'{self.name}-{self.profile_id}')
+        stats_path, allocations_path = f'{prefix}.prof.gz', f'{prefix}.allocations.txt.gz'
+        with gzip.open(stats_path, 'wb') as f:
+            f.write(marshal.dumps(self.profiler.stats))
+        with gzip.open(allocations_path, 'wt') as f:
+            for statistic in allocations[:TOP_ALLOCATIONS]:
+                f.write(f'{statistic}\n')
+        return stats_path, allocations_path
+
+    def finish(self, **attributes):
+        """
+        Stop profiling, write the results and log a summary
+        :param attributes: attributes of the invocation to log, e.g. the status code returned
+        """
+        import io
+        import pstats
+
+        seconds, peak, allocations = self.stop()
+        stats_path, allocations_path = self.write(allocations)
+
+        stats = pstats.Stats(self.profiler, stream=io.StringIO()).sort_stats('cumulative')
+        hottest = []
+        for function in stats.fcn_list[:SUMMARY_ENTRIES]:
+            filename, line, function_name = function
+            _, calls, _, cumulative, _ = stats.stats[function]
+            hottest.append([f'{os.path.basename(filename)}:{line}({function_name})', calls, round(cumulative * 1000, 3)])
+
+        emit(json.dumps(dict(profile=self.name, id=self.profile_id, ms=round(seconds * 1000, 3), **attributes,
+                             peak_kb=round(peak / 1024, 1),
+                             cumulative=hottest,
+                             allocations=[[str(statistic.traceback), round(statistic.size / 1024, 1)]
+                                          for statistic in allocations[:SUMMARY_ENTRIES]],
+                             files=[stats_path, allocations_path]),
+                        separators=(',', ':'), default=str))
+
+
+def start_profile(name):
+    """
+    Start profiling an invocation, if it is sampled
+    :param name: name of the handler invoked
+    :return: Profile, or None if the invocation is not sampled
+    """
+    rate = sample_rate()
+    if not rate or random.random() >= rate:
+        return None
+    handlers = profiled_handlers()
+    if handlers is not None and name not in handlers:
+        return None
+    if not _profiling.acquire(blocking=False):
+        return None
+    profile = Profile(name)
+    try:
+        profile.start()
+    except ValueError as e:
+        # another profiler is already running in the process, e.g. a debugger
+        print(f'Failed to profile {name}: {e!r}')
+        if profile.started_tracemalloc:
+            import tracemalloc
+            tracemalloc.stop()
+        _profiling.release()
+        return None
+    return profile
+
+
+def finish_profile(profile, **attributes):
+    """
+    Stop profiling an invocation, write its results and log a summary
+    :param profile: Profile returned by start_profile(), or None
+    :param attributes: attributes of the invocation to log, e.g. the status code returned
+    """
+    if profile is None:
+        return
+    try:
+        profile.finish(**attributes)
+    except Exception as e:
+        # a failure to profile must never fail the invocation
+        print(f'Failed to write profile of {profile.name}: {e!r}')
+    finally:
+        _profiling.release()
+
+
+def load_stats(path):
+    """
+    :param path: path of a .prof.gz file written by a profile
+    :return: pstats.Stats
+    """
+    import gzip
+    import marshal
+    import pstats
+
+    with gzip.open(path, 'rb') as f:
+        stats = marshal.loads(f.read())
+
+    class LoadedProfile:
+        def create_stats(self):
+            self.stats = stats
+
+    return pstats.Stats(LoadedProfile())
+
+
+def main():
+    import argparse
+    import gzip
+    import sys
+
+    parser = argparse.ArgumentParser(description='Print a profile written by a handler')
+    parser.add_argument('path', help='.prof.gz file written by a profiled invocation')
+    parser.add_argument('--sort', default='cumulative', help='pstats sort key')
+    parser.add_argument('--limit', type=int, default=30, help='number of functions to print')
+    args = parser.parse_args()
+
+    load_stats(args.path).sort_stats(args.sort).print_stats(args.limit)
+    allocations_path = args.path[:-len('.prof.gz')] + '.allocations.txt.gz'
+    if os.path.exists(allocations_path):
+        print('Largest allocations still held when the handler returned:')
+        with gzip.open(allocations_path, 'rt') as f:
+            sys.stdout.write(f.read())
+
+
+if __name__ == '__main__':
+    main()
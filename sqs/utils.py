@@ -3,17 +3,21 @@ import os
 
 import boto3
 
+import tracing
+
 
 class SqsQueue:
     """
     SQS queue class that abstracts interacting with an SQS queue
     """
+    # SQS client used by every queue. Created for each queue unless set, e.g. to a stand-in
+    client = None
 
     def __init__(self):
         """
         Create SQS queue based off of SQS URL in the environment
         """
-        self.queue = boto3.client('sqs')
+        self.queue = self.client if self.client is not None else boto3.client('sqs')
         self.url = os.getenv('SQS_URL')
 
     def send_message(self, message: dict, delay=None):
@@ -22,9 +26,10 @@ class SqsQueue:
         :param message: message to be enqueued
         :param delay: message to be enqueued
         """
-        self.queue.send_message(QueueUrl=self.url,
-                                MessageBody=json.dumps(message),
-                                DelaySeconds=delay)
+        with tracing.span('sqs.SendMessage'):
+            self.queue.send_message(QueueUrl=self.url,
+                                    MessageBody=json.dumps(message),
+                                    DelaySeconds=delay)
 
     def delete_message(self, receipt_handle):
         """
@@ -56,6 +56,10 @@ class TestWithMockAWSServices(unittest.TestCase):
                     'AttributeName': 'lsi-2',
                     'AttributeType': 'S'
                 },
+                {
+                    'AttributeName': 'test-entity',
+                    'AttributeType': 'S'
+                },
             ],
             LocalSecondaryIndexes=[
                 {
@@ -91,6 +95,28 @@ class TestWithMockAWSServices(unittest.TestCase):
                     }
                 }
             ],
+            GlobalSecondaryIndexes=[
+                {
+                    'IndexName': 'test-entity',
+                    'KeySchema': [
+                        {
+                            'AttributeName': 'test-entity',
+                            'KeyType': 'HASH'
+                        },
+                        {
+                            'AttributeName': 'pk',
+                            'KeyType': 'RANGE'
+                        }
+                    ],
+                    'Projection': {
+                        'ProjectionType': 'KEYS_ONLY'
+                    },
+                    'ProvisionedThroughput': {
+                        'ReadCapacityUnits': 1,
+                        'WriteCapacityUnits': 1
+                    }
+                }
+            ],
             ProvisionedThroughput={
                 'ReadCapacityUnits': 1,
                 'WriteCapacityUnits': 1
@@ -0,0 +1,66 @@
+import unittest
+
+from benchmarks import compare, percentile, summarise
+from benchmarks import circles, model_flows
+from db.dynamodb_connector import DynamoDbConnector
+
+
+class TestBaselines(unittest.TestCase):
+
+    def test_summarise(self):
+        result = summarise([float(i) for i in range(100, 0, -1)])
+        self.assertEqual(result['calls'], 100)
+        self.assertEqual(result['p50'], 51.0)
+        self.assertEqual(result['p95'], 96.0)
+        self.assertEqual(result['max'], 100.0)
+        self.assertEqual(percentile([], 50), 0.0)
+
+    def test_compare(self):
+        baseline = dict(case=dict(p50=1.0, mean_candidates=10.0), removed=dict(p50=1.0))
+        tolerances = dict(p50=2.0, mean_candidates=1.1)
+
+        # within tolerance, and cases missing from the baseline are not compared
+        self.assertEqual(compare(dict(case=dict(p50=1.9, mean_candidates=11.0), new=dict(p50=100.0)), baseline,
+                                 tolerances), [])
+
+        regressions = compare(dict(case=dict(p50=2.5, mean_candidates=11.5)), baseline, tolerances)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(regressions[0].startswith('case: p50'))
+
+
+class TestCircleBenchmark(unittest.TestCase):
+
+    def test_candidates_are_counted(self):
+        results = circles.benchmark_create_next_circle(calls=2, seed=0)
+
+        self.assertIn('first_circle/small/none', results)
+        self.assertIn('next_circle/near_final/edge/0.05', results)
+        for result in results.values():
+            self.assertEqual(result['calls'], 2)
+            self.assertGreaterEqual(result['mean_candidates'], 1)
+            self.assertGreaterEqual(result['max_candidates'], result['mean_candidates'])
+
+    def test_seeded_runs_draw_the_same_candidates(self):
+        first = circles.benchmark_create_next_circle(calls=2, seed=1)
+        second = circles.benchmark_create_next_circle(calls=2, seed=1)
+        self.assertEqual({case: result['max_candidates'] for case, result in first.items()},
+                         {case: result['max_candidates'] for case, result in second.items()})
+
+
+class TestModelFlowBenchmark(unittest.TestCase):
+
+    def test_round_trips_per_lobby_size(self):
+        results = model_flows.benchmark([2, 4])
+
+        # reading a lobby's squads reads each squad and its members one by one
+        for squads in (2, 4):
+            self.assertEqual(results[squads]['get_squads_in_lobby']['round_trips'], 2 + 2 * squads)
+        # a Player's squads are read from their squad summaries in a single query, whatever the size of the lobby
+        self.assertEqual(results[2]['get_squads']['round_trips'], 1)
+        self.assertEqual(results[4]['get_squads']['round_trips'], 1)
+        self.assertEqual(results[4]['set_player_dead']['calls'], 4)
+
+    def test_stand_ins_are_restored(self):
+        table = DynamoDbConnector.table
+        model_flows.benchmark([2])
+        self.assertIs(DynamoDbConnector.table, table)
@@ -0,0 +1,28 @@
+from db.cascade import CascadePlan
+from tests.mock_db import TestWithMockAWSServices
+
+
+class TestCascadePlan(TestWithMockAWSServices):
+
+    def test_plan_execution(self):
+        for i in range(60):
+            self.table.put_item(Item={'pk': f'player-{i}', 'sk': 'USER', 'lobby-name': 'test-lobby'})
+
+        plan = CascadePlan()
+        for i in range(30):
+            plan.delete({'pk': f'player-{i}', 'sk': 'USER'})
+        for i in range(60):
+            plan.update({'pk': f'player-{i}', 'sk': 'USER'}, {'lobby-name': dict(Value=None)})
+        plan.put({'pk': 'squad', 'sk': 'SQUADNAME#test-squad'})
+
+        # updates to deleted items are dropped, so they are not recreated
+        self.assertEqual(61, len(plan))
+
+        progress = []
+        plan.execute(self.table, progress=lambda done, total: progress.append((done, total)))
+        self.assertEqual((61, 61), progress[-1])
+        self.assertEqual(sorted(progress), progress)
+
+        self.assertNotIn('Item', self.table.get_item(Key={'pk': 'player-0', 'sk': 'USER'}))
+        self.assertIsNone(self.table.get_item(Key={'pk': 'player-59', 'sk': 'USER'})['Item'].get('lobby-name'))
+        self.assertIn('Item', self.table.get_item(Key={'pk': 'squad', 'sk': 'SQUADNAME#test-squad'}))
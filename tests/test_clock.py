@@ -0,0 +1,88 @@
+import unittest
+from unittest import mock
+
+from clock import VirtualClock, RealClock, set_clock, get_clock
+from db.dynamodb_connector import DynamoDbConnector, expires_in
+from local_services.dynamodb import LocalTable, install
+from websockets.batching import MessageBatcher
+from websockets.connection_manager import ConnectionManager, UNAUTHORIZED_CONNECTION_TTL
+
+
+class TestVirtualClock(unittest.TestCase):
+
+    def test_sleep_runs_due_timers(self):
+        clock = VirtualClock(start=100)
+        fired = []
+        clock.call_later(5, lambda: fired.append(('a', clock.time())))
+        clock.call_at(102, lambda: fired.append(('b', clock.time())))
+        clock.call_later(30, lambda: fired.append(('c', clock.time())))
+
+        clock.sleep(10)
+        self.assertEqual([('b', 102), ('a', 105)], fired)
+        self.assertEqual(110, clock.time())
+
+        # going back in time does nothing
+        clock.advance_to(50)
+        self.assertEqual(110, clock.time())
+        self.assertEqual(2, len(fired))
+
+    def test_timers_can_schedule_timers(self):
+        clock = VirtualClock(start=0)
+        ticks = []
+
+        def tick():
+            ticks.append(clock.time())
+            clock.call_later(10, tick)
+
+        clock.call_later(10, tick)
+        clock.advance(45)
+        self.assertEqual([10, 20, 30, 40], ticks)
+        self.assertEqual(1970, clock.now().year)
+
+
+class TestGameClock(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = VirtualClock(start=1000)
+        self.previous = set_clock(self.clock)
+        self.table = install(LocalTable())
+
+    def tearDown(self):
+        set_clock(self.previous)
+        DynamoDbConnector.table = None
+
+    def test_real_clock_by_default(self):
+        self.assertIsInstance(self.previous, RealClock)
+        self.assertIs(self.clock, get_clock())
+
+    def test_connections_expire_in_game_time(self):
+        self.assertEqual(1000 + UNAUTHORIZED_CONNECTION_TTL, expires_in(UNAUTHORIZED_CONNECTION_TTL))
+
+        connection_manager = ConnectionManager()
+        connection_manager.connect_unauthorized('111111')
+        self.assertEqual(0, connection_manager.sweep_expired_connections())
+        self.clock.advance(UNAUTHORIZED_CONNECTION_TTL)
+        self.assertEqual(1, connection_manager.sweep_expired_connections())
+
+    def test_circle_updates_are_paced_in_game_time(self):
+        circles = [dict(centre=dict(latitude=56.13, longitude=12.9), radius=r / 100) for r in range(10, 0, -1)]
+        sent = []
+
+        def send(connection_ids, data):
+            # each fan-out takes a while, which must not slow down the closing circle
+            sent.append(self.clock.time())
+            self.clock.advance(0.25)
+
+        connection_manager = ConnectionManager()
+        with mock.patch.object(connection_manager, '_get_all_connected', return_value=['111111']), \
+                mock.patch.object(connection_manager, '_send_to_connections', side_effect=send):
+            connection_manager.push_circle_updates(circles, lobby=None)
+
+        self.assertEqual([1000 + i for i in range(10)], sent)
+        self.assertEqual(1010, self.clock.time())
+
+    def test_batching_window_in_game_time(self):
+        batcher = MessageBatcher(window=0.5)
+        self.assertFalse(batcher.add(['111111'], dict(event_type='player_location', value=dict(name='player-1'))))
+        self.clock.advance(0.5)
+        self.assertEqual(['111111'], [connection_id for connection_id, _ in batcher.pop_due()])
@@ -0,0 +1,32 @@
+import os
+import unittest
+
+from db.dynamodb_connector import DynamoDbConnector
+from local_services.fanout_load import FanOutLoad
+from websockets.connection_manager import ConnectionManager
+
+
+class TestFanOutLoad(unittest.TestCase):
+
+    def test_every_message_is_delivered(self):
+        table, websocket_url = DynamoDbConnector.table, os.environ.get('WEBSOCKET_URL')
+        reports = FanOutLoad(lobbies=1, squads=2, players_per_squad=2, rates=(2.0,), seconds=1,
+                             game_master_rate=2.0).run()
+
+        self.assertEqual(len(reports), 1)
+        report = reports[0]
+        # a Game Master and four players
+        self.assertEqual(report['clients'], 5)
+        self.assertEqual(report['handler_errors'], 0)
+        self.assertGreater(report['expected'], 0)
+        # squad mates and the Game Master receive each location, and every player each Game Master message
+        self.assertEqual(report['delivered'], report['expected'])
+        self.assertEqual(report['dropped'], 0)
+        self.assertEqual(report['unexpected'], 0)
+        self.assertEqual(report['backlog'], 0)
+        self.assertLessEqual(report['p50'], report['max'])
+
+        # stand-ins are removed once the run has finished
+        self.assertIs(DynamoDbConnector.table, table)
+        self.assertIsNone(ConnectionManager.gateway_api)
+        self.assertEqual(os.environ.get('WEBSOCKET_URL'), websocket_url)
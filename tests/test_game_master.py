@@ -118,6 +118,36 @@ class TestGameMaster(TestWithMockAWSServices):
 
         self.assertFalse(lobby.exists())
 
+    def test_delete_lobby_with_squads(self):
+        lobby_name = 'test-lobby'
+        self.game_master_1.create_lobby(lobby_name, size=20)
+        player_4, = create_test_players(['player-4'])
+        self.player_1.add_member_to_squad(self.squad_1, player_4)
+        self.game_master_1.add_squad_to_lobby(lobby_name, self.squad_1)
+        self.game_master_1.add_squad_to_lobby(lobby_name, self.squad_3)
+
+        # a squad in another lobby is left alone
+        self.game_master_2.create_lobby('other-lobby', size=20)
+        self.game_master_2.add_squad_to_lobby('other-lobby', self.squad_2)
+
+        with mock.patch.object(self.game_master_1.table, 'delete_item') as delete_item:
+            lobby = self.game_master_1.delete_lobby(lobby_name)
+        # writes are batched rather than deleted one at a time
+        delete_item.assert_not_called()
+
+        self.assertFalse(lobby.exists())
+        self.game_master_1.get()
+        self.assertIsNone(self.game_master_1.lobby)
+        for squad, player in [(self.squad_1, self.player_1), (self.squad_1, player_4), (self.squad_3, self.player_3)]:
+            squad.get()
+            self.assertIsNone(squad.lobby_name)
+            player.get()
+            self.assertIsNone(player.lobby.name)
+            self.assertIsNone(player.get_squads()[0].lobby_name)
+
+        self.squad_2.get()
+        self.assertEqual('other-lobby', self.squad_2.lobby_name)
+
     def test_add_squad_to_lobby(self):
         # create a lobby
         lobby_name = 'test-lobby'
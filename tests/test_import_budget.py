@@ -0,0 +1,31 @@
+import unittest
+
+from benchmarks import import_time
+
+
+class TestImportBudget(unittest.TestCase):
+
+    def test_entry_points(self):
+        handlers = import_time.entry_points()
+        self.assertIn('handlers.game_master_handlers.start_lobby_handler', handlers)
+        self.assertIn('handlers.websocket_handlers.connection_handler', handlers)
+        # handlers behind several functions are only imported once
+        self.assertEqual(len(handlers), len(set(handlers)))
+
+    def test_handler_imports(self):
+        self.assertEqual(import_time.handler_imports('handlers.account_handlers.sign_in_handler'),
+                         ['from models.user import User'])
+        self.assertEqual(import_time.handler_imports('handlers.websocket_handlers.connection_handler'), [])
+
+    def test_within_budget(self):
+        # each entry point only imports what its route needs, e.g. the websocket routes never load the models, and
+        # geopy is left until a circle is generated
+        for handler in import_time.entry_points():
+            with self.subTest(handler=handler):
+                modules = import_time.profile_imports(handler)
+                self.assertIn(handler.rsplit('.', 1)[0], modules)
+                self.assertEqual(import_time.over_budget(handler, modules), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt as jose_jwt
+
+import jwt
+
+
+def make_signing_key(kid):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private_key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                    serialization.NoEncryption())
+    public_jwk = jwk.construct(pem, algorithm='RS256').public_key().to_dict()
+    public_jwk.update(kid=kid, use='sig')
+    return pem, public_jwk
+
+
+class TestJsonWebKeySet(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pem_1, cls.jwk_1 = make_signing_key('kid-1')
+        cls.pem_2, cls.jwk_2 = make_signing_key('kid-2')
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.jwks_path = os.path.join(self.directory.name, 'jwks.json')
+        self.write_jwks([self.jwk_1])
+        jwt.verified_tokens.clear()
+
+    def tearDown(self):
+        self.directory.cleanup()
+        jwt.verified_tokens.clear()
+
+    def write_jwks(self, keys):
+        with open(self.jwks_path, 'w') as f:
+            json.dump(dict(keys=keys), f)
+
+    def make_token(self, pem, kid, **claims):
+        claims = dict(dict(username='player-1', aud='client-id', exp=int(time.time()) + 60), **claims)
+        return jose_jwt.encode(claims, pem, algorithm='RS256', headers=dict(kid=kid))
+
+    def test_verify_token_offline(self):
+        key_set = jwt.JsonWebKeySet(path=self.jwks_path)
+        with mock.patch('jwt.jwks', key_set), mock.patch('jwt.USER_POOL_CLIENT_ID', 'client-id'):
+            self.assertEqual('player-1', jwt.verify_token(self.make_token(self.pem_1, 'kid-1'), id_token=True)['username'])
+            self.assertFalse(jwt.verify_token(self.make_token(self.pem_1, 'kid-1', aud='other'), id_token=True))
+            self.assertFalse(jwt.verify_token(self.make_token(self.pem_1, 'kid-1', exp=1), id_token=True))
+            # token claiming a kid it was not signed with
+            self.assertFalse(jwt.verify_token(self.make_token(self.pem_2, 'kid-1'), id_token=True))
+
+    def test_keys_constructed_once(self):
+        key_set = jwt.JsonWebKeySet(path=self.jwks_path)
+        with mock.patch('jwt.jwk.construct', wraps=jwk.construct) as construct:
+            key = key_set.get_key('kid-1')
+            self.assertIs(key, key_set.get_key('kid-1'))
+        self.assertEqual(1, construct.call_count)
+
+    def test_refresh_on_unknown_kid(self):
+        key_set = jwt.JsonWebKeySet(path=self.jwks_path, min_refresh_interval=0)
+        self.assertIsNone(key_set.get_key('kid-2'))
+
+        # keys are rotated
+        self.write_jwks([self.jwk_1, self.jwk_2])
+        self.assertIsNotNone(key_set.get_key('kid-2'))
+
+    def test_refresh_rate_limited(self):
+        key_set = jwt.JsonWebKeySet(path=self.jwks_path)
+        key_set.load()
+        self.write_jwks([self.jwk_1, self.jwk_2])
+        self.assertIsNone(key_set.get_key('kid-2'))
+
+    def test_downloaded_keys_cached_on_disk(self):
+        cache_path = os.path.join(self.directory.name, 'cache.json')
+        url = 'file://' + self.jwks_path
+        self.assertIsNotNone(jwt.JsonWebKeySet(url=url, cache_path=cache_path).get_key('kid-1'))
+        self.assertTrue(os.path.exists(cache_path))
+
+        # a new cold start reads the cache rather than downloading the keys
+        with mock.patch('urllib.request.urlopen') as urlopen:
+            self.assertIsNotNone(jwt.JsonWebKeySet(url=url, cache_path=cache_path).get_key('kid-1'))
+        urlopen.assert_not_called()
+
+    def test_verified_tokens_cached(self):
+        key_set = jwt.JsonWebKeySet(path=self.jwks_path)
+        token = self.make_token(self.pem_1, 'kid-1')
+        with mock.patch('jwt.jwks', key_set), mock.patch('jwt.USER_POOL_CLIENT_ID', 'client-id'), \
+                mock.patch('jwt._verify_token', wraps=jwt._verify_token) as verify:
+            for _ in range(3):
+                self.assertEqual('player-1', jwt.verify_token(token, id_token=True)['username'])
+        self.assertEqual(1, verify.call_count)
+
+        # claims verified as an ID token are not returned when verifying an access token
+        self.assertIsNone(jwt.verified_tokens.get(token, False))
+
+        metrics = jwt.verified_tokens.metrics()
+        self.assertEqual(2, metrics['hits'])
+        self.assertEqual(2, metrics['misses'])
+        self.assertEqual(0.5, metrics['hit_rate'])
+        self.assertGreater(metrics['time_saved'], 0)
+
+
+class TestVerifiedTokenCache(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 1000
+        self.cache = jwt.VerifiedTokenCache(max_size=2, clock=lambda: self.now)
+
+    def test_expired_tokens_dropped(self):
+        self.cache.put('token', True, dict(username='player-1', exp=1010))
+        self.assertEqual('player-1', self.cache.get('token', True)['username'])
+        self.now = 1011
+        self.assertIsNone(self.cache.get('token', True))
+        self.assertFalse(self.cache.entries)
+
+    def test_least_recently_used_evicted(self):
+        for token in ['token-1', 'token-2']:
+            self.cache.put(token, True, dict(exp=2000))
+        self.cache.get('token-1', True)
+        self.cache.put('token-3', True, dict(exp=2000))
+        self.assertIsNotNone(self.cache.get('token-1', True))
+        self.assertIsNone(self.cache.get('token-2', True))
@@ -0,0 +1,66 @@
+import asyncio
+import json
+import os
+import unittest
+
+import boto3
+from botocore.config import Config
+
+from local_services.api_gateway import LocalApiGateway, LocalWebSocketClient
+from websockets.connection_manager import ConnectionManager
+
+
+class TestLocalApiGateway(unittest.TestCase):
+
+    def setUp(self):
+        self.messages = []
+        self.gateway = LocalApiGateway(port=0, on_message=lambda connection_id, body: self.messages.append(body))
+        self.gateway.start_in_thread()
+        self.gateway_api = boto3.client("apigatewaymanagementapi", endpoint_url=self.gateway.url,
+                                        region_name='eu-central-1', aws_access_key_id='local',
+                                        aws_secret_access_key='local',
+                                        config=Config(retries=dict(max_attempts=1)))
+
+    def tearDown(self):
+        self.gateway.stop_thread()
+
+    def run_client(self, coroutine):
+        return asyncio.new_event_loop().run_until_complete(coroutine)
+
+    def test_post_to_connection(self):
+        async def client_flow():
+            client = await LocalWebSocketClient.connect(port=self.gateway.port)
+            await client.send(dict(action='location', longitude='1.0', latitude='2.0'))
+
+            # post through the Management API the same way ConnectionManager does
+            loop = asyncio.get_running_loop()
+            posted = await loop.run_in_executor(None, ConnectionManager._send_data, self.gateway_api,
+                                                client.connection_id, dict(event_type='game_state', value='started'))
+            received = await client.recv()
+            await client.close()
+            return posted, received
+
+        posted, received = self.run_client(client_flow())
+        self.assertTrue(posted)
+        self.assertEqual(dict(event_type='game_state', value='started'), json.loads(received))
+        self.assertEqual(1, self.gateway.stats['delivered'])
+        self.assertEqual([json.dumps(dict(action='location', longitude='1.0', latitude='2.0'))], self.messages)
+
+    def test_gone_connection(self):
+        self.assertFalse(ConnectionManager._send_data(self.gateway_api, 'unknown-connection', dict(event_type='test')))
+        self.assertEqual(1, self.gateway.stats['gone'])
+
+    def test_error_injection(self):
+        self.gateway.error_rate = 1.0
+
+        async def client_flow():
+            client = await LocalWebSocketClient.connect(port=self.gateway.port)
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(None, lambda: self.gateway_api.post_to_connection(
+                    ConnectionId=client.connection_id, Data=b'{}'))
+            finally:
+                await client.close()
+
+        with self.assertRaises(self.gateway_api.exceptions.LimitExceededException):
+            self.run_client(client_flow())
@@ -1,3 +1,4 @@
+from models import map
 from models.map import GameZone, Circle
 from geopy import distance
 from tests.mock_db import TestWithMockAWSServices
@@ -181,3 +182,18 @@ class TestGameZone(TestWithMockAWSServices):
         game_zone.create_next_circle()
         # sixth circle will be the same as the final circle
         self.assertEqual(game_zone.next_circle, self.final_circle)
+
+        # once the final circle is the current circle, it stays the next circle
+        game_zone.current_circle = game_zone.next_circle
+        game_zone.create_next_circle()
+        self.assertEqual(game_zone.next_circle, self.final_circle)
+
+    def test_rejection_sampling_is_counted(self):
+        map.rejection_sampling.clear()
+        game_zone = GameZone(self.game_zone_coordinates, final_circle=self.final_circle)
+        game_zone.create_next_circle()
+
+        # every candidate checked against the final circle is drawn within the allowed distance first
+        checked = map.rejection_sampling['generate_centre_within_distance_and_contains']
+        self.assertGreaterEqual(checked, 1)
+        self.assertGreaterEqual(map.rejection_sampling['generate_centre_within_distance'], checked)
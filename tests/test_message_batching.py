@@ -0,0 +1,77 @@
+import unittest
+
+from enums import WebSocketPushMessageType
+from websockets.batching import MessageBatcher
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestMessageBatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.batcher = MessageBatcher(window=0.25, clock=self.clock)
+
+    @staticmethod
+    def location(name):
+        return dict(event_type=WebSocketPushMessageType.PLAYER_LOCATION.value,
+                    value=dict(name=name, longitude='1.0', latitude='2.0'))
+
+    def test_disabled_without_window(self):
+        self.assertFalse(MessageBatcher().enabled)
+        self.assertTrue(self.batcher.enabled)
+
+    def test_messages_merged_within_window(self):
+        # messages are held until the window closes
+        self.assertFalse(self.batcher.add(['gm'], self.location('player-1')))
+        self.clock.now = 0.1
+        self.assertFalse(self.batcher.add(['gm'], self.location('player-2')))
+
+        # next message after the window has closed sends everything pending as one framed message
+        self.clock.now = 0.3
+        ready = self.batcher.add(['player-3'], self.location('player-4'))
+        self.assertEqual(1, len(ready))
+        connection_id, data = ready[0]
+        self.assertEqual('gm', connection_id)
+        self.assertEqual(WebSocketPushMessageType.BATCH.value, data['event_type'])
+        self.assertEqual([self.location('player-1'), self.location('player-2')], data['value'])
+
+        # a single pending message is not framed
+        self.assertEqual([('player-3', self.location('player-4'))], self.batcher.pop_all())
+        self.assertFalse(self.batcher.pending)
+
+    def test_flush_on_critical_message(self):
+        self.batcher.add(['gm', 'player-2'], self.location('player-1'))
+        self.batcher.add(['player-3'], self.location('player-4'))
+
+        dead = dict(event_type=WebSocketPushMessageType.PLAYER_DEAD.value,
+                    value=dict(name='player-1', state='dead'))
+        ready = dict(self.batcher.add(['gm'], dead))
+
+        # only the recipient of the critical message is flushed, with the critical message first
+        self.assertEqual(['gm'], list(ready))
+        self.assertEqual([dead, self.location('player-1')], ready['gm']['value'])
+        self.assertEqual({'player-2', 'player-3'}, set(self.batcher.pending))
+
+    def test_discard_gone_recipient(self):
+        self.batcher.add(['gm'], self.location('player-1'))
+        self.batcher.discard('gm')
+        self.clock.now = 1
+        self.assertFalse(self.batcher.pop_due())
+        self.assertFalse(self.batcher.pop_all())
+
+    def test_stale_locations_dropped(self):
+        self.batcher.add(['gm'], self.location('player-1'))
+        self.batcher.add(['gm'], self.location('player-2'))
+        newest_location = dict(event_type=WebSocketPushMessageType.PLAYER_LOCATION.value,
+                               value=dict(name='player-1', longitude='3.0', latitude='4.0'))
+        self.batcher.add(['gm'], newest_location)
+
+        _, data = self.batcher.pop('gm')
+        self.assertEqual([self.location('player-2'), newest_location], data['value'])
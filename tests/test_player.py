@@ -68,7 +68,7 @@ class TestPlayer(TestWithMockAWSServices):
 
         # mock calls to cognito identify provider whilst allowing calls to DynamoDB
         def mock_make_api_call(self, operation_name, kwarg):
-            if operation_name == 'Query' or operation_name == 'DeleteItem' or operation_name == 'GetItem':
+            if operation_name in ('Query', 'DeleteItem', 'GetItem', 'PutItem', 'BatchWriteItem'):
                 return orig(self, operation_name, kwarg)
             else:
                 pass
@@ -119,7 +119,7 @@ class TestPlayer(TestWithMockAWSServices):
 
         # mock calls to cognito identify provider whilst allowing calls to DynamoDB
         def mock_make_api_call(self, operation_name, kwarg):
-            if operation_name == 'Query' or operation_name == 'DeleteItem' or operation_name == 'GetItem':
+            if operation_name in ('Query', 'DeleteItem', 'GetItem', 'PutItem', 'BatchWriteItem'):
                 return orig(self, operation_name, kwarg)
             else:
                 pass
@@ -468,3 +468,41 @@ class TestPlayer(TestWithMockAWSServices):
         players = gamemaster.get_players_in_lobby(lobby.name)
         for player in players:
             self.assertEqual(PlayerState.ALIVE.value, player['state'])
+
+    def test_squad_summaries(self):
+        squad_1 = self.player_1.create_squad('test-squad-1')
+        self.player_1.add_member_to_squad(squad_1, self.player_2)
+        squad_2 = self.player_2.create_squad('test-squad-2')
+        self.player_2.add_member_to_squad(squad_2, self.player_1)
+        self.player_2.add_member_to_squad(squad_2, self.player_3)
+        self.player_2.remove_member_from_squad(squad_2, self.player_3)
+
+        # each squad list is read with a single query
+        orig = botocore.client.BaseClient._make_api_call
+        operations = []
+
+        def count_make_api_call(client, operation_name, kwarg):
+            operations.append(operation_name)
+            return orig(client, operation_name, kwarg)
+
+        for handler in [get_squads_handler, get_owned_squads_handler, player_handlers.get_not_owned_squads_handler]:
+            operations.clear()
+            event, context = make_api_gateway_event(calling_user=self.player_1)
+            with mock.patch('botocore.client.BaseClient._make_api_call', new=count_make_api_call):
+                self.assertEqual(200, handler(event, context)['statusCode'])
+            self.assertEqual(['Query'], operations)
+
+        squads = {squad.name: squad for squad in self.player_1.get_squads()}
+        self.assertEqual(['test-squad-2', 'test-squad-1'], list(squads))
+        self.assertEqual(self.player_2, squads['test-squad-2'].owner)
+        self.assertEqual({self.player_1.username, self.player_2.username},
+                         {member.username for member in squads['test-squad-2'].members})
+        self.assertFalse(self.player_3.get_squads())
+
+        # summaries follow the squad into a lobby
+        gamemaster = GameMaster('gamemaster')
+        gamemaster.put()
+        gamemaster.create_lobby('test-lobby')
+        gamemaster.add_squad_to_lobby('test-lobby', squad_1)
+        summary = self.player_2.get_not_owned_squads()[0]
+        self.assertEqual(('test-lobby', gamemaster.username), (summary.lobby_name, summary.lobby_owner))
@@ -0,0 +1,87 @@
+import gzip
+import json
+import os
+import tempfile
+import tracemalloc
+import unittest
+from unittest import mock
+
+import profiling
+from handlers.lambda_helpers import endpoint, sqs_handler
+
+
+def allocate(records):
+    return [dict(lobby=record, squads=list(range(100))) for record in range(records)]
+
+
+held = []
+
+
+@sqs_handler
+def circle_queue_handler(body, context):
+    held.extend(allocate(body['records']))
+
+
+@endpoint()
+def get_lobby_handler(event, context):
+    return dict(lobby='lobby')
+
+
+class TestProfiling(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.environment = mock.patch.dict(os.environ, {profiling.SAMPLE_RATE_VARIABLE: '1',
+                                                        profiling.DIRECTORY_VARIABLE: self.directory.name})
+        self.environment.start()
+        self.emit = mock.patch('profiling.emit')
+        self.lines = self.emit.start()
+        held.clear()
+
+    def tearDown(self):
+        held.clear()
+        self.emit.stop()
+        self.environment.stop()
+        self.directory.cleanup()
+
+    def test_disabled(self):
+        os.environ[profiling.SAMPLE_RATE_VARIABLE] = '0'
+        circle_queue_handler(dict(Records=[dict(body='{"records": 10}')]), None)
+
+        self.lines.assert_not_called()
+        self.assertEqual([], os.listdir(self.directory.name))
+
+    def test_profile_written(self):
+        circle_queue_handler(dict(Records=[dict(body='{"records": 1000}')]), None)
+
+        self.assertEqual(1, self.lines.call_count)
+        summary = json.loads(self.lines.call_args[0][0])
+        self.assertEqual('circle_queue_handler', summary['profile'])
+        self.assertEqual(1, summary['records'])
+        self.assertGreater(summary['peak_kb'], 0)
+        stats_path, allocations_path = summary['files']
+        self.assertEqual(sorted(summary['files']), sorted(os.path.join(self.directory.name, name)
+                                                          for name in os.listdir(self.directory.name)))
+
+        # the stats load back into pstats, and the allocations held by the handler are found
+        stats = profiling.load_stats(stats_path)
+        self.assertIn('allocate', {function_name for _, _, function_name in stats.stats})
+        with gzip.open(allocations_path, 'rt') as f:
+            self.assertIn(os.path.basename(__file__), f.readline())
+
+        # tracemalloc is stopped again, and the next invocation can be profiled
+        self.assertFalse(tracemalloc.is_tracing())
+        get_lobby_handler(dict(requestContext=dict(), body=None), None)
+        self.assertEqual(200, json.loads(self.lines.call_args[0][0])['status'])
+
+    def test_limited_to_handlers(self):
+        os.environ[profiling.HANDLERS_VARIABLE] = 'circle_queue_handler, close_circle_handler'
+        get_lobby_handler(dict(requestContext=dict(), body=None), None)
+        self.lines.assert_not_called()
+
+        circle_queue_handler(dict(Records=[dict(body='{"records": 1}')]), None)
+        self.assertEqual(1, self.lines.call_count)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+
+from botocore.exceptions import ClientError
+
+from enums import WebSocketPushMessageType
+from websockets.dispatch import PushDispatcher
+
+
+def throttled():
+    return ClientError({'Error': {'Code': 'LimitExceededException', 'Message': 'Rate exceeded'}}, 'PostToConnection')
+
+
+class TestPushDispatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.sleeps = []
+        self.dispatcher = PushDispatcher(max_retries=2, retry_delay=0.1, sleep=self.sleeps.append)
+        self.sent = []
+
+    def post(self, connection_id, data):
+        self.sent.append((connection_id, data['event_type']))
+        return True
+
+    @staticmethod
+    def location(name, longitude='1.0'):
+        return dict(event_type=WebSocketPushMessageType.PLAYER_LOCATION.value,
+                    value=dict(name=name, longitude=longitude, latitude='2.0'))
+
+    def test_critical_messages_jump_the_queue(self):
+        self.dispatcher.enqueue('gm', self.location('player-1'))
+        self.dispatcher.enqueue('gm', dict(event_type=WebSocketPushMessageType.CIRCLE_CLOSING.value, value={}))
+        self.dispatcher.enqueue('gm', dict(event_type=WebSocketPushMessageType.PLAYER_DEAD.value, value={}))
+        self.dispatcher.enqueue('player-2', dict(event_type=WebSocketPushMessageType.GAME_STATE.value, value={}))
+
+        self.dispatcher.dispatch(self.post)
+        self.assertEqual([('gm', WebSocketPushMessageType.PLAYER_DEAD.value),
+                          ('player-2', WebSocketPushMessageType.GAME_STATE.value),
+                          ('gm', WebSocketPushMessageType.CIRCLE_CLOSING.value),
+                          ('gm', WebSocketPushMessageType.PLAYER_LOCATION.value)], self.sent)
+        self.assertFalse(len(self.dispatcher))
+
+    def test_stale_locations_dropped(self):
+        self.dispatcher.enqueue('gm', self.location('player-1', longitude='1.0'))
+        self.dispatcher.enqueue('gm', self.location('player-2'))
+        self.dispatcher.enqueue('player-3', self.location('player-1', longitude='1.0'))
+        self.dispatcher.enqueue('gm', self.location('player-1', longitude='5.0'))
+        self.assertEqual(3, len(self.dispatcher))
+
+        posted = []
+        self.dispatcher.dispatch(lambda connection_id, data: posted.append((connection_id, data)) or True)
+        self.assertIn(('gm', self.location('player-1', longitude='5.0')), posted)
+        self.assertNotIn(('gm', self.location('player-1', longitude='1.0')), posted)
+
+    def test_critical_messages_retried(self):
+        attempts = []
+
+        def post(connection_id, data):
+            attempts.append(connection_id)
+            if len(attempts) < 3:
+                raise throttled()
+            return True
+
+        self.dispatcher.enqueue('gm', dict(event_type=WebSocketPushMessageType.NEXT_CIRCLE.value, value={}))
+        self.assertFalse(self.dispatcher.dispatch(post))
+        self.assertEqual(3, len(attempts))
+        self.assertEqual([0.1, 0.2], self.sleeps)
+
+    def test_location_messages_not_retried(self):
+        attempts = []
+
+        def post(connection_id, data):
+            attempts.append(connection_id)
+            raise throttled()
+
+        self.dispatcher.enqueue('gm', self.location('player-1'))
+        self.dispatcher.dispatch(post)
+        self.assertEqual(1, len(attempts))
+        self.assertFalse(self.sleeps)
+
+    def test_gone_connections_skipped(self):
+        self.dispatcher.enqueue('gm', dict(event_type=WebSocketPushMessageType.GAME_STATE.value, value={}))
+        self.dispatcher.enqueue('gm', self.location('player-1'))
+
+        attempts = []
+        gone = self.dispatcher.dispatch(lambda connection_id, data: attempts.append(connection_id) and False)
+        self.assertEqual({'gm'}, gone)
+        self.assertEqual(['gm'], attempts)
@@ -0,0 +1,89 @@
+import json
+import unittest
+from decimal import Decimal
+
+from marshmallow import Schema, fields, post_dump
+
+from handlers import serializers
+from handlers.lambda_helpers import postload_body
+from handlers.schemas import LobbySchema, LobbyPlayerListSchema, SquadSchema, CreateLobbyRequestSchema
+from models.map import Circle
+
+
+def squad(index, members=4):
+    return dict(name=f'squad_{index}', owner=f'player_{index}_0',
+                members=[f'player_{index}_{member}' for member in range(members)])
+
+
+def lobby(**overrides):
+    body = dict(name='lobby', owner='game_master', state='STARTED', size=Decimal(15), squad_size=Decimal(4),
+                game_zone_coordinates=[dict(latitude='56.13', longitude='12.9'),
+                                       dict(latitude=Decimal('56.14'), longitude=12.91)],
+                current_circle=Circle(dict(centre=dict(latitude='56.131', longitude='12.901'), radius='0.4')),
+                next_circle=Circle(dict(centre=dict(latitude=56.132, longitude=12.902), radius=Decimal('0.2'))),
+                final_circle=None,
+                squads=[squad(index) for index in range(3)])
+    body.update(overrides)
+    return body
+
+
+class PostDumpSchema(Schema):
+    name = fields.String()
+
+    @post_dump
+    def upper(self, data, **kwargs):
+        return dict(name=data['name'].upper())
+
+
+class MethodSchema(Schema):
+    name = fields.Method('get_name')
+
+    def get_name(self, obj):
+        return obj['name'] * 2
+
+
+class TestSerializers(unittest.TestCase):
+
+    def assertParity(self, schema_class, obj, many=False):
+        self.assertIsNotNone(serializers.get_builder(schema_class))
+        self.assertEqual(serializers.dumps(schema_class, obj, many=many), schema_class().dumps(obj, many=many))
+
+    def test_schemas_reused(self):
+        self.assertIs(serializers.get_schema(CreateLobbyRequestSchema), serializers.get_schema(CreateLobbyRequestSchema))
+        # schemas without a fast path are dumped by marshmallow
+        self.assertIsNone(serializers.get_builder(CreateLobbyRequestSchema))
+
+    def test_squad_parity(self):
+        self.assertParity(SquadSchema, squad(0))
+        self.assertParity(SquadSchema, [squad(index, members=index) for index in range(5)], many=True)
+        self.assertParity(SquadSchema, [], many=True)
+        # missing keys are left out, and None is kept
+        self.assertParity(SquadSchema, dict(name='squad', owner=None))
+
+    def test_lobby_parity(self):
+        self.assertParity(LobbySchema, lobby())
+        self.assertParity(LobbySchema, lobby(current_circle=None, next_circle=None, game_zone_coordinates=None,
+                                             squads=[]))
+        # get_current_lobby_handler leaves out the final circle
+        body = lobby()
+        del body['final_circle']
+        self.assertParity(LobbySchema, body)
+
+    def test_player_list_parity(self):
+        players = [dict(name=f'player_{index}', squad_name=f'squad_{index // 4}', state='ALIVE' if index % 3 else 'DEAD')
+                   for index in range(12)]
+        self.assertParity(LobbyPlayerListSchema, dict(players=players))
+        self.assertParity(LobbyPlayerListSchema, dict(players=[]))
+
+    def test_unsupported_schemas_fall_back(self):
+        for schema_class in (PostDumpSchema, MethodSchema):
+            self.assertIsNone(serializers.compile_builder(schema_class()))
+            self.assertEqual(serializers.dumps(schema_class, dict(name='squad')),
+                             schema_class().dumps(dict(name='squad')))
+
+    def test_postload_body(self):
+        self.assertEqual(json.loads(postload_body([squad(0)], SquadSchema)), [squad(0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import unittest
+
+from clock import RealClock, get_clock
+from db.dynamodb_connector import DynamoDbConnector
+from local_services.simulator import Simulator
+from sqs.utils import SqsQueue
+from websockets.connection_manager import ConnectionManager
+
+
+class TestSimulator(unittest.TestCase):
+
+    def test_simulate_game(self):
+        table = DynamoDbConnector.table
+        report = Simulator(squads=3, players_per_squad=2, duration=30 * 60, kill_rate=0.01, seed=3).run()
+
+        for phase in ('stage_world', 'start_game', 'connect', 'location', 'first_circle', 'close_circle', 'death', 'end_game'):
+            self.assertIn(phase, report['phases'])
+        self.assertEqual(7, report['phases']['connect']['calls'])
+        self.assertGreater(report['simulated_seconds'], 60)
+        self.assertGreater(report['speedup'], 1)
+        self.assertEqual(report['messages']['posts'], sum(phase['messages'] for phase in report['phases'].values()))
+        self.assertEqual(sum(report['operations'].values()),
+                         sum(phase['operations'] for phase in report['phases'].values()))
+        # the game starts before anyone has connected, so only the end of the game is pushed
+        self.assertEqual(7, report['messages']['game_state'])
+
+        # stand-ins are removed once the game is over
+        self.assertIsInstance(get_clock(), RealClock)
+        self.assertIs(table, DynamoDbConnector.table)
+        self.assertIsNone(ConnectionManager.gateway_api)
+        self.assertIsNone(SqsQueue.client)
+
+    def test_same_seed_same_game(self):
+        first = Simulator(squads=2, players_per_squad=2, duration=10 * 60, kill_rate=0.02, seed=5).run()
+        second = Simulator(squads=2, players_per_squad=2, duration=10 * 60, kill_rate=0.02, seed=5).run()
+        self.assertEqual(first['messages'], second['messages'])
+        self.assertEqual(first['operations'], second['operations'])
+        self.assertEqual(first['squads_alive'], second['squads_alive'])
@@ -1,6 +1,9 @@
+from unittest import mock
+
 from exceptions import PlayerDoesNotOwnSquadException
 from handlers.player_handlers import pull_squad_from_lobby_handler
 from models.game_master import GameMaster
+from models.lobby import Lobby
 from models.player import Player
 from models.squad import Squad
 from helper_functions import make_api_gateway_event
@@ -53,3 +56,31 @@ class TestSquads(TestWithMockAWSServices):
         squad.get()
         self.assertIsNone(squad.lobby_name)
         self.assertIsNone(squad.lobby_owner)
+
+    def test_hydrating_squad_members_creates_no_clients(self):
+        self.player_2.put()
+        squad = self.player_1.create_squad('test-squad')
+        self.player_1.add_member_to_squad(squad, self.player_2)
+
+        with mock.patch('boto3.client') as client, mock.patch('boto3.resource') as resource:
+            squad = Squad('test-squad')
+            squad.get()
+            squad.get_members()
+            lobby = Lobby('test-lobby', GameMaster('gm'))
+        client.assert_not_called()
+        resource.assert_not_called()
+
+        # models only hold their own state
+        self.assertEqual({'player_1', 'player_2'}, {member.username for member in squad.members})
+        for model in [squad, lobby, lobby.owner] + squad.members:
+            self.assertFalse(hasattr(model, '__dict__'))
+
+    def test_members_of_squads_sharing_a_prefix(self):
+        self.player_2.put()
+        squad = self.player_1.create_squad('alpha')
+        other_squad = self.player_2.create_squad('alpha2')
+
+        squad.get_members()
+        other_squad.get_members()
+        self.assertEqual(['player_1'], [member.username for member in squad.members])
+        self.assertEqual(['player_2'], [member.username for member in other_squad.members])
@@ -1,5 +1,7 @@
-from boto3.dynamodb.conditions import Attr
+from boto3.dynamodb.conditions import Attr, Key
 
+from db.parallel_scan import parallel_scan
+from enums import SyntheticEntityType
 from handlers.schemas import SquadSchema
 from handlers.test_handlers import create_test_players_and_squads_handler, delete_test_players_and_squads_handler, \
     create_test_lobby_and_squads_handler, delete_test_lobby_and_squads_handler
@@ -57,3 +59,20 @@ class TestTestHandlers(TestWithMockAWSServices):
         )
         # should be no users in the database with a name that begins with test_player_
         self.assertFalse(players_to_delete['Items'])
+
+    def test_test_entities_indexed(self):
+        event, context = make_api_gateway_event(calling_user=self.player_1)
+        create_test_players_and_squads_handler(event, context)
+
+        # only synthetic players are in the sparse index
+        indexed = self.table.query(IndexName='test-entity',
+                                   KeyConditionExpression=Key('test-entity').eq(SyntheticEntityType.PLAYER.value))
+        self.assertEqual(9, len(indexed['Items']))
+        self.assertTrue(all(item['pk'].startswith('test_player_') for item in indexed['Items']))
+
+    def test_parallel_scan(self):
+        create_test_players([f'player-{i}' for i in range(3, 40)])
+        items = parallel_scan(total_segments=4, table=self.table,
+                              FilterExpression=Attr('pk').begins_with('player-') & Attr('sk').eq('USER'))
+        self.assertEqual({f'player-{i}' for i in range(1, 40)}, {item['pk'] for item in items})
+        self.assertEqual(39, len(items))
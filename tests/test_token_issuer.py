@@ -0,0 +1,44 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import jwt
+from local_services.token_issuer import LocalTokenIssuer
+
+
+class TestLocalTokenIssuer(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.issuer = LocalTokenIssuer()
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        jwt.verified_tokens.clear()
+
+    def tearDown(self):
+        self.directory.cleanup()
+        jwt.verified_tokens.clear()
+
+    def test_tokens_verified_against_written_jwks(self):
+        key_set = jwt.JsonWebKeySet(path=self.issuer.write_jwks(os.path.join(self.directory.name, 'jwks.json')))
+        with mock.patch('jwt.jwks', key_set), mock.patch('jwt.USER_POOL_CLIENT_ID', self.issuer.client_id):
+            claims = jwt.verify_token(self.issuer.id_token('player-1'), id_token=True)
+            self.assertEqual('player-1', claims['cognito:username'])
+            self.assertEqual('id', claims['token_use'])
+
+            claims = jwt.verify_token(self.issuer.access_token('player-1'))
+            self.assertEqual('player-1', claims['username'])
+            self.assertEqual('access', claims['token_use'])
+
+            self.assertFalse(jwt.verify_token(self.issuer.id_token('player-1', expires_in=-1), id_token=True))
+
+    def test_tokens_verified_against_served_jwks(self):
+        server, url = self.issuer.serve_jwks()
+        try:
+            key_set = jwt.JsonWebKeySet(url=url, cache_path=os.path.join(self.directory.name, 'cache.json'))
+            self.assertIsNotNone(key_set.get_key(self.issuer.kid))
+        finally:
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,118 @@
+import json
+import os
+import unittest
+from unittest import mock
+
+import boto3
+
+import tracing
+from exceptions import LobbyDoesNotExistException
+from handlers.lambda_helpers import endpoint, sqs_handler
+
+
+class Model:
+    @tracing.traced
+    def get(self):
+        with tracing.span('dynamodb.GetItem'):
+            return 'item'
+
+
+class TestTracing(unittest.TestCase):
+
+    def setUp(self):
+        self.environment = mock.patch.dict(os.environ, {tracing.SAMPLE_RATE_VARIABLE: '1'})
+        self.environment.start()
+        self.emit = mock.patch('tracing.emit')
+        self.lines = self.emit.start()
+
+    def tearDown(self):
+        self.emit.stop()
+        self.environment.stop()
+
+    def logged(self):
+        self.assertEqual(1, self.lines.call_count)
+        return json.loads(self.lines.call_args[0][0])
+
+    @staticmethod
+    def spans(logged):
+        return {path: count for path, count, _, _ in logged['spans']}
+
+    def test_sample_rate(self):
+        for value, rate in (('', 0.0), ('0.25', 0.25), ('2', 1.0), ('off', 0.0)):
+            os.environ[tracing.SAMPLE_RATE_VARIABLE] = value
+            self.assertEqual(rate, tracing.sample_rate())
+
+        os.environ[tracing.SAMPLE_RATE_VARIABLE] = '0'
+        self.assertIsNone(tracing.start_trace('handler'))
+        # spans outside a trace are a shared no-op
+        self.assertIs(tracing.span('parse'), tracing.span('dump'))
+        self.assertEqual('item', Model().get())
+        self.lines.assert_not_called()
+
+    def test_spans_nested_and_merged(self):
+        trace = tracing.start_trace('handler')
+        self.assertIs(trace, tracing.current_trace())
+        with tracing.span('handler'):
+            for _ in range(3):
+                Model().get()
+        tracing.finish_trace(trace, status=200)
+        self.assertIsNone(tracing.current_trace())
+
+        logged = self.logged()
+        self.assertEqual('handler', logged['trace'])
+        self.assertEqual(200, logged['status'])
+        self.assertEqual({'handler': 1, 'handler/Model.get': 3, 'handler/Model.get/dynamodb.GetItem': 3},
+                         self.spans(logged))
+
+    def test_endpoint(self):
+        @endpoint()
+        def get_handler(event, context):
+            with tracing.span('model'):
+                return dict(name=event['body']['name'])
+
+        event = dict(requestContext=dict(), body=json.dumps(dict(name='lobby')))
+        self.assertEqual(200, get_handler(event, None)['statusCode'])
+
+        logged = self.logged()
+        self.assertEqual('get_handler', logged['trace'])
+        self.assertEqual(200, logged['status'])
+        self.assertEqual(['parse', 'handler', 'handler/model', 'dump'], [span[0] for span in logged['spans']])
+        self.assertEqual(2, self.spans(logged)['parse'])
+
+    def test_endpoint_api_exception(self):
+        @endpoint()
+        def failing_handler(event, context):
+            raise LobbyDoesNotExistException()
+
+        self.assertEqual(400, failing_handler(dict(requestContext=dict(), body=None), None)['statusCode'])
+        self.assertEqual(400, self.logged()['status'])
+
+    def test_sqs_handler(self):
+        handled = []
+
+        @sqs_handler
+        def queue_handler(body, context):
+            handled.append(body)
+
+        queue_handler(dict(Records=[dict(body='{"lobby": 1}'), dict(body='not json')]), None)
+
+        self.assertEqual([dict(lobby=1)], handled)
+        logged = self.logged()
+        self.assertEqual(2, logged['records'])
+        self.assertEqual({'parse': 2, 'handler': 1}, self.spans(logged))
+
+    def test_instrument_client(self):
+        client = boto3.client('dynamodb', endpoint_url='http://localhost:8005')
+        tracing.instrument_client(client)
+
+        trace = tracing.start_trace('handler')
+        client.list_tables()
+        tracing.finish_trace(trace)
+        # calls outside a trace are not recorded
+        client.list_tables()
+
+        self.assertEqual({'dynamodb.ListTables': 1}, self.spans(self.logged()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,6 @@
 import json
 import sys
+import time
 from unittest import mock
 from unittest.mock import MagicMock
 
@@ -11,7 +12,8 @@ from handlers.websocket_handlers import connection_handler, authorize_connection
     player_location_message_handler, gamemaster_message_handler
 from helper_functions import create_test_players, create_test_game_masters, create_test_squads
 from tests.mock_db import TestWithMockAWSServices
-from websockets.connection_manager import ConnectionManager
+from websockets.connection_manager import ConnectionManager, CONNECTION_TTL, UNAUTHORIZED_CONNECTION_TTL
+from websockets.roster import roster_cache
 
 
 class TestWebsocketHandlers(TestWithMockAWSServices):
@@ -413,3 +415,175 @@ class TestWebsocketHandlers(TestWithMockAWSServices):
         with mock.patch('websockets.connection_manager.ConnectionManager._send_to_connections', side_effect=mock_send):
             # gamemaster pushes message to all players
             gamemaster_message_handler(event, None)
+
+    def test_gone_connections_pruned_after_fan_out(self):
+        with mock.patch("sqs.closing_circle_queue.CircleQueue.send_first_circle_event"):
+            self.gamemaster_1.start_game(self.lobby.name)
+
+        p_1_connection_id = '123456'
+        p_2_connection_id = '512512'
+        gm_connection_id = '341234'
+        for connection_id, user in [(p_1_connection_id, self.p_1),
+                                    (p_2_connection_id, self.p_2),
+                                    (gm_connection_id, self.gamemaster_1)]:
+            event = self.create_fake_websocket_event(connection_id, body={'access_token': '123456'})
+            with mock.patch('jwt.verify_token', return_value={'username': user.username}):
+                authorize_connection_handler(event, None)
+
+        # player_2 drops off ungracefully, so every post to their connection returns GoneException
+        sent = []
+
+        def mock_send_data(gateway_api, connection_id, data):
+            sent.append(connection_id)
+            return connection_id != p_2_connection_id
+
+        circles = [dict(centre=dict(latitude=1, longitude=1), radius=1),
+                   dict(centre=dict(latitude=1, longitude=1), radius=0.5)]
+        with mock.patch('boto3.client'), mock.patch('time.sleep'), \
+                mock.patch('websockets.connection_manager.ConnectionManager._send_data',
+                           side_effect=mock_send_data):
+            ConnectionManager().push_circle_updates(circles, self.lobby)
+
+        # gone connection is only posted to once, and is dropped from the rest of the broadcast
+        self.assertEqual(1, sent.count(p_2_connection_id))
+        self.assertEqual(2, sent.count(p_1_connection_id))
+        self.assertEqual(2, sent.count(gm_connection_id))
+
+        # gone connection has been pruned, other connections are untouched
+        players = ConnectionManager().get_players_in_lobby(self.lobby)
+        self.assertEqual([p_1_connection_id], players)
+        self.assertEqual(gm_connection_id, ConnectionManager().get_game_master_in_lobby(self.lobby))
+
+    def test_reconnected_connection_not_pruned(self):
+        with mock.patch("sqs.closing_circle_queue.CircleQueue.send_first_circle_event"):
+            self.gamemaster_1.start_game(self.lobby.name)
+
+        old_connection_id = '123456'
+        new_connection_id = '654321'
+        event = self.create_fake_websocket_event(old_connection_id, body={'access_token': '123456'})
+        with mock.patch('jwt.verify_token', return_value={'username': self.p_1.username}):
+            authorize_connection_handler(event, None)
+
+        connection_manager = ConnectionManager()
+        connection_ids = connection_manager.get_players_in_lobby(self.lobby)
+
+        # player_1 reconnects after the recipients were read, but before the broadcast hits their old connection
+        event = self.create_fake_websocket_event(new_connection_id, body={'access_token': '123456'})
+        with mock.patch('jwt.verify_token', return_value={'username': self.p_1.username}):
+            authorize_connection_handler(event, None)
+
+        with mock.patch('boto3.client'), \
+                mock.patch('websockets.connection_manager.ConnectionManager._send_data', return_value=False):
+            connection_manager._send_to_connections(connection_ids, dict(event_type='test'))
+
+        self.assertFalse(connection_ids)
+        self.assertEqual([new_connection_id], ConnectionManager().get_players_in_lobby(self.lobby))
+
+    def test_roster_reused_until_connections_change(self):
+        with mock.patch("sqs.closing_circle_queue.CircleQueue.send_first_circle_event"):
+            self.gamemaster_1.start_game(self.lobby.name)
+
+        p_1_connection_id = '123456'
+        p_2_connection_id = '512512'
+        p_4_connection_id = '223456'
+        gm_connection_id = '341234'
+        for connection_id, user in [(p_1_connection_id, self.p_1),
+                                    (p_4_connection_id, self.p_4),
+                                    (gm_connection_id, self.gamemaster_1)]:
+            event = self.create_fake_websocket_event(connection_id, body={'access_token': '123456'})
+            with mock.patch('jwt.verify_token', return_value={'username': user.username}):
+                authorize_connection_handler(event, None)
+
+        roster_cache.clear()
+        connection_manager = ConnectionManager()
+        with mock.patch.object(connection_manager, 'load_roster', wraps=connection_manager.load_roster) as load_roster:
+            # repeated broadcasts only read the roster once
+            roster = connection_manager.get_roster(self.lobby)
+            connection_manager.get_roster(self.lobby)
+            self.assertEqual(1, load_roster.call_count)
+
+            # players are grouped by squad
+            self.assertEqual({self.squad_1.name: {self.p_1.username: p_1_connection_id,
+                                                  self.p_4.username: p_4_connection_id}}, roster.squads)
+            self.assertEqual(gm_connection_id, roster.game_master)
+
+            # a new connection changes the roster version, so the roster is read again
+            event = self.create_fake_websocket_event(p_2_connection_id, body={'access_token': '123456'})
+            with mock.patch('jwt.verify_token', return_value={'username': self.p_2.username}):
+                authorize_connection_handler(event, None)
+            roster = connection_manager.get_roster(self.lobby)
+            self.assertEqual(2, load_roster.call_count)
+            self.assertIn(p_2_connection_id, roster.connection_ids())
+
+            # as does a disconnect
+            disconnect_event = self.create_fake_websocket_event(p_1_connection_id,
+                                                                event_type=WebSocketEventType.DISCONNECT)
+            connection_handler(disconnect_event, None)
+            roster = connection_manager.get_roster(self.lobby)
+            self.assertEqual(3, load_roster.call_count)
+            self.assertNotIn(p_1_connection_id, roster.connection_ids())
+
+    def test_authorize_connection_with_session_ticket(self):
+        # starting the game writes a session ticket for the gamemaster and every player in the lobby
+        with mock.patch("sqs.closing_circle_queue.CircleQueue.send_first_circle_event"):
+            self.gamemaster_1.start_game(self.lobby.name)
+        player_ticket = self.table.get_item(Key={'pk': self.p_4.username, 'sk': 'SESSION'})['Item']
+        self.assertEqual(self.squad_1.name, player_ticket['squad'])
+        self.assertEqual(self.lobby.unique_id, player_ticket['lobby-id'])
+        self.assertTrue(self.table.get_item(Key={'pk': self.gamemaster_1.username, 'sk': 'SESSION'}).get('Item'))
+
+        # authorizing on a ticket does not need to look up the user's lobby
+        connection_id = '123456'
+        connection_handler(self.create_fake_websocket_event(connection_id,
+                                                            event_type=WebSocketEventType.CONNECT,
+                                                            body={'access_token': '123456'}), None)
+        event = self.create_fake_websocket_event(connection_id, body={'access_token': '123456'})
+        with mock.patch('jwt.verify_token', return_value={'username': self.p_4.username}), \
+                mock.patch('models.player.Player.get_current_lobby') as get_current_lobby:
+            authorize_connection_handler(event, None)
+        get_current_lobby.assert_not_called()
+
+        self.assertFalse(ConnectionManager().get_unauthorized_connections())
+        connection = self.table.get_item(
+            Key={
+                'pk': 'CONNECTION',
+                'sk': f'LOBBY#{self.lobby.unique_id}#PLAYER#{self.p_4.username}'
+            },
+        )['Item']
+        self.assertEqual(connection_id, connection['lsi-2'])
+        self.assertEqual(f'SQUAD#{self.squad_1.name}', connection['lsi'])
+
+        # tickets are removed once the game has ended
+        with mock.patch('websockets.connection_manager.ConnectionManager._send_data', return_value=True):
+            self.gamemaster_1.end_game(self.lobby.name)
+        self.assertFalse(self.table.get_item(Key={'pk': self.p_4.username, 'sk': 'SESSION'}).get('Item'))
+        self.assertFalse(self.table.get_item(Key={'pk': self.gamemaster_1.username, 'sk': 'SESSION'}).get('Item'))
+
+    def test_sweep_expired_connections(self):
+        with mock.patch("sqs.closing_circle_queue.CircleQueue.send_first_circle_event"):
+            self.gamemaster_1.start_game(self.lobby.name)
+
+        # player-1 and the gamemaster authorize, player-2 never does
+        for connection_id, user in [('111111', self.p_1), ('222222', self.gamemaster_1), ('333333', self.p_2)]:
+            connection_handler(self.create_fake_websocket_event(connection_id,
+                                                                event_type=WebSocketEventType.CONNECT,
+                                                                body={'access_token': connection_id}), None)
+            if user != self.p_2:
+                event = self.create_fake_websocket_event(connection_id, body={'access_token': connection_id})
+                with mock.patch('jwt.verify_token', return_value={'username': user.username}):
+                    authorize_connection_handler(event, None)
+
+        connection_manager = ConnectionManager()
+        now = int(time.time())
+        self.assertEqual(0, connection_manager.sweep_expired_connections(now))
+
+        # only the unauthorized connection has expired
+        self.assertEqual(1, connection_manager.sweep_expired_connections(now + UNAUTHORIZED_CONNECTION_TTL + 1))
+        self.assertFalse(connection_manager.get_unauthorized_connections())
+        self.assertEqual(2, len(connection_manager.get_roster(self.lobby).connection_ids()))
+
+        # every authorized connection expires once API Gateway would have closed it
+        version = connection_manager.get_roster_version(self.lobby)
+        self.assertEqual(2, connection_manager.sweep_expired_connections(now + CONNECTION_TTL + 1))
+        self.assertNotEqual(version, connection_manager.get_roster_version(self.lobby))
+        self.assertFalse(connection_manager.get_roster(self.lobby).connection_ids())
@@ -0,0 +1,72 @@
+import unittest
+
+from db.dynamodb_connector import DynamoDbConnector
+from enums import SyntheticEntityType
+from handlers.test_handlers import _get_test_entities
+from local_services.dynamodb import LocalTable, install
+from local_services.world_generator import WorldGenerator
+from models.lobby import Lobby
+from models.player import Player
+from models.squad import Squad
+from tests.mock_db import TestWithMockAWSServices
+
+
+class WorldGeneratorTests:
+    """
+    Tests run against both DynamoDB Local and the in-process stand-in, so the stand-in is checked to behave the same
+    """
+
+    def test_world_reads_back_through_models(self):
+        generator = WorldGenerator(seed=1)
+        world = generator.generate(lobbies=2, squads_per_lobby=3, players_per_squad=2)
+        # lobby, game master, and per squad the squad, lobby squad, and player, member and summary per player
+        self.assertEqual(2 * (2 + 3 * (2 + 2 * 3)), generator.items_written)
+
+        lobby = Lobby(world[0].name, world[0].owner)
+        lobby.get()
+        self.assertEqual(world[0].unique_id, lobby.unique_id)
+        self.assertEqual((3, 2), (lobby.size, lobby.squad_size))
+        self.assertEqual(world[0].game_zone.coordinates, lobby.game_zone.coordinates)
+        self.assertEqual(world[0].game_zone.final_circle, lobby.game_zone.final_circle)
+
+        lobby.get_squads()
+        self.assertEqual(sorted(squad.name for squad in world[0].squads),
+                         sorted(squad.name for squad in lobby._own_squads()))
+        self.assertEqual(6, sum(len(squad.members) for squad in lobby._own_squads()))
+
+        squad = Squad(world[0].squads[0].name)
+        squad.get()
+        squad.get_members()
+        self.assertEqual(world[0].squads[0].members, squad.members)
+        self.assertEqual(world[0].squads[0].owner, squad.owner)
+
+        player = Player(world[1].squads[2].members[1].username)
+        player.get()
+        self.assertEqual((world[1].name, world[1].squads[2].name), (player.lobby.name, player.squad.name))
+        self.assertEqual([world[1].squads[2].name], [squad.name for squad in player.get_squads()])
+
+        self.assertEqual(12, len(_get_test_entities(SyntheticEntityType.PLAYER)))
+        self.assertEqual(2, len(_get_test_entities(SyntheticEntityType.GAME_MASTER)))
+
+    def test_same_seed_same_world(self):
+        names = [lobby.name for lobby in WorldGenerator(seed=7, table=LocalTable()).generate(lobbies=3)]
+        self.assertEqual(names, [lobby.name for lobby in WorldGenerator(seed=7, table=LocalTable()).generate(lobbies=3)])
+        self.assertNotEqual(names, [lobby.name for lobby in WorldGenerator(seed=8, table=LocalTable()).generate(lobbies=3)])
+
+
+class TestWorldGenerator(WorldGeneratorTests, TestWithMockAWSServices):
+    pass
+
+
+class TestWorldGeneratorInProcess(WorldGeneratorTests, unittest.TestCase):
+
+    def setUp(self):
+        self.table = install(LocalTable())
+
+    def tearDown(self):
+        DynamoDbConnector.table = None
+
+    def test_items_are_written_in_batches(self):
+        WorldGenerator(seed=1).generate(lobbies=2, squads_per_lobby=3, players_per_squad=2)
+        # 52 items
+        self.assertEqual({'BatchWriteItem': 3}, dict(self.table.operations))
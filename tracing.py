@@ -0,0 +1,224 @@
+"""
+Lightweight tracing of handler invocations. A sampled invocation records a span for each step it takes (parsing the
+request, loading it through its schema, model calls, DynamoDB calls, websocket posts and dumping the response) and logs
+them as a single compact JSON line when it returns, e.g.
+
+   {"trace":"start_lobby_handler","id":"3f0c…","ms":41.2,"status":200,"spans":[["handler",1,40.1,0.3],…]}
+
+Spans are keyed by their path from the outermost span, e.g. handler/GameMaster.start_game/Lobby.get_squads, and
+repeated spans on the same path are merged into [path, count, total ms, ms from the start of the invocation to the
+first one], so a loop over every squad in a lobby stays a single entry.
+
+Set $TRACE_SAMPLE_RATE to the fraction of invocations to trace, from 0 (the default, tracing disabled) to 1. When an
+invocation is not sampled, every span is a shared no-op object and costs a single thread-local lookup.
+"""
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from functools import wraps
+
+SAMPLE_RATE_VARIABLE = 'TRACE_SAMPLE_RATE'
+
+_local = threading.local()
+
+
+def sample_rate():
+    """
+    :return: fraction of invocations to trace, from $TRACE_SAMPLE_RATE
+    """
+    try:
+        return min(max(float(os.getenv(SAMPLE_RATE_VARIABLE) or 0), 0.0), 1.0)
+    except ValueError:
+        return 0.0
+
+
+def emit(line):
+    # Lambda sends stdout to CloudWatch Logs
+    print(line)
+
+
+class Trace:
+    """
+    Spans of a single invocation
+    """
+    __slots__ = ('name', 'trace_id', 'started', 'spans', 'stack', 'parent')
+
+    def __init__(self, name, parent=None):
+        """
+        :param name: name of the handler invoked
+        :param parent: trace which was running when this one started, restored when it finishes
+        """
+        self.name = name
+        self.trace_id = uuid.uuid4().hex
+        self.started = time.perf_counter()
+        self.spans = dict()  # [count, total seconds, seconds from start of trace to first span], keyed by path
+        self.stack = []  # paths of open spans, innermost last
+        self.parent = parent
+
+    def begin(self, name):
+        """
+        Open a span inside the innermost open span
+        :param name: name of span
+        :return: token to pass to end()
+        """
+        path = f'{self.stack[-1]}/{name}' if self.stack else name
+        self.stack.append(path)
+        return path, time.perf_counter()
+
+    def end(self, token):
+        """
+        Close a span
+        :param token: token returned by begin()
+        """
+        path, started = token
+        finished = time.perf_counter()
+        if self.stack and self.stack[-1] == path:
+            self.stack.pop()
+        elif path in self.stack:
+            self.stack.remove(path)
+
+        span = self.spans.get(path)
+        if span is None:
+            self.spans[path] = [1, finished - started, started - self.started]
+        else:
+            span[0] += 1
+            span[1] += finished - started
+
+    def log_line(self, **attributes):
+        """
+        :param attributes: attributes of the invocation to log, e.g. the status code returned
+        :return: JSON line of the trace and its spans, in the order they were first opened
+        """
+        spans = sorted(self.spans.items(), key=lambda item: item[1][2])
+        return json.dumps(dict(trace=self.name, id=self.trace_id,
+                               ms=round((time.perf_counter() - self.started) * 1000, 3),
+                               **attributes,
+                               spans=[[path, count, round(seconds * 1000, 3), round(offset * 1000, 3)]
+                                      for path, (count, seconds, offset) in spans]),
+                          separators=(',', ':'), default=str)
+
+
+def current_trace():
+    """
+    :return: Trace of the invocation running on this thread, or None if it is not being traced
+    """
+    return getattr(_local, 'trace', None)
+
+
+def start_trace(name):
+    """
+    Start tracing an invocation, if it is sampled
+    :param name: name of the handler invoked
+    :return: Trace, or None if the invocation is not sampled
+    """
+    rate = sample_rate()
+    if not rate or random.random() >= rate:
+        return None
+    trace = Trace(name, parent=current_trace())
+    _local.trace = trace
+    return trace
+
+
+def finish_trace(trace, **attributes):
+    """
+    Stop tracing an invocation and log its spans
+    :param trace: Trace returned by start_trace(), or None
+    :param attributes: attributes of the invocation to log, e.g. the status code returned
+    """
+    if trace is None:
+        return
+    _local.trace = trace.parent
+    emit(trace.log_line(**attributes))
+
+
+class _Span:
+    __slots__ = ('trace', 'name', 'token')
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+        self.token = None
+
+    def __enter__(self):
+        self.token = self.trace.begin(self.name)
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.trace.end(self.token)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name):
+    """
+    Record a span around a block, if the invocation is being traced:
+
+       >>> with span('dynamodb.Query'):
+       ...     table.query(...)
+
+    :param name: name of span
+    :return: context manager
+    """
+    trace = getattr(_local, 'trace', None)
+    if trace is None:
+        return _NO_SPAN
+    return _Span(trace, name)
+
+
+def traced(func):
+    """
+    Decorator recording a span around every call of a function or method, named by its qualified name, e.g.
+    Lobby.get_squads
+    """
+    name = func.__qualname__
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        trace = getattr(_local, 'trace', None)
+        if trace is None:
+            return func(*args, **kwargs)
+        token = trace.begin(name)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            trace.end(token)
+    return wrapper
+
+
+def instrument_client(client):
+    """
+    Record a span around every API call made by a boto3 client, named by service and operation, e.g. dynamodb.Query.
+    Calls made by batch writers and paginators go through the client too
+    :param client: boto3 client
+    """
+    service = client.meta.service_model.service_name
+
+    def before_call(model, context, **kwargs):
+        trace = getattr(_local, 'trace', None)
+        if trace is not None:
+            context['trace_span'] = (trace, trace.begin(f'{service}.{model.name}'))
+
+    def after_call(context, **kwargs):
+        trace_span = context.pop('trace_span', None)
+        if trace_span is not None:
+            trace, token = trace_span
+            trace.end(token)
+
+    client.meta.events.register(f'before-call.{service}', before_call)
+    client.meta.events.register(f'after-call.{service}', after_call)
+    client.meta.events.register(f'after-call-error.{service}', after_call)
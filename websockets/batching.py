@@ -0,0 +1,108 @@
+import os
+
+from clock import get_clock
+from enums import WebSocketPushMessageType
+from websockets.dispatch import PushPriority, get_priority, get_location_owner
+
+
+def _monotonic():
+    return get_clock().monotonic()
+
+
+class MessageBatcher:
+    """
+    Holds websocket messages for each recipient for up to a batching window, and merges them into one framed message.
+    Critical messages are sent straight away along with anything pending for the recipient.
+    Batching is disabled unless a window is given, or set in milliseconds with $WEBSOCKET_BATCH_WINDOW_MS.
+    A Lambda is frozen once it returns, so anything still pending must be flushed before the end of the invocation.
+    """
+
+    def __init__(self, window=None, clock=_monotonic):
+        """
+        :param window: seconds a message may be held for before it is sent. None or 0 disables batching
+        :param clock: function returning the current time in seconds. Defaults to the game clock
+        """
+        self.window = window
+        self.clock = clock
+        self.pending = dict()  # messages waiting to be sent, keyed by connection_id
+        self.opened = dict()  # time the first pending message was queued, keyed by connection_id
+
+    @classmethod
+    def from_environment(cls):
+        window_ms = os.getenv('WEBSOCKET_BATCH_WINDOW_MS')
+        return cls(window=float(window_ms) / 1000 if window_ms else None)
+
+    @property
+    def enabled(self):
+        return bool(self.window)
+
+    def add(self, connection_ids, data):
+        """
+        Queue a message for a list of recipients
+        :param connection_ids: list containing connection_ID of each target client
+        :param data: data to send through websocket
+        :return: list of (connection_id, data) tuples which are ready to be sent now
+        """
+        now = self.clock()
+        location_owner = get_location_owner(data)
+        for connection_id in connection_ids:
+            pending = self.pending.setdefault(connection_id, [])
+            if location_owner is not None:
+                # a newer location makes any pending location of the same player stale
+                pending[:] = [message for message in pending if get_location_owner(message) != location_owner]
+            pending.append(data)
+            self.opened.setdefault(connection_id, now)
+
+        # critical messages cannot wait for the batching window to close
+        if get_priority(data) == PushPriority.CRITICAL:
+            ready = [self.pop(connection_id) for connection_id in connection_ids]
+        else:
+            ready = []
+        return ready + self.pop_due(now)
+
+    def pop_due(self, now=None):
+        """
+        Remove every recipient whose batching window has closed
+        :param now: current time, defaults to the time given by self.clock
+        :return: list of (connection_id, data) tuples which are ready to be sent
+        """
+        now = self.clock() if now is None else now
+        due = [connection_id for connection_id, opened in self.opened.items() if now - opened >= self.window]
+        return [self.pop(connection_id) for connection_id in due]
+
+    def pop_all(self):
+        """
+        Remove every pending message, regardless of the batching window
+        :return: list of (connection_id, data) tuples which are ready to be sent
+        """
+        return [self.pop(connection_id) for connection_id in list(self.pending)]
+
+    def pop(self, connection_id):
+        """
+        Remove the pending messages of a single recipient
+        :param connection_id: connection_id of recipient
+        :return: (connection_id, data) tuple, where data is a single message or a framed array of messages
+        """
+        self.opened.pop(connection_id, None)
+        return connection_id, self.frame(self.pending.pop(connection_id, []))
+
+    def discard(self, connection_id):
+        """
+        Drop pending messages for a recipient which has gone away
+        """
+        self.opened.pop(connection_id, None)
+        self.pending.pop(connection_id, None)
+
+    @staticmethod
+    def frame(messages):
+        """
+        A single message is sent as is, so clients only see the framing when messages have actually been merged. Merged
+        messages are ordered by priority, keeping the order they were queued in within each priority
+        """
+        if len(messages) == 1:
+            return messages[0]
+        return dict(event_type=WebSocketPushMessageType.BATCH.value,
+                    value=sorted(messages, key=get_priority))
+
+
+message_batcher = MessageBatcher.from_environment()
@@ -1,26 +1,42 @@
 import json
 import os
-import time
-from datetime import datetime
 
 import boto3
-from boto3.dynamodb.conditions import Key
-from db.dynamodb_connector import DynamoDbConnector
-from enums import LobbyState, PlayerState, WebSocketPushMessageType
+from boto3.dynamodb.conditions import Key, Attr
+
+import tracing
+from clock import get_clock
+from db.dynamodb_connector import DynamoDbConnector, TTL_ATTRIBUTE, expires_in
+from enums import LobbyState, PlayerState, WebSocketPushMessageType, SessionRole
 from exceptions import PlayerNotInLobbyException, LobbyNotStartedException
-from models import game_master as game_master_model
-from models import player as player_model
+from websockets.batching import message_batcher
+from websockets.dispatch import PushDispatcher
+from websockets.roster import LobbyRoster, roster_cache
+
+# clients must authorize soon after connecting, otherwise their connection is swept
+UNAUTHORIZED_CONNECTION_TTL = 10 * 60
+# API Gateway closes every websocket connection after 2 hours at most
+CONNECTION_TTL = 2 * 60 * 60
+# roster versions outlive their connections by the time DynamoDB may take to delete expired items, so the sweeper can
+# still find every connection of a lobby through its roster
+ROSTER_TTL = CONNECTION_TTL + 2 * 24 * 60 * 60
+# seconds between each intermediate circle pushed while a circle closes
+CIRCLE_UPDATE_INTERVAL = 1
 
 
 class ConnectionManager:
+    # Management API client used to post to websocket clients. Created for each fan-out unless set, e.g. to a stand-in
+    gateway_api = None
 
     def __init__(self):
         self.table = DynamoDbConnector.get_table()
+        self.connection_keys = dict()  # sort key of each authorized connection read so far, keyed by connection_id
+        self.gone_connections = set()  # connections which returned GoneException during a fan-out
 
     def connect_unauthorized(self, connection_id):
         """
         Connect an anonymous, authorized user. User must then authenticate themselves after establishing this connection
-        or they are forcefully disconnected. # todo cron job to clean this stuff up
+        or their connection expires and is removed by sweep_expired_connections.
         :param connection_id: Id of websocket connection
         """
         # save connection_id of unauthorized user
@@ -28,18 +44,26 @@ class ConnectionManager:
             Item={
                 'pk': 'CONNECTION#UNAUTHORIZED',
                 'sk': connection_id,
-                'lsi': str(datetime.now()),
-                'lsi-2': 'UNAUTHORIZED'
+                'lsi': str(get_clock().now()),
+                'lsi-2': 'UNAUTHORIZED',
+                TTL_ATTRIBUTE: expires_in(UNAUTHORIZED_CONNECTION_TTL)
             }
         )
 
-    def get_unauthorized_connections(self):
-        response = self.table.query(
+    def get_unauthorized_connections(self, expired_by=None):
+        """
+        Get connection_id's of unauthorized connections
+        :param expired_by: if given, only get connections which have expired by this epoch time in seconds
+        :return: list of connection_id's
+        """
+        query_kwargs = dict(
             IndexName='lsi-2',
             Select='ALL_ATTRIBUTES',
             KeyConditionExpression=Key('pk').eq('CONNECTION#UNAUTHORIZED') & Key('lsi-2').eq('UNAUTHORIZED')
         )
-        return [item['sk'] for item in response['Items']]
+        if expired_by is not None:
+            query_kwargs['FilterExpression'] = Attr(TTL_ATTRIBUTE).lte(expired_by)
+        return [item['sk'] for item in self._query_all(**query_kwargs)]
 
     def disconnect_unauthorized_connection(self, connection_id):
         """
@@ -74,9 +98,19 @@ class ConnectionManager:
         :param connection_id: Id of websocket connection
         :param username: username of User trying to connect to a game session
         """
+        # users in a started lobby have a session ticket written when the game was started
+        ticket = self.get_session_ticket(username)
+        if ticket:
+            self.handle_ticket_connect(ticket, username, connection_id)
+            return
+
         # remove unauthorized connection
         self.disconnect_unauthorized_connection(connection_id)
 
+        # users without a session ticket are the slow path, so the models are only imported here rather than at cold start
+        from models import game_master as game_master_model
+        from models import player as player_model
+
         # check if username is a player and they are in a lobby
         try:
             player = player_model.Player(username)
@@ -108,6 +142,44 @@ class ConnectionManager:
             except PlayerNotInLobbyException:
                 raise PlayerNotInLobbyException(f"User with username {username} is not in a started Lobby")
 
+    def get_session_ticket(self, username):
+        """
+        Get the session ticket of a User, which exists only while they are in a started Lobby
+        :param username: username of User
+        :return: session ticket, or None if the User has no session ticket
+        """
+        response = self.table.get_item(
+            Key={
+                'pk': username,
+                'sk': 'SESSION'
+            },
+        )
+        return response.get('Item')
+
+    def handle_ticket_connect(self, ticket, username, connection_id):
+        """
+        Connect a User to the game session on their session ticket. The connection item is written and the unauthorized
+        connection removed in a single BatchWriteItem
+        :param ticket: session ticket of the User
+        :param username: username of User connecting to the game session
+        :param connection_id: unique connection_id for websocket session
+        """
+        lobby_id = ticket['lobby-id']
+        if SessionRole(ticket['role']) == SessionRole.GAME_MASTER:
+            item = self._game_master_connection(lobby_id, username, connection_id)
+        else:
+            item = self._player_connection(lobby_id, username, ticket['squad'], connection_id)
+
+        with self.table.batch_writer() as batch:
+            batch.put_item(Item=item)
+            batch.delete_item(
+                Key={
+                    'pk': 'CONNECTION#UNAUTHORIZED',
+                    'sk': connection_id
+                }
+            )
+        self.bump_roster_version(lobby_id)
+
     def handle_player_connect(self, player, lobby, connection_id):
         """
         Player is connecting to a started Lobby. We use lobby unique_id in the sort key to make sure there are no
@@ -120,13 +192,9 @@ class ConnectionManager:
         # get current state to find which squad they are playing in
         player_state = lobby.get_player(player)
         _ = self.table.put_item(
-            Item={
-                'pk': 'CONNECTION',
-                'sk': f'LOBBY#{lobby.unique_id}#PLAYER#{player.username}',
-                'lsi': f'SQUAD#{player_state["squad_name"]}',
-                'lsi-2': connection_id
-            }
+            Item=self._player_connection(lobby.unique_id, player.username, player_state["squad_name"], connection_id)
         )
+        self.bump_roster_version(lobby.unique_id)
 
     def handle_game_master_connect(self, gamemaster, lobby, connection_id):
         """
@@ -137,13 +205,30 @@ class ConnectionManager:
         :return:
         """
         _ = self.table.put_item(
-            Item={
-                'pk': 'CONNECTION',
-                'sk': f'GAMEMASTER#{gamemaster.username}',
-                'lsi': f'LOBBY#{lobby.unique_id}',
-                'lsi-2': connection_id
-            }
+            Item=self._game_master_connection(lobby.unique_id, gamemaster.username, connection_id)
         )
+        self.bump_roster_version(lobby.unique_id)
+
+    @staticmethod
+    def _player_connection(lobby_id, username, squad_name, connection_id):
+        # lobby unique_id is used in the sort key so there are no crossovers with lobbies that have a similar name
+        return {
+            'pk': 'CONNECTION',
+            'sk': f'LOBBY#{lobby_id}#PLAYER#{username}',
+            'lsi': f'SQUAD#{squad_name}',
+            'lsi-2': connection_id,
+            TTL_ATTRIBUTE: expires_in(CONNECTION_TTL)
+        }
+
+    @staticmethod
+    def _game_master_connection(lobby_id, username, connection_id):
+        return {
+            'pk': 'CONNECTION',
+            'sk': f'GAMEMASTER#{username}',
+            'lsi': f'LOBBY#{lobby_id}',
+            'lsi-2': connection_id,
+            TTL_ATTRIBUTE: expires_in(CONNECTION_TTL)
+        }
 
     def disconnect(self, connection_id):
         """
@@ -172,6 +257,7 @@ class ConnectionManager:
                     'sk': connection['sk'],
                 }
             )
+            self.bump_roster_version(self._get_lobby_id(connection))
 
     def get_connected_squad_members(self, player):
         """
@@ -190,6 +276,7 @@ class ConnectionManager:
             name = squad_member['sk'].split('#')[3]
             if player.username != name:
                 connection_ids.append(squad_member['lsi-2'])
+                self.connection_keys[squad_member['lsi-2']] = squad_member['sk']
 
         return connection_ids
 
@@ -207,6 +294,7 @@ class ConnectionManager:
         )
         gm = response.get('Item')
         if gm:
+            self.connection_keys[gm['lsi-2']] = gm['sk']
             return gm['lsi-2']
         else:
             return None
@@ -226,6 +314,7 @@ class ConnectionManager:
         if not response:
             raise PlayerNotInLobbyException("No player with this connection_id is connected")
 
+        from models import player as player_model
         return player_model.Player(response[0]['sk'].split('#')[3])
 
     def get_game_master(self, connection_id):
@@ -242,6 +331,7 @@ class ConnectionManager:
         if not response:
             raise PlayerNotInLobbyException("No GameMaster with this connection_id is connected")
 
+        from models import game_master as game_master_model
         return game_master_model.GameMaster(response[0]['sk'].split('#')[1])
 
     def get_players_in_lobby(self, lobby):
@@ -257,6 +347,7 @@ class ConnectionManager:
         connection_ids = []
         for player in response:
             connection_ids.append(player['lsi-2'])
+            self.connection_keys[player['lsi-2']] = player['sk']
 
         return connection_ids
 
@@ -271,10 +362,89 @@ class ConnectionManager:
             KeyConditionExpression=Key('pk').eq('CONNECTION') & Key('lsi').eq(f'LOBBY#{lobby.unique_id}')
         )['Items']
         if response:
+            self.connection_keys[response[0]['lsi-2']] = response[0]['sk']
             return response[0]['lsi-2']
         else:
             return None
 
+    def get_roster_version(self, lobby):
+        """
+        Gets the current version of the connections to a lobby session. The version changes whenever someone connects to
+        or disconnects from the lobby session
+        :param lobby: lobby to get roster version of
+        :return: version, or None if no one has connected to the lobby session yet
+        """
+        response = self.table.get_item(
+            Key={
+                'pk': 'CONNECTION#ROSTER',
+                'sk': f'LOBBY#{lobby.unique_id}'
+            },
+        )
+        roster_version = response.get('Item')
+        if roster_version:
+            return int(roster_version['version'])
+        return None
+
+    def bump_roster_version(self, lobby_id):
+        """
+        Marks every cached roster of a lobby session as out of date. Must be called after the connection items have been
+        written, so a roster read at the new version is guaranteed to contain the change
+        :param lobby_id: unique_id of lobby whose connections have changed
+        """
+        _ = self.table.put_item(
+            Item={
+                'pk': 'CONNECTION#ROSTER',
+                'sk': f'LOBBY#{lobby_id}',
+                'version': LobbyRoster.new_version(),
+                TTL_ATTRIBUTE: expires_in(ROSTER_TTL)
+            }
+        )
+        roster_cache.invalidate(lobby_id)
+
+    def get_roster(self, lobby):
+        """
+        Gets the roster of players and GameMaster connected to a lobby session. A roster cached in memory by a previous
+        broadcast is reused as long as its version is current, which costs one GetItem instead of two queries.
+        :param lobby: lobby to get roster of
+        :return: LobbyRoster
+        """
+        version = self.get_roster_version(lobby)
+        roster = roster_cache.get(lobby.unique_id, version)
+        if not roster:
+            roster = self.load_roster(lobby, version)
+            roster_cache.put(roster)
+
+        self.connection_keys.update(roster.sort_keys)
+        return roster
+
+    def load_roster(self, lobby, version=None):
+        """
+        Reads the roster of a lobby session from the database. The version must be read before calling this, so that a
+        connection made in between results in a roster which is newer than its version rather than older
+        :param lobby: lobby to load roster of
+        :param version: version of the lobby's connections read before loading
+        :return: LobbyRoster
+        """
+        roster = LobbyRoster(lobby.unique_id, version)
+
+        players = self.table.query(
+            KeyConditionExpression=Key('pk').eq('CONNECTION') & Key('sk').begins_with(f'LOBBY#{lobby.unique_id}')
+        )['Items']
+        for player in players:
+            roster.add_player(squad_name=player['lsi'].split('#')[1],
+                              username=player['sk'].split('#')[3],
+                              connection_id=player['lsi-2'],
+                              sort_key=player['sk'])
+
+        game_master = self.table.query(
+            IndexName='lsi',
+            KeyConditionExpression=Key('pk').eq('CONNECTION') & Key('lsi').eq(f'LOBBY#{lobby.unique_id}')
+        )['Items']
+        if game_master:
+            roster.set_game_master(game_master[0]['lsi-2'], game_master[0]['sk'])
+
+        return roster
+
     def push_player_dead(self, player):
         """
         Given a player, send a message to their GM and squad mates that they are dead, if they are connected
@@ -284,31 +454,37 @@ class ConnectionManager:
         payload = dict(event_type=WebSocketPushMessageType.PLAYER_DEAD.value,
                        value=dict(name=player.username, state=PlayerState.DEAD.value))
 
+        connection_ids = self.get_connected_squad_members(player)
         gm = self.get_game_master_from_player(player)
-        squad_members = self.get_connected_squad_members(player)
-
         if gm:
-            self._send_to_connection(gm, payload)
-        for member in squad_members:
-            self._send_to_connection(member, payload)
+            connection_ids.append(gm)
+
+        self._send_to_connections(connection_ids, payload)
 
     def push_circle_updates(self, circles: list, lobby):
         """
-        Given a dict of circles, pushes each sequential circle data to all connected players and game master over each
-        second.
+        Given a dict of circles, pushes each sequential circle data to all connected players and game master, one every
+        CIRCLE_UPDATE_INTERVAL seconds of game time. Updates are paced against when closing started, so the time taken
+        by each fan-out does not make the circle close slower than configured.
         :param circles: list of circles to push. They are in order of decreasing size
         :param lobby: lobby to send circle data to
         :return: None
         """
         # for each circle, push the circle data to the game master and connected players
         connection_ids = self._get_all_connected(lobby)
+        clock = get_clock()
+        started = clock.monotonic()
 
-        for circle in circles:
-            # each second, push the next circle location to connected players
+        for i, circle in enumerate(circles, start=1):
+            # each interval, push the next circle location to connected players
             payload = dict(event_type=WebSocketPushMessageType.CIRCLE_CLOSING.value,
                            value=circle)
             self._send_to_connections(connection_ids, payload)
-            time.sleep(1)
+            # don't hold batched messages back while waiting for the next circle
+            self.flush_messages()
+            delay = started + i * CIRCLE_UPDATE_INTERVAL - clock.monotonic()
+            if delay > 0:
+                clock.sleep(delay)
 
     def push_game_state(self, lobby):
         connection_ids = self._get_all_connected(lobby)
@@ -334,13 +510,12 @@ class ConnectionManager:
                                   latitude=player_lat))
 
         # push location to squad mates and game master
-        connection_manager = ConnectionManager()
-        connection_ids = connection_manager.get_connected_squad_members(player)
-        gamemaster_connection_id = ConnectionManager().get_game_master_from_player(player)
+        connection_ids = self.get_connected_squad_members(player)
+        gamemaster_connection_id = self.get_game_master_from_player(player)
         if gamemaster_connection_id:
             connection_ids.append(gamemaster_connection_id)
 
-        connection_manager._send_to_connections(connection_ids, payload)
+        self._send_to_connections(connection_ids, payload)
 
     def push_game_master_message(self, connection_id, data):
         gamemaster = self.get_game_master(connection_id)
@@ -348,7 +523,7 @@ class ConnectionManager:
 
         # get all players belonging to gamemaster's lobby
         gamemaster.lobby.get()
-        squad_connection_ids = self.get_players_in_lobby(gamemaster.lobby)
+        squad_connection_ids = self.get_roster(gamemaster.lobby).player_connection_ids()
         payload = dict(event_type=WebSocketPushMessageType.GAME_MASTER_MESSAGE.value,
                        value=data)
         self._send_to_connections(squad_connection_ids, payload)
@@ -366,11 +541,149 @@ class ConnectionManager:
 
     def _get_all_connected(self, lobby):
         # gets all players and the GameMaster connected to the lobby
-        connection_ids = self.get_players_in_lobby(lobby)
-        gm = self.get_game_master_in_lobby(lobby)
-        if gm:
-            connection_ids.append(gm)
-        return connection_ids
+        return self.get_roster(lobby).connection_ids()
+
+    def prune_gone_connections(self):
+        """
+        Removes every connection which returned GoneException during a fan-out in a single batched cleanup, instead of
+        disconnecting each one inline while the rest of the broadcast waits.
+        :return: None
+        """
+        if not self.gone_connections:
+            return
+        gone_connections, self.gone_connections = self.gone_connections, set()
+
+        # connections read during this fan-out have a known sort key. Anything else is looked up by connection_id
+        known_keys = {connection_id: self.connection_keys.pop(connection_id)
+                      for connection_id in gone_connections if connection_id in self.connection_keys}
+        connections = self._get_stale_connections(known_keys)
+        for connection_id in gone_connections - known_keys.keys():
+            connections.extend(self._get_connections(connection_id))
+
+        if not connections:
+            return
+
+        with self.table.batch_writer(overwrite_by_pkeys=['pk', 'sk']) as batch:
+            for connection in connections:
+                batch.delete_item(
+                    Key={
+                        'pk': 'CONNECTION',
+                        'sk': connection['sk'],
+                    }
+                )
+
+        for lobby_id in {self._get_lobby_id(connection) for connection in connections}:
+            self.bump_roster_version(lobby_id)
+
+    def sweep_expired_connections(self, now=None):
+        """
+        Removes every connection which has outlived its Time to Live. DynamoDB only deletes expired items within a
+        couple of days, so without sweeping, clients which never authorized or disconnected ungracefully stay in the
+        lobby rosters and are sent every broadcast until a send hits GoneException.
+        :param now: epoch time in seconds to sweep up to, defaults to the current time
+        :return: number of connections removed
+        """
+        now = int(get_clock().time()) if now is None else now
+        keys = [{'pk': 'CONNECTION#UNAUTHORIZED', 'sk': connection_id}
+                for connection_id in self.get_unauthorized_connections(expired_by=now)]
+        swept = len(keys)
+
+        # authorized connections are found through the roster version of each lobby session
+        swept_lobbies = []
+        for roster in self._query_all(KeyConditionExpression=Key('pk').eq('CONNECTION#ROSTER')):
+            lobby_id = roster['sk'].split('#')[1]
+            connections = self._get_lobby_connections(lobby_id, expired_by=now)
+            keys.extend({'pk': 'CONNECTION', 'sk': connection['sk']} for connection in connections)
+            swept += len(connections)
+
+            # connections are written before the roster version is bumped, so they expire before their roster version
+            if TTL_ATTRIBUTE in roster and roster[TTL_ATTRIBUTE] <= now:
+                keys.append({'pk': roster['pk'], 'sk': roster['sk']})
+            elif connections:
+                swept_lobbies.append(lobby_id)
+
+        with self.table.batch_writer(overwrite_by_pkeys=['pk', 'sk']) as batch:
+            for key in keys:
+                batch.delete_item(Key=key)
+
+        for lobby_id in swept_lobbies:
+            self.bump_roster_version(lobby_id)
+        return swept
+
+    def _get_lobby_connections(self, lobby_id, expired_by):
+        """
+        Get the connection items of every player and the GameMaster of a lobby session which have expired
+        :param lobby_id: unique_id of lobby
+        :param expired_by: epoch time in seconds the connections must have expired by
+        :return: list of connection items
+        """
+        expired = Attr(TTL_ATTRIBUTE).lte(expired_by)
+        players = self._query_all(
+            KeyConditionExpression=Key('pk').eq('CONNECTION') & Key('sk').begins_with(f'LOBBY#{lobby_id}#'),
+            FilterExpression=expired
+        )
+        game_master = self._query_all(
+            IndexName='lsi',
+            KeyConditionExpression=Key('pk').eq('CONNECTION') & Key('lsi').eq(f'LOBBY#{lobby_id}'),
+            FilterExpression=expired
+        )
+        return players + game_master
+
+    def _query_all(self, **query_kwargs):
+        # follows LastEvaluatedKey, since filtered queries can return empty pages
+        items = []
+        while True:
+            response = self.table.query(**query_kwargs)
+            items.extend(response['Items'])
+            if 'LastEvaluatedKey' not in response:
+                return items
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def _get_stale_connections(self, known_keys):
+        """
+        Given sort keys of gone connections, returns the connection items which still belong to the gone connection. A
+        user who reconnected since the broadcast started has the same sort key with a new connection_id, and must not be
+        removed
+        :param known_keys: dict of sort key of each gone connection, keyed by connection_id
+        :return: list of connection items which are safe to delete
+        """
+        client = self.table.meta.client
+        keys_to_check = [{'pk': 'CONNECTION', 'sk': sort_key} for sort_key in known_keys.values()]
+
+        stale_connections = []
+        # BatchGetItem accepts at most 100 keys per request
+        while keys_to_check:
+            request_items = {self.table.name: {'Keys': keys_to_check[:100],
+                                               'ProjectionExpression': 'sk, lsi, #connection_id',
+                                               'ExpressionAttributeNames': {'#connection_id': 'lsi-2'}}}
+            keys_to_check = keys_to_check[100:]
+            while request_items:
+                response = client.batch_get_item(RequestItems=request_items)
+                for item in response['Responses'].get(self.table.name, []):
+                    if known_keys.get(item['lsi-2']) == item['sk']:
+                        stale_connections.append(item)
+                request_items = response.get('UnprocessedKeys')
+
+        return stale_connections
+
+    def _get_connections(self, connection_id):
+        """
+        Get every authorized connection item with the given connection_id
+        :param connection_id: Id of websocket connection
+        :return: list of connection items
+        """
+        response = self.table.query(
+            IndexName='lsi-2',
+            KeyConditionExpression=Key('pk').eq('CONNECTION') & Key('lsi-2').eq(connection_id)
+        )
+        return response['Items']
+
+    @staticmethod
+    def _get_lobby_id(connection):
+        # players are keyed on LOBBY#<unique_id>#PLAYER#<username>, GameMasters keep their lobby in the lsi
+        if connection['sk'].startswith('LOBBY#'):
+            return connection['sk'].split('#')[1]
+        return connection['lsi'].split('#')[1]
 
     def _send_to_connection(self, connection_id, data):
         """
@@ -378,30 +691,73 @@ class ConnectionManager:
         :param connection_id: ID of websocket client
         :param data: data to send through websocket
         """
-
-        websocket_url = os.environ.get('WEBSOCKET_URL')
-
-        gateway_api = boto3.client("apigatewaymanagementapi", endpoint_url=websocket_url)
-        self._send_data(gateway_api, connection_id, data)
+        self._send_to_connections([connection_id], data)
 
     def _send_to_connections(self, connection_ids, data):
         """
-        Send a message to a list of websocket clients.
+        Send a message to a list of websocket clients. Clients which have gone away are removed from connection_ids
+        straight away, so callers reusing the list for further messages skip them, and are pruned from the database once
+        the fan-out has finished.
         :param connection_ids: list containing connection_ID of each target client
         :param data: data to send through websocket
         """
 
-        websocket_url = os.environ.get('WEBSOCKET_URL')
+        if not connection_ids:
+            return
+
+        if message_batcher.enabled:
+            messages = message_batcher.add(connection_ids, data)
+        else:
+            messages = [(connection_id, data) for connection_id in connection_ids]
+        self._send_messages(messages)
 
-        gateway_api = boto3.client("apigatewaymanagementapi", endpoint_url=websocket_url)
-        for connection_id in connection_ids:
-            self._send_data(gateway_api, connection_id, data)
+        for connection_id in self.gone_connections.intersection(connection_ids):
+            connection_ids.remove(connection_id)
+
+        self.prune_gone_connections()
+
+    def flush_messages(self):
+        """
+        Send every message held back by the batching window. Must be called before the end of an invocation.
+        """
+        self._send_messages(message_batcher.pop_all())
+        self.prune_gone_connections()
+
+    def _send_messages(self, messages):
+        """
+        Send a list of messages through priority lanes, collecting any clients which have gone away in
+        self.gone_connections
+        :param messages: list of (connection_id, data) tuples
+        """
+        if not messages:
+            return
+
+        gateway_api = self.gateway_api
+        if gateway_api is None:
+            websocket_url = os.environ.get('WEBSOCKET_URL')
+            gateway_api = boto3.client("apigatewaymanagementapi", endpoint_url=websocket_url)
+
+        dispatcher = PushDispatcher()
+        for connection_id, data in messages:
+            dispatcher.enqueue(connection_id, data)
+
+        with tracing.span('websocket.fan_out'):
+            gone_connections = dispatcher.dispatch(
+                lambda connection_id, data: self._send_data(gateway_api, connection_id, data))
+        for connection_id in gone_connections:
+            self.gone_connections.add(connection_id)
+            message_batcher.discard(connection_id)
 
     @staticmethod
     def _send_data(gateway_api, connection_id, data):
+        """
+        Post data to a single websocket client
+        :return: True if the data was posted, False if the client has disconnected ungracefully
+        """
         try:
-            return gateway_api.post_to_connection(ConnectionId=connection_id,
-                                                  Data=json.dumps(data).encode('utf-8'))
+            with tracing.span('websocket.post'):
+                gateway_api.post_to_connection(ConnectionId=connection_id,
+                                               Data=json.dumps(data).encode('utf-8'))
+            return True
         except gateway_api.exceptions.GoneException:
-            # if client disconnects from Websocket ungracefully, remove from database as well somehow
-            ConnectionManager().disconnect(connection_id)
+            return False
@@ -0,0 +1,128 @@
+from collections import OrderedDict
+from enum import IntEnum
+from itertools import count
+
+from botocore.exceptions import ClientError
+
+from clock import get_clock
+from enums import WebSocketPushMessageType
+
+
+class PushPriority(IntEnum):
+    """
+    Priority lanes for websocket messages. Lower values are sent first
+    """
+    CRITICAL = 0
+    NORMAL = 1
+    LOCATION = 2
+
+
+MESSAGE_PRIORITIES = {
+    WebSocketPushMessageType.GAME_STATE.value: PushPriority.CRITICAL,
+    WebSocketPushMessageType.PLAYER_DEAD.value: PushPriority.CRITICAL,
+    WebSocketPushMessageType.NEXT_CIRCLE.value: PushPriority.CRITICAL,
+    WebSocketPushMessageType.CIRCLE_CLOSING.value: PushPriority.NORMAL,
+    WebSocketPushMessageType.GAME_MASTER_MESSAGE.value: PushPriority.NORMAL,
+    WebSocketPushMessageType.PLAYER_LOCATION.value: PushPriority.LOCATION,
+}
+
+# errors API Gateway returns when it is overloaded, rather than because of the message itself
+RETRYABLE_ERRORS = {'LimitExceededException', 'TooManyRequestsException', 'ThrottlingException',
+                    'InternalServerErrorException', 'ServiceUnavailableException'}
+
+
+def _sleep(seconds):
+    get_clock().sleep(seconds)
+
+
+def get_priority(data):
+    """
+    Get the priority lane of a message. A framed batch of messages takes the priority of its most important message
+    :param data: message to send through websocket
+    :return: PushPriority
+    """
+    if data.get('event_type') == WebSocketPushMessageType.BATCH.value:
+        return min(get_priority(message) for message in data['value'])
+    return MESSAGE_PRIORITIES.get(data.get('event_type'), PushPriority.NORMAL)
+
+
+def get_location_owner(data):
+    """
+    :param data: message to send through websocket
+    :return: username of the player a location message belongs to, or None if it is not a location message
+    """
+    if data.get('event_type') == WebSocketPushMessageType.PLAYER_LOCATION.value:
+        return data['value']['name']
+    return None
+
+
+class PushDispatcher:
+    """
+    Sends websocket messages lane by lane, so critical messages are never stuck behind location updates. Only the
+    newest location of a player is kept for each recipient, and critical messages are retried if API Gateway is
+    throttling.
+    """
+
+    def __init__(self, max_retries=3, retry_delay=0.05, sleep=_sleep):
+        """
+        :param max_retries: number of times a critical message is retried
+        :param retry_delay: seconds to wait before the first retry. Doubles with every retry
+        :param sleep: function used to wait between retries. Defaults to the game clock
+        """
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.sleep = sleep
+        self.lanes = {priority: OrderedDict() for priority in PushPriority}
+        self.sequence = count()
+
+    def __len__(self):
+        return sum(len(lane) for lane in self.lanes.values())
+
+    def enqueue(self, connection_id, data):
+        """
+        Queue a message in its priority lane. A location message replaces any queued location of the same player for
+        the same recipient
+        :param connection_id: connection_id of recipient
+        :param data: message to send through websocket
+        """
+        priority = get_priority(data)
+        location_owner = get_location_owner(data)
+        if location_owner is not None:
+            key = (connection_id, location_owner)
+            self.lanes[priority].pop(key, None)
+        else:
+            key = next(self.sequence)
+        self.lanes[priority][key] = (connection_id, data)
+
+    def dispatch(self, post):
+        """
+        Send every queued message, highest priority lane first
+        :param post: function taking a connection_id and message, returning False if the client has gone away
+        :return: set of connection_id's of clients which have gone away
+        """
+        gone_connections = set()
+        for priority in PushPriority:
+            lane = self.lanes[priority]
+            while lane:
+                _, (connection_id, data) = lane.popitem(last=False)
+                if connection_id in gone_connections:
+                    continue
+                if not self._post(post, priority, connection_id, data):
+                    gone_connections.add(connection_id)
+        return gone_connections
+
+    def _post(self, post, priority, connection_id, data):
+        attempt = 0
+        while True:
+            try:
+                return post(connection_id, data)
+            except ClientError as e:
+                error_code = e.response.get('Error', {}).get('Code')
+                if error_code not in RETRYABLE_ERRORS:
+                    raise
+                if priority != PushPriority.CRITICAL or attempt >= self.max_retries:
+                    # newer messages will follow, so a dropped non-critical message is not worth failing the fan-out
+                    print(f"Dropped {data.get('event_type')} message to {connection_id}: {error_code}")
+                    return True
+                self.sleep(self.retry_delay * 2 ** attempt)
+                attempt += 1
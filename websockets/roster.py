@@ -0,0 +1,94 @@
+import time
+
+
+class LobbyRoster:
+    """
+    Connection ids of every player and the GameMaster connected to a started Lobby, with players grouped by squad.
+    A roster carries the version of the Lobby's connections it was read at, so a cached copy can be revalidated with a
+    single read instead of re-querying every connection.
+    """
+
+    def __init__(self, lobby_id, version=None):
+        self.lobby_id = lobby_id  # unique_id of the Lobby
+        self.version = version  # version of the Lobby's connections when the roster was read
+        self.squads = dict()  # connection_id of each player, keyed by squad name and then username
+        self.game_master = None  # connection_id of the GameMaster if they are connected
+        self.sort_keys = dict()  # sort key of each connection item, keyed by connection_id
+
+    def add_player(self, squad_name, username, connection_id, sort_key):
+        self.squads.setdefault(squad_name, dict())[username] = connection_id
+        self.sort_keys[connection_id] = sort_key
+
+    def set_game_master(self, connection_id, sort_key):
+        self.game_master = connection_id
+        self.sort_keys[connection_id] = sort_key
+
+    def player_connection_ids(self):
+        """
+        :return: list of connection_id's of every connected player
+        """
+        return [connection_id for members in self.squads.values() for connection_id in members.values()]
+
+    def squad_connection_ids(self, squad_name, exclude=None):
+        """
+        :param squad_name: name of squad to get connected members of
+        :param exclude: username of a squad member to leave out, usually the sender of a message
+        :return: list of connection_id's of connected members of the squad
+        """
+        return [connection_id for username, connection_id in self.squads.get(squad_name, dict()).items()
+                if username != exclude]
+
+    def connection_ids(self):
+        """
+        :return: list of connection_id's of every connected player and the GameMaster
+        """
+        connection_ids = self.player_connection_ids()
+        if self.game_master:
+            connection_ids.append(self.game_master)
+        return connection_ids
+
+    @staticmethod
+    def new_version():
+        """
+        Versions only need to differ from each other, so a nanosecond timestamp is used instead of a counter. This lets
+        a version be written with a plain PutItem
+        """
+        return time.time_ns()
+
+
+class RosterCache:
+    """
+    Rosters kept in memory between invocations of a warm Lambda, keyed by Lobby unique_id
+    """
+
+    def __init__(self, max_size=64):
+        self.max_size = max_size
+        self.rosters = dict()
+
+    def get(self, lobby_id, version):
+        """
+        Get a cached roster if it is still at the given version
+        :param lobby_id: unique_id of the Lobby
+        :param version: current version of the Lobby's connections
+        :return: LobbyRoster, or None if there is no cached roster at this version
+        """
+        roster = self.rosters.get(lobby_id)
+        if roster is None or version is None or roster.version != version:
+            return None
+        return roster
+
+    def put(self, roster):
+        self.rosters.pop(roster.lobby_id, None)
+        if len(self.rosters) >= self.max_size:
+            # evict the least recently stored roster
+            del self.rosters[next(iter(self.rosters))]
+        self.rosters[roster.lobby_id] = roster
+
+    def invalidate(self, lobby_id):
+        self.rosters.pop(lobby_id, None)
+
+    def clear(self):
+        self.rosters.clear()
+
+
+roster_cache = RosterCache()